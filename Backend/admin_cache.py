@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+# Key of the list projection among cached responses
+LISTING = "listing"
+
+
+class CachedResponse:
+    """A serialized JSON body with its validators."""
+
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, payload: dict, modified: Iterable[Optional[str]]):
+        self.body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        # Derived from the body, so every worker computes the same tag for the same data
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.last_modified = http_date(max((stamp for stamp in modified if stamp), default=None))
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str] = None) -> bool:
+        """
+        Whether a conditional GET can be answered with 304. If-Modified-Since
+        is only consulted without If-None-Match, and only when the caller
+        passes it (see AdminContentCache).
+        """
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            return parsedate_to_datetime(self.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """SQLite CURRENT_TIMESTAMP text (UTC) as an HTTP date."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(parsed, usegmt=True)
+
+
+class AdminContentCache:
+    """
+    Serialized admin content responses: the list projection and up to
+    max_items single items, each kept for at most ttl seconds. The admin
+    endpoints invalidate it on every create, update and delete (and other
+    workers do so when told over the backplane), so repeated loads cost
+    neither a query nor JSON encoding.
+
+    Only used from the event loop. As in RoomCache, each invalidation bumps a
+    generation, and a response read from the database is only cached if no
+    invalidation happened while it was being read.
+
+    The list's Last-Modified is its newest updated_at, which a delete doesn't
+    advance, so conditional list requests are answered from the ETag alone.
+    """
+
+    def __init__(self, max_items: int = 256, ttl: float = 300.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries: "OrderedDict[object, tuple]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key) -> Optional[CachedResponse]:
+        """The cached response for LISTING or an item id, or None."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, response: CachedResponse, generation: int) -> CachedResponse:
+        """Cache a response read while generation was current. Returns it either way."""
+        if generation == self._generation:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            # The listing doesn't count towards max_items
+            while len(self._entries) > self.max_items + 1:
+                oldest = next(key for key in self._entries if key != LISTING)
+                del self._entries[oldest]
+        return response
+
+    def invalidate(self, content_id: Optional[int] = None):
+        """Forget the listing and one item, or everything if content_id is None."""
+        self._generation += 1
+        if content_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(LISTING, None)
+            self._entries.pop(content_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_items": self.max_items,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database
+from metrics import db_errors, db_operation_seconds
+
+
+class AsyncDatabase:
+    """
+    Awaitable facade over Database so SQLite I/O never runs on the event loop.
+
+    Reads go to a small thread pool. Each database file has a single writer
+    thread, so its writes apply in submission order and never contend with
+    each other for SQLite's write lock. Writes to one room (ROOM_WRITE_METHODS,
+    run_room_write) go straight to the writer of the shard holding the room,
+    and admin content writes to the home shard's, so with a ShardedDatabase
+    unrelated rooms are written in parallel. Writes that span rooms run on a
+    coordinating thread, which hands each shard its part via write_each.
+    """
+
+    READ_METHODS = {
+        "get_room",
+        "get_room_info",
+        "get_all_rooms",
+        "list_rooms",
+        "get_room_content",
+        "read_room_content",
+        "room_exists",
+        "get_admin_content",
+        "list_admin_content",
+        "is_room_locked",
+        "get_interview_notes",
+        "content_storage_stats",
+    }
+    WRITE_METHODS = {
+        "create_room",
+        "delete_room",
+        "update_room_content",
+        "update_rooms_content",
+        "add_admin_content",
+        "update_admin_content",
+        "delete_admin_content",
+        "toggle_room_lock",
+        "lock_rooms_older_than_days",
+        "create_or_update_interview_notes",
+        "delete_interview_notes",
+        "compress_stored_content",
+    }
+    # Writes whose first argument is the room they touch
+    ROOM_WRITE_METHODS = {
+        "create_room",
+        "delete_room",
+        "update_room_content",
+        "toggle_room_lock",
+        "create_or_update_interview_notes",
+        "delete_interview_notes",
+    }
+    HOME_WRITE_METHODS = {
+        "add_admin_content",
+        "update_admin_content",
+        "delete_admin_content",
+    }
+
+    def __init__(self, db: Database, read_workers: int = 4):
+        self.db = db
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+    async def run_read(self, fn, *args, **kwargs):
+        """Run a blocking read on the reader pool."""
+        return await self._run(self._readers, "read", fn, args, kwargs)
+
+    async def run_write(self, fn, *args, **kwargs):
+        """Run a blocking write that may span shards on the coordinating writer thread."""
+        return await self._run(self._writer, "write", fn, args, kwargs)
+
+    async def run_room_write(self, room_name: str, fn, *args, **kwargs):
+        """
+        Run a blocking write to one room on its shard's writer thread.
+        fn must only touch that shard; it must not call write_each.
+        """
+        return await self._run(self._writer_for(self.db.for_room(room_name)), "write", fn, args, kwargs)
+
+    def _writer_for(self, shard: Database) -> ThreadPoolExecutor:
+        # An unsharded database is written by the coordinating thread alone
+        writer = getattr(self.db, "writer", None)
+        return writer(shard) if writer is not None else self._writer
+
+    async def _run(self, executor, kind: str, fn, args, kwargs):
+        loop = asyncio.get_running_loop()
+        method = getattr(fn, "__name__", "call")
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            db_errors.inc(method)
+            raise
+        finally:
+            db_operation_seconds.observe(time.perf_counter() - started, method, kind)
+
+    def __getattr__(self, name):
+        if not (name in self.READ_METHODS or name in self.WRITE_METHODS):
+            raise AttributeError(name)
+        method = getattr(self.db, name)
+
+        if name in self.READ_METHODS:
+            async def call(*args, **kwargs):
+                return await self.run_read(method, *args, **kwargs)
+        elif name in self.ROOM_WRITE_METHODS:
+            async def call(room_name, *args, **kwargs):
+                return await self.run_room_write(room_name, method, room_name, *args, **kwargs)
+        elif name in self.HOME_WRITE_METHODS:
+            async def call(*args, **kwargs):
+                return await self._run(self._writer_for(self.db.home), "write", method, args, kwargs)
+        else:
+            async def call(*args, **kwargs):
+                return await self.run_write(method, *args, **kwargs)
+
+        return call
+
+    def close(self):
+        """Wait for queued writes, stop the worker threads and close connections (and shard writers)."""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
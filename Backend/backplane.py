@@ -0,0 +1,197 @@
+"""
+Pub/sub backplane that relays room events between uvicorn worker processes.
+
+Each worker keeps its own websocket connections and tells the backplane which
+rooms it hosts. Events a worker publishes for a room are delivered to every
+other worker hosting that room. Events published without a room (e.g. cache
+invalidation) go to every worker.
+
+LocalBackplane is for a single worker and relays nothing. SqliteBackplane
+uses a shared SQLite file as the broker, so several workers on one box can
+serve the same rooms (`uvicorn main:app --workers N`).
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Called with (room_name, event) for every event delivered from another worker
+EventHandler = Callable[[Optional[str], dict], Awaitable[None]]
+
+
+class LocalBackplane:
+    """Backplane for a single worker: nothing to relay."""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self.hosted_rooms: Set[str] = set()
+        self.events_published = 0
+        self.events_delivered = 0
+
+    async def start(self, handler: EventHandler):
+        self.handler = handler
+
+    async def stop(self):
+        pass
+
+    def subscribe(self, room_name: str):
+        """Start receiving events for a room hosted on this worker."""
+        # Replaced rather than mutated so other threads can read it safely
+        self.hosted_rooms = self.hosted_rooms | {room_name}
+
+    def unsubscribe(self, room_name: str):
+        self.hosted_rooms = self.hosted_rooms - {room_name}
+
+    def publish(self, room_name: Optional[str], event: dict):
+        """Send an event to other workers (room-scoped, or to all if room_name is None)."""
+        self.events_published += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "worker_id": self.worker_id,
+            "hosted_rooms": len(self.hosted_rooms),
+            "events_published": self.events_published,
+            "events_delivered": self.events_delivered,
+        }
+
+
+class SqliteBackplane(LocalBackplane):
+    """
+    Backplane brokered through a shared SQLite file. Published events are
+    appended to a table in batches; every worker polls for rows it hasn't seen,
+    skipping its own and those for rooms it doesn't host. Old rows are pruned
+    after `retention` seconds.
+
+    Full-content events are last-writer-wins in broker order: a worker ignores
+    another worker's content event for a room if it has itself published a
+    later one, so all workers converge on the same document.
+    """
+
+    def __init__(self, path: str = "backplane.db", poll_interval: float = 0.02, retention: float = 60.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._outbox: List[Tuple[Optional[str], dict]] = []
+        self._outbox_lock = threading.Lock()
+        # room_name -> broker id of the latest content event this worker published
+        self._last_own_content: Dict[str, int] = {}
+        self._last_seen_id = 0
+        self._last_prune = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backplane")
+        self._task: Optional[asyncio.Task] = None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS backplane_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_name TEXT,
+                origin TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM backplane_events").fetchone()
+        self._last_seen_id = row[0]
+        self._conn = conn
+
+    async def start(self, handler: EventHandler):
+        self.handler = handler
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._open)
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        loop = asyncio.get_running_loop()
+        # Deliver whatever was published during shutdown, then close
+        await loop.run_in_executor(self._executor, self._exchange)
+        await loop.run_in_executor(self._executor, self._conn.close)
+        self._executor.shutdown(wait=True)
+
+    def publish(self, room_name: Optional[str], event: dict):
+        with self._outbox_lock:
+            self._outbox.append((room_name, event))
+        self.events_published += 1
+
+    def _exchange(self) -> List[Tuple[int, Optional[str], dict]]:
+        """Write queued events and read new ones from other workers (runs on the backplane thread)."""
+        with self._outbox_lock:
+            outgoing, self._outbox = self._outbox, []
+        conn = self._conn
+        now = time.time()
+        with conn:
+            for room_name, event in outgoing:
+                cursor = conn.execute(
+                    "INSERT INTO backplane_events (room_name, origin, payload, created_at) VALUES (?, ?, ?, ?)",
+                    (room_name, self.worker_id, json.dumps(event), now)
+                )
+                if event.get("kind") == "content":
+                    self._last_own_content[room_name] = cursor.lastrowid
+            if now - self._last_prune > self.retention:
+                conn.execute("DELETE FROM backplane_events WHERE created_at < ?", (now - self.retention,))
+                self._last_prune = now
+        rows = conn.execute(
+            "SELECT id, room_name, origin, payload FROM backplane_events WHERE id > ? ORDER BY id",
+            (self._last_seen_id,)
+        ).fetchall()
+
+        incoming = []
+        hosted = self.hosted_rooms
+        for event_id, room_name, origin, payload in rows:
+            self._last_seen_id = event_id
+            if origin == self.worker_id:
+                continue
+            if room_name is not None and room_name not in hosted:
+                continue
+            incoming.append((event_id, room_name, json.loads(payload)))
+        return incoming
+
+    def _is_superseded(self, event_id: int, room_name: Optional[str], event: dict) -> bool:
+        """Whether this worker has published (or queued) newer content for the room."""
+        if event.get("kind") != "content":
+            return False
+        if self._last_own_content.get(room_name, 0) > event_id:
+            return True
+        with self._outbox_lock:
+            return any(room == room_name and queued.get("kind") == "content" for room, queued in self._outbox)
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                incoming = await loop.run_in_executor(self._executor, self._exchange)
+                for event_id, room_name, event in incoming:
+                    # Checked here, on the event loop, so no local publish can race it
+                    if self._is_superseded(event_id, room_name, event):
+                        continue
+                    self.events_delivered += 1
+                    await self.handler(room_name, event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Backplane poll failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_backplane(kind: str, path: str, poll_interval: float):
+    """Build the backplane selected by the BACKPLANE setting."""
+    if kind == "local":
+        return LocalBackplane()
+    if kind == "sqlite":
+        return SqliteBackplane(path, poll_interval)
+    raise ValueError(f"Unknown backplane {kind!r}")
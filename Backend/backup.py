@@ -0,0 +1,294 @@
+"""
+Online backups and NDJSON export/import of the rooms database.
+
+    python backup.py backup [--db rooms.db] [--dest backups/rooms_<time>.db]
+    python backup.py export [--db rooms.db] > rooms.ndjson
+    python backup.py import [--db rooms.db] < rooms.ndjson
+
+Pass --shards N (default: DB_SHARDS) for a sharded database (see sharding.py).
+
+backup copies the live database with SQLite's online backup API. WAL databases
+are copied from a single read snapshot, which doesn't block the server's writes.
+
+export writes one JSON object per line for every room, interview note and admin
+content row, reading in fixed-size batches so memory use doesn't depend on the
+database size. import loads such a file with upserts in large transactions.
+Room version history and the search index are not exported; the index is
+rebuilt from the imported rows by the server's indexing task. Exports don't
+depend on the shard layout, so they also move data between layouts: interview
+notes are matched to existing ones by room, and get new ids.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from content_codec import ContentCodec
+from database import Database
+from sharding import ShardedDatabase
+
+# Rows read per query while exporting
+EXPORT_BATCH = 500
+# Rows written per transaction while importing
+IMPORT_BATCH = 5000
+
+# type -> (table, exported columns)
+EXPORT_TABLES = {
+    "room": ("rooms", ["room_name", "content", "is_locked", "created_at", "updated_at"]),
+    "interview_notes": ("interview_notes", ["id", "room_name", "content", "created_at", "updated_at"]),
+    "admin_content": ("admin_content", ["id", "title", "content", "created_at", "updated_at"]),
+}
+
+# Upserts keyed on each table's primary key; imported rows are re-indexed for search.
+# Interview note ids are per shard, so notes are matched by room instead
+_IMPORT_SQL = {
+    "room": ("""
+        INSERT INTO rooms (room_name, content, is_locked, created_at, updated_at, search_dirty)
+        VALUES (:room_name, :content, :is_locked, :created_at, :updated_at, 1)
+        ON CONFLICT (room_name) DO UPDATE SET
+            content = excluded.content, is_locked = excluded.is_locked,
+            created_at = excluded.created_at, updated_at = excluded.updated_at, search_dirty = 1
+    """,),
+    "interview_notes": ("""
+        UPDATE interview_notes SET
+            content = :content, created_at = :created_at, updated_at = :updated_at, search_dirty = 1
+        WHERE room_name = :room_name
+    """, """
+        INSERT INTO interview_notes (room_name, content, created_at, updated_at, search_dirty)
+        SELECT :room_name, :content, :created_at, :updated_at, 1
+        WHERE NOT EXISTS (SELECT 1 FROM interview_notes WHERE room_name = :room_name)
+    """),
+    "admin_content": ("""
+        INSERT INTO admin_content (id, title, content, content_size, created_at, updated_at, search_dirty)
+        VALUES (:id, :title, :content, :content_size, :created_at, :updated_at, 1)
+        ON CONFLICT (id) DO UPDATE SET
+            title = excluded.title, content = excluded.content, content_size = excluded.content_size,
+            created_at = excluded.created_at, updated_at = excluded.updated_at, search_dirty = 1
+    """,),
+}
+
+
+def default_backup_path(directory: str) -> str:
+    return os.path.join(directory, f"rooms_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+
+
+class BackupError(RuntimeError):
+    """An online backup couldn't complete."""
+
+
+def online_backup(
+    db_path: str,
+    dest_path: str,
+    pages_per_step: int = 1024,
+    pause: float = 0.005,
+    max_restarts: int = 10
+) -> dict:
+    """
+    Copy a live database to dest_path with the online backup API. The copy is
+    written to a temporary file, renamed into place once complete and removed
+    if the backup fails.
+
+    A WAL database (as the server's always is) is copied in a single step
+    from one read snapshot, which doesn't block writers. Otherwise the copy
+    goes pages_per_step pages at a time, pausing between steps. SQLite then
+    restarts it whenever another connection writes, so it fails with
+    BackupError after max_restarts restarts rather than running forever.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    partial_path = dest_path + ".partial"
+    progress = {"steps": 0, "restarts": 0, "remaining": None, "pages": 0}
+
+    def on_progress(status, remaining, total):
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > max_restarts:
+                raise BackupError(f"Backup of {db_path} restarted {max_restarts} times by concurrent writes")
+        progress.update(steps=progress["steps"] + 1, remaining=remaining, pages=total)
+        # Give writers room between steps
+        time.sleep(pause)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(db_path, timeout=30.0)
+    dest = sqlite3.connect(partial_path)
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        source.backup(dest, pages=-1 if wal else pages_per_step, progress=on_progress)
+    except BaseException:
+        dest.close()
+        for path in (partial_path, partial_path + "-journal"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        raise
+    finally:
+        dest.close()
+        source.close()
+    os.replace(partial_path, dest_path)
+    return {
+        "path": dest_path,
+        "pages": progress["pages"],
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "bytes": os.path.getsize(dest_path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def backup_database(db: Database, directory: str, pages_per_step: int = 1024) -> dict:
+    """
+    online_backup of every file of db into directory. A sharded database is
+    copied one shard at a time, so the copies are not from a single instant.
+    """
+    if len(db.shards) == 1:
+        return online_backup(db.db_path, default_backup_path(directory), pages_per_step)
+    base = default_backup_path(directory)
+    root, ext = os.path.splitext(base)
+    count = len(db.shards)
+    return {"shards": [
+        online_backup(shard.db_path, f"{root}.{index}-of-{count}{ext}", pages_per_step)
+        for index, shard in enumerate(db.shards)
+    ]}
+
+
+def iter_export(db: Database) -> Iterator[str]:
+    """Yield the database as NDJSON lines, one row per line."""
+    for record_type, (table, columns) in EXPORT_TABLES.items():
+        for shard in db.shards:
+            yield from _iter_table(shard, record_type, table, columns)
+
+
+def _iter_table(db: Database, record_type: str, table: str, columns: List[str]) -> Iterator[str]:
+    key = columns[0]
+    last = None
+    while True:
+        # Keyset pagination, so no connection or snapshot is held between batches
+        with db.get_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {', '.join(columns)} FROM {table}
+                {f"WHERE {key} > ?" if last is not None else ""}
+                ORDER BY {key} LIMIT ?
+                """,
+                ([last] if last is not None else []) + [EXPORT_BATCH]
+            ).fetchall()
+        for row in rows:
+            record = dict(row)
+            record["content"] = db.codec.decode(record["content"])
+            yield json.dumps({"type": record_type, **record}, ensure_ascii=False) + "\n"
+        if len(rows) < EXPORT_BATCH:
+            break
+        last = rows[-1][key]
+
+
+def import_records(db: Database, records: List[dict]) -> Dict[str, int]:
+    """Upsert a batch of exported records in one transaction per shard. Returns counts by type."""
+    grouped: Dict[Database, Dict[str, dict]] = {}
+    counts = {record_type: 0 for record_type in _IMPORT_SQL}
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError(f"Expected a JSON object, got {record!r:.50}")
+        record_type = record.get("type")
+        if record_type not in counts:
+            raise ValueError(f"Unknown record type {record_type!r}")
+        _, columns = EXPORT_TABLES[record_type]
+        values = {column: record.get(column) for column in columns}
+        nested = any(isinstance(value, (dict, list)) for value in values.values())
+        if nested or not isinstance(values["content"] or "", str):
+            raise ValueError(f"Invalid {record_type} record {record!r:.50}")
+        if record_type == "admin_content":
+            values["content_size"] = len(values["content"] or "")
+        values["content"] = db.codec.encode(values["content"] or "")
+        shard = db.home if record_type == "admin_content" else db.for_room(str(values["room_name"]))
+        rows = grouped.setdefault(shard, {}).setdefault(record_type, {})
+        # Later records win; notes are keyed by room, everything else by primary key
+        rows[values["room_name"] if record_type == "interview_notes" else values[columns[0]]] = values
+        counts[record_type] += 1
+    # Each shard's transaction runs on that shard's writer
+    db.write_each({
+        shard: (lambda shard, by_type=by_type: _import_shard(shard, by_type))
+        for shard, by_type in grouped.items()
+    })
+    return counts
+
+
+def _import_shard(shard: Database, by_type: Dict[str, Dict[str, dict]]):
+    with shard.get_connection() as conn:
+        for record_type, rows in by_type.items():
+            for statement in _IMPORT_SQL[record_type]:
+                conn.executemany(statement, list(rows.values()))
+
+
+def parse_lines(lines: Iterable[str], batch_size: int = IMPORT_BATCH) -> Iterator[List[dict]]:
+    """Group NDJSON lines into batches of parsed records, skipping blank lines."""
+    batch = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(json.loads(line))
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {e}") from e
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _codec_from_env() -> ContentCodec:
+    # Same settings as the server (see main.py)
+    return ContentCodec(
+        os.environ.get("CONTENT_COMPRESSION", "1") == "1",
+        int(os.environ.get("CONTENT_COMPRESSION_MIN_SIZE", "512")),
+        int(os.environ.get("CONTENT_COMPRESSION_LEVEL", "6")),
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backup", "export", "import"])
+    parser.add_argument("--db", default="rooms.db", help="database file (default: rooms.db)")
+    parser.add_argument("--dest", help="backup file (default: backups/rooms_<time>.db); shards are copied to its directory")
+    parser.add_argument(
+        "--shards", type=int, default=int(os.environ.get("DB_SHARDS", "1")),
+        help="shard count of the database (default: DB_SHARDS or 1)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "backup" and args.shards <= 1:
+        dest = args.dest or default_backup_path(os.environ.get("BACKUP_DIR", "backups"))
+        print(json.dumps(online_backup(args.db, dest)))
+        return
+
+    if args.shards > 1:
+        db = ShardedDatabase(args.db, args.shards, pool_size=2, codec=_codec_from_env())
+    else:
+        db = Database(args.db, pool_size=2, codec=_codec_from_env())
+    if args.command == "backup":
+        try:
+            directory = os.path.dirname(args.dest) if args.dest else os.environ.get("BACKUP_DIR", "backups")
+            print(json.dumps(backup_database(db, directory or ".")))
+        finally:
+            db.close()
+        return
+    try:
+        if args.command == "export":
+            for line in iter_export(db):
+                sys.stdout.write(line)
+        else:
+            totals: Dict[str, int] = {}
+            for batch in parse_lines(sys.stdin):
+                for record_type, count in import_records(db, batch).items():
+                    totals[record_type] = totals.get(record_type, 0) + count
+            print(json.dumps(totals), file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
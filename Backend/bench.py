@@ -0,0 +1,734 @@
+"""
+Websocket load generator and benchmark for the backend.
+
+    python bench.py run [--rooms 10] [--clients 5] [--duration 30] [--scenario mixed] [--output out.json]
+    python bench.py compare baseline.json candidate.json
+
+run starts the server with serve.py in a scratch directory (fresh rooms.db),
+connects rooms x clients simulated editors and drives traffic for --duration
+seconds. Pass --url to benchmark a server that is already running instead;
+--server-pid then enables CPU and RSS sampling for it.
+
+Scenarios:
+
+    edit       every client posts its full document like Editor.jsx does (one
+               message per --edit-interval, the editor's debounce)
+    cursor     every client sends selection events at --cursor-hz
+    reconnect  every --reconnect-interval all clients drop and reconnect at
+               once, resuming their sessions
+    mixed      edit and cursor traffic, plus a reconnect storm in one room
+               (in turn) every --reconnect-interval
+
+Results are one JSON object: the git commit, the configuration, p50/p95/p99
+latencies in milliseconds, message and DB write rates, and server CPU and RSS.
+Latencies are end to end, measured by the clients: content from the sender
+stamping the document to a peer receiving it, selection from the sender
+stamping the event to a peer receiving its batch (this includes the selection
+tick), join from opening the connection to the welcome frame.
+
+Clients all run in this process and are driven by one event loop, so on a small
+machine the generator itself can become the bottleneck; watch client_lag_ms.
+With WORKERS > 1, db.rows_persisted only covers the worker that answered the
+stats request.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (
+    AcceptConnection,
+    BytesMessage,
+    CloseConnection,
+    Ping,
+    RejectConnection,
+    Request,
+    TextMessage,
+)
+from wsproto.extensions import PerMessageDeflate
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Marks the first line of documents sent by the benchmark: "<prefix> <sender> <perf_counter>"
+STAMP_PREFIX = "// bench"
+
+SCENARIOS = ("edit", "cursor", "reconnect", "mixed")
+
+
+class BenchWebSocket:
+    """Minimal asyncio websocket client on wsproto, offering permessage-deflate like browsers do."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, conn: WSConnection):
+        self.reader = reader
+        self.writer = writer
+        self.conn = conn
+        self.messages: Deque[str] = deque()
+        self.closed = False
+        self._parts: List[str] = []
+
+    @classmethod
+    async def connect(cls, host: str, port: int, target: str, timeout: float = 10.0) -> "BenchWebSocket":
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        conn = WSConnection(ConnectionType.CLIENT)
+        ws = cls(reader, writer, conn)
+        writer.write(conn.send(Request(host=f"{host}:{port}", target=target, extensions=[PerMessageDeflate()])))
+        while True:
+            data = await asyncio.wait_for(reader.read(65536), timeout)
+            conn.receive_data(data or None)
+            for event in conn.events():
+                if isinstance(event, AcceptConnection):
+                    # Anything that arrived with the handshake response
+                    ws._handle_events()
+                    return ws
+                if isinstance(event, RejectConnection):
+                    writer.close()
+                    raise ConnectionError(f"Handshake rejected with status {event.status_code}")
+            if not data:
+                raise ConnectionError("Connection closed during handshake")
+
+    def _handle_events(self):
+        for event in self.conn.events():
+            if isinstance(event, TextMessage):
+                self._parts.append(event.data)
+                if event.message_finished:
+                    self.messages.append("".join(self._parts))
+                    self._parts = []
+            elif isinstance(event, BytesMessage):
+                # Only JSON text frames are expected without a MessagePack subprotocol
+                continue
+            elif isinstance(event, Ping):
+                self.writer.write(self.conn.send(event.response()))
+            elif isinstance(event, CloseConnection):
+                if self.conn.state.name == "REMOTE_CLOSING":
+                    self.writer.write(self.conn.send(event.response()))
+                self.closed = True
+
+    async def recv(self) -> Optional[str]:
+        """The next text message, or None once the connection is closed."""
+        while not self.messages:
+            if self.closed:
+                return None
+            try:
+                data = await self.reader.read(65536)
+            except ConnectionError:
+                data = b""
+            if not data:
+                self.closed = True
+                return None
+            self.conn.receive_data(data)
+            self._handle_events()
+        return self.messages.popleft()
+
+    async def send(self, text: str):
+        if self.closed:
+            return
+        self.writer.write(self.conn.send(TextMessage(data=text)))
+        await self.writer.drain()
+
+    async def close(self):
+        if not self.closed and self.conn.state.name == "OPEN":
+            try:
+                self.writer.write(self.conn.send(CloseConnection(code=1000)))
+                await self.writer.drain()
+            except (ConnectionError, RuntimeError):
+                pass
+        self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+class Stats:
+    """Samples and counters collected by all simulated clients."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {"content": [], "selection": [], "join": []}
+        self.sent: Dict[str, int] = {}
+        self.received: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # How late the client loops woke up compared to their schedule
+        self.lag: List[float] = []
+        # Only count traffic and latencies while measuring
+        self.recording = False
+
+    def record_latency(self, kind: str, seconds: float):
+        if self.recording:
+            self.latencies[kind].append(seconds)
+
+    def count(self, counters: Dict[str, int], message_type: str):
+        if self.recording:
+            counters[message_type] = counters.get(message_type, 0) + 1
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def percentiles(samples: List[float]) -> dict:
+    """count, p50/p95/p99 and max of latency samples, in milliseconds."""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        # Nearest-rank percentile
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def initial_document(size: int) -> str:
+    lines = []
+    length = 0
+    number = 0
+    while length < size:
+        line = f"def step_{number}(value):\n    return value * {number} + {number % 7}\n"
+        lines.append(line)
+        length += len(line)
+        number += 1
+    return "".join(lines)[:size]
+
+
+class SimClient:
+    """One simulated editor: connects, sends its scenario's traffic and measures what it receives."""
+
+    def __init__(self, bench: "Benchmark", room_name: str, label: str):
+        self.bench = bench
+        self.room_name = room_name
+        self.label = label
+        self.user_id: Optional[str] = None
+        self.session: Optional[str] = None
+        self.seq: Optional[int] = None
+        self.text = ""
+        self.rng = random.Random(label)
+        self.drop = asyncio.Event()
+
+    def target(self) -> str:
+        query = {}
+        if self.session:
+            # Resume like Editor.jsx does after a dropped connection
+            query["session"] = self.session
+            if self.seq is not None:
+                query["last_seq"] = self.seq
+        path = f"{self.bench.base_path}/ws/{self.room_name}"
+        return f"{path}?{urlencode(query)}" if query else path
+
+    async def run(self, stop: asyncio.Event):
+        """Keep a connection open until stop, reconnecting whenever drop is set."""
+        while not stop.is_set():
+            self.drop = asyncio.Event()
+            try:
+                await self.connected(stop)
+            except (ConnectionError, OSError, asyncio.TimeoutError):
+                self.bench.stats.error("connect")
+                await asyncio.sleep(0.5)
+
+    async def connected(self, stop: asyncio.Event):
+        stats = self.bench.stats
+        started = time.perf_counter()
+        ws = await BenchWebSocket.connect(self.bench.host, self.bench.port, self.target())
+        try:
+            while not await self._is_welcome(ws, started):
+                pass
+            tasks = [asyncio.create_task(self.receive(ws))]
+            if self.bench.args.scenario in ("edit", "mixed"):
+                tasks.append(asyncio.create_task(self.edit(ws)))
+            if self.bench.args.scenario in ("cursor", "mixed"):
+                tasks.append(asyncio.create_task(self.move_cursor(ws)))
+            waiters = [asyncio.create_task(stop.wait()), asyncio.create_task(self.drop.wait())]
+            done, _ = await asyncio.wait(tasks + waiters, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks + waiters:
+                task.cancel()
+            for task in done:
+                if task in tasks and not task.cancelled() and task.exception() is not None:
+                    stats.error(type(task.exception()).__name__)
+        finally:
+            await ws.close()
+
+    async def _is_welcome(self, ws: BenchWebSocket, started: float) -> bool:
+        """Handle one message during the handshake; True once it was the welcome frame."""
+        raw = await asyncio.wait_for(ws.recv(), 10.0)
+        if raw is None:
+            raise ConnectionError("Closed before welcome")
+        message = json.loads(raw)
+        if message.get("type") == "welcome":
+            self.bench.stats.record_latency("join", time.perf_counter() - started)
+            self.user_id = message["userId"]
+            self.session = message["session"]
+            self.seq = message.get("seq")
+            return True
+        self.handle(message)
+        return False
+
+    async def receive(self, ws: BenchWebSocket):
+        while True:
+            raw = await ws.recv()
+            if raw is None:
+                return
+            message = json.loads(raw)
+            self.handle(message)
+            if message.get("type") == "ping":
+                # Answer heartbeats so long runs aren't reaped
+                await ws.send('{"type": "pong"}')
+
+    def handle(self, message: dict):
+        stats = self.bench.stats
+        now = time.perf_counter()
+        message_type = message.get("type", "content")
+        stats.count(stats.received, message_type)
+        if "seq" in message and message_type in ("content", "ack", "ops"):
+            self.seq = message["seq"]
+        if message_type == "content":
+            self.text = message.get("content") or ""
+            first_line = self.text.split("\n", 1)[0]
+            if first_line.startswith(STAMP_PREFIX):
+                _, _, sender, stamp = first_line.split(" ", 3)
+                if sender != self.label:
+                    stats.record_latency("content", now - float(stamp))
+        elif message_type == "selections":
+            for event in message.get("selections", ()):
+                if "t" in event and event.get("userId") != self.user_id:
+                    stats.record_latency("selection", now - event["t"])
+
+    async def edit(self, ws: BenchWebSocket):
+        """Post the full document every edit interval, as the editor's debounced onChange does."""
+        interval = self.bench.args.edit_interval
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        while True:
+            body = self.text.split("\n", 1)[1] if self.text.startswith(STAMP_PREFIX) else self.text
+            # A few keystrokes' worth of typing, keeping the document near its starting size
+            body += self.rng.choice(("x = 1\n", "print(x)\n", "# note\n", "return x\n"))
+            if len(body) > self.bench.args.doc_size:
+                body = body[len(body) - self.bench.args.doc_size:]
+            self.text = f"{STAMP_PREFIX} {self.label} {time.perf_counter():.6f}\n{body}"
+            await ws.send(self.text)
+            self.bench.stats.count(self.bench.stats.sent, "content")
+            await self.bench.pace(interval * self.rng.uniform(0.8, 1.2))
+
+    async def move_cursor(self, ws: BenchWebSocket):
+        interval = 1.0 / self.bench.args.cursor_hz
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        line = 1
+        while True:
+            line = max(1, line + self.rng.randint(-2, 2))
+            column = self.rng.randint(1, 40)
+            await ws.send(json.dumps({
+                "type": "selection",
+                "selection": {
+                    "startLineNumber": line,
+                    "startColumn": column,
+                    "endLineNumber": line,
+                    "endColumn": column + self.rng.randint(0, 10),
+                },
+                "t": time.perf_counter(),
+            }))
+            self.bench.stats.count(self.bench.stats.sent, "selection")
+            await self.bench.pace(interval)
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a process and its descendants from /proc (Linux only)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks_per_second = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.cpu_samples: List[float] = []
+        self.rss_samples: List[int] = []
+        self._last: Optional[tuple] = None
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; fields resume after its ")"
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        pids, queue = [], [self.pid]
+        while queue:
+            pid = queue.pop()
+            pids.append(pid)
+            queue.extend(children.get(pid, ()))
+        return pids
+
+    def _read(self) -> tuple:
+        cpu_ticks = 0
+        rss_pages = 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    rss_pages += int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            # utime and stime are fields 14 and 15 of stat
+            cpu_ticks += int(fields[11]) + int(fields[12])
+        return time.perf_counter(), cpu_ticks, rss_pages * self.page_size
+
+    def sample(self):
+        now, cpu_ticks, rss = self._read()
+        if self._last is not None:
+            elapsed = now - self._last[0]
+            if elapsed > 0:
+                self.cpu_samples.append((cpu_ticks - self._last[1]) / self.ticks_per_second / elapsed * 100)
+        self._last = (now, cpu_ticks)
+        self.rss_samples.append(rss)
+
+    def summary(self) -> dict:
+        mib = 1024 * 1024
+        return {
+            "pid": self.pid,
+            "cpu_percent_avg": round(sum(self.cpu_samples) / len(self.cpu_samples), 1) if self.cpu_samples else None,
+            "cpu_percent_max": round(max(self.cpu_samples), 1) if self.cpu_samples else None,
+            "rss_mib_avg": round(sum(self.rss_samples) / len(self.rss_samples) / mib, 1) if self.rss_samples else None,
+            "rss_mib_max": round(max(self.rss_samples) / mib, 1) if self.rss_samples else None,
+        }
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.stats = Stats()
+        url = urlsplit(args.url or f"http://127.0.0.1:{args.port}")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.base_path = url.path.rstrip("/")
+        self.http_base = f"http://{self.host}:{self.port}{self.base_path}"
+        self.server: Optional[subprocess.Popen] = None
+        self.workdir: Optional[str] = None
+        self.sampler: Optional[ProcessSampler] = None
+
+    async def pace(self, delay: float):
+        """Sleep for delay, recording how late the loop woke up."""
+        due = time.perf_counter() + delay
+        await asyncio.sleep(delay)
+        if self.stats.recording:
+            self.stats.lag.append(time.perf_counter() - due)
+
+    def http_get(self, path: str) -> dict:
+        with urllib.request.urlopen(self.http_base + path, timeout=10) as response:
+            return json.loads(response.read())
+
+    def start_server(self):
+        self.workdir = tempfile.mkdtemp(prefix="collab-bench-")
+        env = dict(os.environ)
+        env.update({
+            "HOST": self.host,
+            "PORT": str(self.port),
+            "WORKERS": str(self.args.workers),
+            "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+        })
+        if self.args.workers > 1:
+            env.setdefault("BACKPLANE", "sqlite")
+        self.server = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "serve.py")],
+            cwd=self.workdir,
+            env=env,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + 30
+        while True:
+            if self.server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {self.server.returncode}")
+            try:
+                self.http_get("/presence")
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Server did not start within 30 seconds")
+                time.sleep(0.2)
+
+    def stop_server(self):
+        if self.server is not None and self.server.poll() is None:
+            os.killpg(self.server.pid, signal.SIGTERM)
+            try:
+                self.server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.server.pid, signal.SIGKILL)
+                self.server.wait()
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    async def sample_process(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.sampler.sample()
+            try:
+                await asyncio.wait_for(stop.wait(), self.args.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def reconnect_storms(self, clients: List[SimClient], stop: asyncio.Event):
+        rooms: Dict[str, List[SimClient]] = {}
+        for client in clients:
+            rooms.setdefault(client.room_name, []).append(client)
+        room_names = list(rooms)
+        storm = 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.args.reconnect_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if self.args.scenario == "reconnect":
+                targets = clients
+            else:
+                targets = rooms[room_names[storm % len(room_names)]]
+            for client in targets:
+                client.drop.set()
+            storm += 1
+
+    async def seed_rooms(self, room_names: List[str]):
+        """Give every room a starting document so edits carry realistic payloads."""
+        document = initial_document(self.args.doc_size)
+        for room_name in room_names:
+            ws = await BenchWebSocket.connect(self.host, self.port, f"{self.base_path}/ws/{room_name}")
+            await ws.send(document)
+            # Wait for the ack so the document is in place before clients join
+            while True:
+                raw = await asyncio.wait_for(ws.recv(), 10.0)
+                if raw is None or json.loads(raw).get("type") == "ack":
+                    break
+            await ws.close()
+
+    async def run(self) -> dict:
+        args = self.args
+        tag = f"bench{int(time.time())}"
+        room_names = [f"{tag}-{room}" for room in range(args.rooms)]
+        await self.seed_rooms(room_names)
+        clients = [
+            SimClient(self, room_name, f"r{room}c{index}")
+            for room, room_name in enumerate(room_names)
+            for index in range(args.clients)
+        ]
+
+        stop = asyncio.Event()
+        # Join every client before measuring, so the run starts from a steady state
+        self.stats.recording = True
+        runners = [asyncio.create_task(client.run(stop)) for client in clients]
+        deadline = time.monotonic() + 30
+        while any(client.user_id is None for client in clients) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        join_latencies = self.stats.latencies["join"]
+        self.stats.latencies["join"] = []
+        self.stats.sent.clear()
+        self.stats.received.clear()
+        self.stats.lag.clear()
+
+        sampler_stop = asyncio.Event()
+        sampler_task = None
+        if self.sampler is not None:
+            self.sampler.sample()
+            sampler_task = asyncio.create_task(self.sample_process(sampler_stop))
+        before = await asyncio.to_thread(self.http_get, "/write-buffer/stats")
+        started = time.perf_counter()
+        storms = None
+        if args.scenario in ("reconnect", "mixed"):
+            storms = asyncio.create_task(self.reconnect_storms(clients, stop))
+        await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - started
+        self.stats.recording = False
+        stop.set()
+        await asyncio.gather(*runners, *(t for t in (storms,) if t), return_exceptions=True)
+        sampler_stop.set()
+        if sampler_task is not None:
+            await sampler_task
+
+        # Let the write-behind buffer flush what the run left dirty
+        await asyncio.sleep(before.get("flush_interval") or 1.0)
+        after = await asyncio.to_thread(self.http_get, "/write-buffer/stats")
+        rows_persisted = after["rows_persisted"] - before["rows_persisted"]
+        sent = sum(self.stats.sent.values())
+        received = sum(self.stats.received.values())
+        return {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": {
+                "scenario": args.scenario,
+                "rooms": args.rooms,
+                "clients_per_room": args.clients,
+                "duration": args.duration,
+                "edit_interval": args.edit_interval,
+                "cursor_hz": args.cursor_hz,
+                "reconnect_interval": args.reconnect_interval,
+                "doc_size": args.doc_size,
+                "workers": args.workers if self.server is not None else None,
+                "url": args.url,
+            },
+            "elapsed": round(elapsed, 3),
+            "latency_ms": {
+                "content": percentiles(self.stats.latencies["content"]),
+                "selection": percentiles(self.stats.latencies["selection"]),
+                "join": percentiles(self.stats.latencies["join"]),
+                "initial_join": percentiles(join_latencies),
+            },
+            "messages": {
+                "sent": sent,
+                "received": received,
+                "sent_per_second": round(sent / elapsed, 1),
+                "received_per_second": round(received / elapsed, 1),
+                "sent_by_type": dict(self.stats.sent),
+                "received_by_type": dict(self.stats.received),
+            },
+            "db": {
+                "rows_persisted": rows_persisted,
+                "writes_per_second": round(rows_persisted / elapsed, 2),
+                "writes_coalesced": after["writes_coalesced"] - before["writes_coalesced"],
+            },
+            "server": self.sampler.summary() if self.sampler is not None else None,
+            "client_lag_ms": percentiles(self.stats.lag),
+            "errors": dict(self.stats.errors),
+        }
+
+    def execute(self) -> dict:
+        if self.args.url is None:
+            self.start_server()
+            server_pid = self.server.pid
+        else:
+            server_pid = self.args.server_pid
+        try:
+            if server_pid is not None and os.path.isdir("/proc"):
+                self.sampler = ProcessSampler(server_pid)
+            return asyncio.run(self.run())
+        finally:
+            self.stop_server()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+# (label, path into the results, whether higher is better)
+COMPARED = [
+    ("content p50 ms", ("latency_ms", "content", "p50"), False),
+    ("content p95 ms", ("latency_ms", "content", "p95"), False),
+    ("content p99 ms", ("latency_ms", "content", "p99"), False),
+    ("selection p50 ms", ("latency_ms", "selection", "p50"), False),
+    ("selection p99 ms", ("latency_ms", "selection", "p99"), False),
+    ("join p50 ms", ("latency_ms", "join", "p50"), False),
+    ("join p99 ms", ("latency_ms", "join", "p99"), False),
+    ("received msgs/s", ("messages", "received_per_second"), True),
+    ("sent msgs/s", ("messages", "sent_per_second"), True),
+    ("db writes/s", ("db", "writes_per_second"), None),
+    ("server cpu %", ("server", "cpu_percent_avg"), False),
+    ("server rss MiB", ("server", "rss_mib_max"), False),
+]
+
+
+def _lookup(results: dict, path: tuple):
+    for key in path:
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+def compare(baseline: dict, candidate: dict) -> str:
+    """A table of the headline numbers of two runs and their relative change."""
+    lines = [
+        f"{'':18} {baseline.get('commit') or '?':>14} {candidate.get('commit') or '?':>14}  change",
+    ]
+    if baseline.get("config") != candidate.get("config"):
+        lines.append("(configurations differ)")
+    for label, path, higher_is_better in COMPARED:
+        old, new = _lookup(baseline, path), _lookup(candidate, path)
+        if old is None and new is None:
+            continue
+        change = ""
+        if old and new is not None:
+            delta = (new - old) / old * 100
+            change = f"{delta:+.1f}%"
+            if higher_is_better is not None and abs(delta) >= 5:
+                change += " better" if (delta > 0) == higher_is_better else " worse"
+        lines.append(f"{label:18} {str(old):>14} {str(new):>14}  {change}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a benchmark")
+    run.add_argument("--rooms", type=int, default=10)
+    run.add_argument("--clients", type=int, default=5, help="clients per room")
+    run.add_argument("--duration", type=float, default=30.0, help="seconds of measured traffic")
+    run.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    run.add_argument("--edit-interval", type=float, default=0.5, help="seconds between content posts per client")
+    run.add_argument("--cursor-hz", type=float, default=10.0, help="selection events per second per client")
+    run.add_argument("--reconnect-interval", type=float, default=5.0, help="seconds between reconnect storms")
+    run.add_argument("--doc-size", type=int, default=4096, help="document size in characters")
+    run.add_argument("--port", type=int, default=8765, help="port for the started server")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    run.add_argument("--url", help="benchmark a running server instead, e.g. http://127.0.0.1:8000")
+    run.add_argument("--server-pid", type=int, help="with --url, sample CPU and RSS of this process")
+    run.add_argument("--sample-interval", type=float, default=1.0, help="seconds between CPU/RSS samples")
+    run.add_argument("--output", help="write results to this file (default: stdout)")
+
+    comparison = commands.add_parser("compare", help="compare two result files")
+    comparison.add_argument("baseline")
+    comparison.add_argument("candidate")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        print(compare(baseline, candidate))
+        return
+
+    results = Benchmark(args).execute()
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    latency = results["latency_ms"]
+    print(
+        f"content p50/p99 {latency['content']['p50']}/{latency['content']['p99']} ms, "
+        f"selection p50/p99 {latency['selection']['p50']}/{latency['selection']['p99']} ms, "
+        f"{results['messages']['received_per_second']} msgs/s received, "
+        f"{results['db']['writes_per_second']} DB writes/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
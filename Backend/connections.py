@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from frames import Frame
+from metrics import fanout_latency, messages_sent, sent_bytes, slow_consumers_dropped
+
+# Close code sent to clients that fall too far behind (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Seconds to wait for a close handshake to be sent before giving up on the socket
+CLOSE_TIMEOUT = 5.0
+
+
+class ClientConnection:
+    """
+    A connected websocket client with its own outbound queue and writer task.
+
+    send() never awaits: it queues the frame and returns, so broadcasting to a
+    room never waits on a slow peer. Frames sent with a coalesce_key replace an
+    older frame with the same key that is still queued (e.g. only the newest
+    full-content frame is worth delivering). A client whose queue reaches
+    max_queue is disconnected and has to reconnect and resync.
+
+    send_stream() queues a sequence of frames that the writer produces one at
+    a time when it gets to them, e.g. the chunks of a large document.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        client_id: str,
+        max_queue: int = 256,
+        ops: bool = False,
+        binary: bool = False,
+    ):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.max_queue = max_queue
+        # Whether the client speaks the operation-based sync protocol
+        self.ops = ops
+        # Whether frames go out as MessagePack binary instead of JSON text
+        self.binary = binary
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+        # Monotonic time of the last message received from the client
+        self.last_seen = time.monotonic()
+        # Session the client connected under (set by the endpoint)
+        self.session = None
+        self.closed = False
+        self._close_code = 1000
+        # Entries are (coalesce_key, frame or frame iterator); keyed entries take
+        # their frame from _latest
+        self._queue: Deque[Tuple[Optional[str], Union[Frame, Iterator[Frame], None]]] = deque()
+        self._latest: Dict[str, Frame] = {}
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def touch(self):
+        """Record that the client is alive."""
+        self.last_seen = time.monotonic()
+
+    def start(self):
+        self._task = asyncio.create_task(self._write_loop())
+
+    def send(self, frame: Frame, coalesce_key: Optional[str] = None) -> bool:
+        """Queue a frame for delivery. Returns False if the client is gone or was dropped."""
+        if self.closed:
+            return False
+        if coalesce_key is not None and coalesce_key in self._latest:
+            self._latest[coalesce_key] = frame
+            self.frames_coalesced += 1
+            return True
+        if len(self._queue) >= self.max_queue:
+            # The writer is most likely stuck in a send; don't wait for it
+            slow_consumers_dropped.inc()
+            self.close(SLOW_CONSUMER_CLOSE_CODE, abort=True)
+            return False
+        if coalesce_key is None:
+            self._queue.append((None, frame))
+        else:
+            self._latest[coalesce_key] = frame
+            self._queue.append((coalesce_key, None))
+        self._ready.set()
+        return True
+
+    def send_stream(self, frames: Iterable[Frame]) -> bool:
+        """
+        Queue frames that are generated as they are sent. They take one queue
+        slot, go out back to back, and frames queued later follow them.
+        """
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            slow_consumers_dropped.inc()
+            self.close(SLOW_CONSUMER_CLOSE_CODE, abort=True)
+            return False
+        self._queue.append((None, iter(frames)))
+        self._ready.set()
+        return True
+
+    def close(self, code: int = 1000, abort: bool = False):
+        """
+        Stop delivering frames and close the socket from the writer task.
+        With abort, a send that is in progress is cancelled first.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._close_code = code
+        self._queue.clear()
+        self._latest.clear()
+        self._ready.set()
+        if abort and self._task is not None:
+            self._task.cancel()
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue and not self.closed:
+                    key, item = self._queue.popleft()
+                    if key is not None:
+                        item = self._latest.pop(key)
+                    if isinstance(item, Frame):
+                        await self._write(item)
+                        continue
+                    for frame in item:
+                        if self.closed:
+                            break
+                        await self._write(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Socket already gone; the receive loop handles the cleanup
+            self.closed = True
+            return
+        try:
+            await asyncio.wait_for(self.websocket.close(code=self._close_code), CLOSE_TIMEOUT)
+        except (Exception, asyncio.CancelledError):
+            pass
+
+    async def _write(self, frame: Frame):
+        payload = frame.binary if self.binary else frame.text
+        if self.binary:
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(payload)
+        self.frames_sent += 1
+        message_type = frame.message.get("type", "content")
+        messages_sent.inc(message_type)
+        # Text frames are ASCII-only JSON, so their length is their size in bytes
+        sent_bytes.observe(len(payload))
+        fanout_latency.observe(time.perf_counter() - frame.created, message_type)
+
+    async def stop(self):
+        """Close the connection and wait for the writer task to finish."""
+        self.close()
+        if self._task is not None:
+            await self._task
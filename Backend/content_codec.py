@@ -0,0 +1,80 @@
+import codecs
+import zlib
+from typing import Iterable, Iterator, Optional, Union
+
+# Prefix of compressed values. Plain content is stored as TEXT, compressed
+# content as a BLOB starting with this marker, so both formats can coexist in
+# one column and rows are migrated one at a time.
+ZLIB_MARKER = b"\x00zl1"
+
+
+class ContentCodec:
+    """
+    Encodes document text for storage. When enabled, values of at least
+    min_size bytes are stored zlib-compressed if that makes them smaller.
+    Decoding accepts either format regardless of the setting.
+    """
+
+    def __init__(self, enabled: bool = True, min_size: int = 1024, level: int = 6):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+
+    def encode(self, content: Optional[str]) -> Union[str, bytes, None]:
+        if not self.enabled or content is None or len(content) < self.min_size:
+            return content
+        raw = content.encode("utf-8")
+        if len(raw) < self.min_size:
+            return content
+        packed = ZLIB_MARKER + zlib.compress(raw, self.level)
+        return packed if len(packed) < len(raw) else content
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        if isinstance(value, bytes):
+            if value.startswith(ZLIB_MARKER):
+                return zlib.decompress(value[len(ZLIB_MARKER):]).decode("utf-8")
+            return value.decode("utf-8")
+        return value
+
+    def iter_decode(self, pieces: Iterable[bytes], max_piece: int = 64 * 1024) -> Iterator[str]:
+        """
+        Decode a stored value read as consecutive byte pieces (e.g. with
+        incremental blob I/O), yielding text as it becomes available so the
+        whole value never has to be in memory at once. Compressed input is
+        inflated at most max_piece bytes at a time, so a small, highly
+        compressed value can't expand in one go.
+        """
+        pieces = iter(pieces)
+        head = b""
+        # Enough bytes to tell the formats apart
+        for piece in pieces:
+            head += piece
+            if len(head) >= len(ZLIB_MARKER):
+                break
+        text = codecs.getincrementaldecoder("utf-8")()
+        if head.startswith(ZLIB_MARKER):
+            inflate = zlib.decompressobj()
+            for piece in _chain(head[len(ZLIB_MARKER):], pieces):
+                while True:
+                    out = inflate.decompress(piece, max_piece)
+                    piece = inflate.unconsumed_tail
+                    chunk = text.decode(out)
+                    if chunk:
+                        yield chunk
+                    # A full buffer may leave output pending even without input left
+                    if not piece and len(out) < max_piece:
+                        break
+            tail = text.decode(inflate.flush(), final=True)
+        else:
+            for piece in _chain(head, pieces):
+                chunk = text.decode(piece)
+                if chunk:
+                    yield chunk
+            tail = text.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def _chain(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest
@@ -1,16 +1,235 @@
+import logging
 import sqlite3
-from typing import Optional, List
+import queue
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
 import json
+import base64
+from room_cache import MISSING, RoomCache
+from content_codec import ContentCodec
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Tables whose `content` column goes through the content codec, with their key column
+_CONTENT_TABLES = {"rooms": "room_name", "admin_content": "id", "interview_notes": "id"}
+
+# Room columns other than content, as returned by get_room_info
+_ROOM_INFO_COLUMNS = "room_name, is_locked, created_at, updated_at"
+
+# Incremental blob I/O (Connection.blobopen) needs Python 3.11; older versions
+# read content with substr() instead
+_HAS_BLOBOPEN = hasattr(sqlite3.Connection, "blobopen")
+
+# SQLite 3.43+ deletes from a contentless FTS5 table by rowid alone. Older
+# builds need the indexed text back, so search_docs keeps it, codec-encoded
+_FTS_CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+
+# Upper bound for a name-prefix range scan: sorts after any string with the prefix
+_PREFIX_END = chr(0x10FFFF)
+
+def encode_cursor(created_at: str, room_name: str) -> str:
+    """Opaque keyset cursor pointing just past a room in the listing order."""
+    raw = json.dumps([created_at, room_name]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, room_name = json.loads(raw)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(created_at, str) or not isinstance(room_name, str):
+        raise ValueError("Invalid cursor")
+    return created_at, room_name
+
+def _iter_content_bytes(conn: sqlite3.Connection, rowid: int, chunk_size: int) -> Iterator[bytes]:
+    """A room's stored content (TEXT as UTF-8, or BLOB) in pieces of chunk_size bytes."""
+    if _HAS_BLOBOPEN:
+        with conn.blobopen("rooms", "content", rowid, readonly=True) as blob:
+            yield from iter(lambda: blob.read(chunk_size), b"")
+        return
+    offset = 1
+    while True:
+        row = conn.execute(
+            "SELECT substr(CAST(content AS BLOB), ?, ?) FROM rooms WHERE rowid = ?",
+            (offset, chunk_size, rowid)
+        ).fetchone()
+        if row is None or not row[0]:
+            return
+        yield row[0]
+        offset += len(row[0])
+
+class DocumentTooLarge(ValueError):
+    """A room's content is longer than the caller's size limit."""
+
+    def __init__(self, room_name: str, max_size: int):
+        super().__init__(f"Room {room_name!r} is larger than {max_size} characters")
+        self.room_name = room_name
+        self.max_size = max_size
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections. Each connection is configured once
+    (WAL journal, synchronous=NORMAL, busy timeout, mmap, statement cache)
+    and reused across requests instead of reconnecting on every query.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 8,
+        acquire_timeout: float = 30.0,
+        busy_timeout_ms: int = 5000,
+        mmap_size: int = 64 * 1024 * 1024,
+        cached_statements: int = 256,
+        health_check_after: float = 60.0,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        # Connections idle for longer than this are checked before reuse
+        self.health_check_after = health_check_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening one if none are idle."""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+        try:
+            while True:
+                try:
+                    conn, released_at = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - released_at < self.health_check_after or self._is_healthy(conn):
+                    return conn
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put((conn, time.monotonic()))
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
 
 class Database:
-    def __init__(self, db_path: str = "rooms.db"):
+    def __init__(
+        self,
+        db_path: str = "rooms.db",
+        pool_size: int = 8,
+        cache: Optional[RoomCache] = None,
+        codec: Optional[ContentCodec] = None,
+    ):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        # Optional cache of hot room rows, invalidated by every room write below
+        self.cache = cache
+        # How content columns are stored; reads understand every format either way
+        self.codec = codec if codec is not None else ContentCodec(enabled=False)
+        # Progress of compress_stored_content through each table
+        self._migration_cursor: Dict[str, object] = {}
+        self._migration_done: set = set()
+        self.rows_migrated = 0
         self.init_db()
 
+    def _row(self, row: Optional[sqlite3.Row]) -> Optional[dict]:
+        """Row as a dict with its content decoded."""
+        if row is None:
+            return None
+        result = dict(row)
+        if "content" in result:
+            result["content"] = self.codec.decode(result["content"])
+        return result
+
+    # The same interface as ShardedDatabase (see sharding.py), for an unsharded database
+
+    @property
+    def shards(self) -> List["Database"]:
+        return [self]
+
+    @property
+    def home(self) -> "Database":
+        """The database holding admin content."""
+        return self
+
+    def for_room(self, room_name: str) -> "Database":
+        """The database holding a room's rows."""
+        return self
+
+    def split_rooms(self, room_names: Iterable[str]) -> Dict["Database", List[str]]:
+        """Group room names by the database holding them."""
+        return {self: list(room_names)}
+
+    def gather(self, fn: Callable[["Database"], T]) -> List[T]:
+        """Run fn against every database; returns the results in shard order."""
+        return [fn(self)]
+
+    def write_each(self, work: Dict["Database", Callable[["Database"], T]]) -> List[T]:
+        """Run per-database writes; with one database they run here, on the caller's thread."""
+        return [fn(shard) for shard, fn in work.items()]
+
+    def _invalidate(self, room_name: Optional[str] = None):
+        if self.cache is not None:
+            self.cache.invalidate(room_name)
+
+    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Borrow a pooled connection; commits on success and rolls back on error."""
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.pool.release(conn)
+
+    def close(self):
+        self.pool.close()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -31,9 +250,41 @@ class Database:
                 cursor.execute("SELECT is_locked FROM rooms LIMIT 1")
             except sqlite3.OperationalError:
                 # Column doesn't exist, add it
-                print("Adding 'is_locked' column to rooms table")
+                logger.info("Adding 'is_locked' column to rooms table")
                 cursor.execute("ALTER TABLE rooms ADD COLUMN is_locked BOOLEAN DEFAULT 0")
 
+            # Serves the auto-lock scan (is_locked = 0 AND created_at <= ?) and
+            # room listings filtered by lock state, in listing order
+            cursor.execute("DROP INDEX IF EXISTS idx_rooms_locked_created")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rooms_locked_created_name ON rooms (is_locked, created_at, room_name)"
+            )
+            # Serves unfiltered room listings (newest first, keyset paginated)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rooms_created_name ON rooms (created_at, room_name)"
+            )
+            # Serves case-insensitive name-prefix searches
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rooms_name_nocase ON rooms (room_name COLLATE NOCASE)"
+            )
+
+            # Checkpoints of room content: zlib snapshots with diffs in between (see versions.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS room_versions (
+                    room_name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    content_length INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (room_name, version)
+                )
+            ''')
+            # Lets version retention scan version dates without reading the data blobs
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_room_versions_created ON room_versions (room_name, version, created_at)"
+            )
+
             # Create admin_content table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS admin_content (
@@ -45,6 +296,18 @@ class Database:
                 )
             ''')
 
+            # Uncompressed length of each admin content body, so the list projection
+            # can report sizes without reading the bodies
+            try:
+                cursor.execute("SELECT content_size FROM admin_content LIMIT 1")
+            except sqlite3.OperationalError:
+                cursor.execute("ALTER TABLE admin_content ADD COLUMN content_size INTEGER")
+            for row in cursor.execute("SELECT id, content FROM admin_content WHERE content_size IS NULL").fetchall():
+                cursor.execute(
+                    "UPDATE admin_content SET content_size = ? WHERE id = ?",
+                    (len(self.codec.decode(row["content"]) or ""), row["id"])
+                )
+
             # Create interview_notes table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS interview_notes (
@@ -56,8 +319,90 @@ class Database:
                     FOREIGN KEY (room_name) REFERENCES rooms (room_name) ON DELETE CASCADE
                 )
             ''')
+            # Notes are always looked up by room
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_interview_notes_room ON interview_notes (room_name)"
+            )
+            # Rows whose content changed since it was last copied into the search index
+            for table in _CONTENT_TABLES:
+                try:
+                    cursor.execute(f"SELECT search_dirty FROM {table} LIMIT 1")
+                except sqlite3.OperationalError:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN search_dirty INTEGER DEFAULT 1")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_search_dirty ON {table} (search_dirty) WHERE search_dirty = 1"
+                )
+            self._init_search(cursor)
             conn.commit()
 
+    def _init_search(self, cursor):
+        """
+        Create the full-text index (see search.py), if this SQLite build has FTS5.
+        The index is contentless: it holds terms only, and search builds
+        snippets from the rows themselves.
+        """
+        row = cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'search_index'").fetchone()
+        if row is not None and "content=''" not in row[0]:
+            # An index from before it went contentless kept a copy of every body; rebuild it
+            cursor.execute("DROP TABLE search_index")
+            cursor.execute("DROP TABLE IF EXISTS search_docs")
+            for table in _CONTENT_TABLES:
+                cursor.execute(f"UPDATE {table} SET search_dirty = 1")
+            row = None
+        options = ", contentless_delete=1" if _FTS_CONTENTLESS_DELETE else ""
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, body, content=''{options})")
+        except sqlite3.OperationalError as e:
+            logger.warning("Full-text search disabled: %s", e)
+            self.search_enabled = False
+            return
+        # Keep using an existing table's delete mode, even across SQLite upgrades
+        self._fts_delete_by_rowid = "contentless_delete=1" in (row[0] if row is not None else options)
+        # Maps each indexed document to its search_index rowid. body holds the
+        # indexed text (codec-encoded) when it is needed to delete the entry.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_docs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                title TEXT,
+                body BLOB,
+                UNIQUE (kind, ref)
+            )
+        ''')
+        self.search_enabled = True
+
+    def index_document(self, conn, kind: str, ref: str, title: str, body: str):
+        """Add or replace a document in the search index within the caller's transaction."""
+        conn.execute("INSERT INTO search_docs (kind, ref) VALUES (?, ?) ON CONFLICT (kind, ref) DO NOTHING", (kind, ref))
+        doc_id = conn.execute("SELECT id FROM search_docs WHERE kind = ? AND ref = ?", (kind, ref)).fetchone()[0]
+        self._remove_search_entry(conn, doc_id)
+        conn.execute("INSERT INTO search_index (rowid, title, body) VALUES (?, ?, ?)", (doc_id, title, body))
+        conn.execute(
+            "UPDATE search_docs SET title = ?, body = ? WHERE id = ?",
+            (title, None if self._fts_delete_by_rowid else self.codec.encode(body), doc_id)
+        )
+
+    def _remove_search_entry(self, conn, doc_id: int):
+        if self._fts_delete_by_rowid:
+            conn.execute("DELETE FROM search_index WHERE rowid = ?", (doc_id,))
+            return
+        row = conn.execute("SELECT title, body FROM search_docs WHERE id = ?", (doc_id,)).fetchone()
+        if row is not None and row[1] is not None:
+            conn.execute(
+                "INSERT INTO search_index (search_index, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                (doc_id, row[0], self.codec.decode(row[1]))
+            )
+
+    def _unindex(self, conn, kind: str, ref: str):
+        """Remove a document from the search index within the caller's transaction."""
+        if not self.search_enabled:
+            return
+        row = conn.execute("SELECT id FROM search_docs WHERE kind = ? AND ref = ?", (kind, ref)).fetchone()
+        if row is not None:
+            self._remove_search_entry(conn, row[0])
+            conn.execute("DELETE FROM search_docs WHERE id = ?", (row[0],))
+
     def create_room(self, room_name: str) -> bool:
         try:
             with self.get_connection() as conn:
@@ -70,15 +415,37 @@ class Database:
                 return True
         except sqlite3.IntegrityError:
             return False
+        finally:
+            self._invalidate(room_name)
 
     def get_room(self, room_name: str) -> Optional[dict]:
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM rooms WHERE room_name = ?", (room_name,))
-            row = cursor.fetchone()
-            if row:
-                return dict(row)
+        """A room's metadata and content. Use get_room_info when content isn't needed."""
+        room = self.get_room_info(room_name)
+        if room is None:
             return None
+        content = self.get_room_content(room_name)
+        if content is None:
+            # Deleted in between
+            return None
+        return {**room, "content": content}
+
+    def get_room_info(self, room_name: str) -> Optional[dict]:
+        """A room's name, lock flag and timestamps, without its content."""
+        if self.cache is not None:
+            cached = self.cache.get(room_name)
+            if cached is MISSING:
+                return None
+            if cached is not None:
+                return dict(cached)
+            generation = self.cache.generation
+        with self.get_connection() as conn:
+            row = conn.execute(f"SELECT {_ROOM_INFO_COLUMNS} FROM rooms WHERE room_name = ?", (room_name,)).fetchone()
+        room = dict(row) if row is not None else None
+        if self.cache is not None:
+            self.cache.put(room_name, room, generation)
+            if room is not None:
+                return dict(room)
+        return room
 
     def get_all_rooms(self) -> List[dict]:
         with self.get_connection() as conn:
@@ -86,12 +453,72 @@ class Database:
             cursor.execute("SELECT room_name, created_at, is_locked FROM rooms ORDER BY created_at DESC")
             return [dict(row) for row in cursor.fetchall()]
 
+    def list_rooms(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        is_locked: Optional[bool] = None,
+        prefix: Optional[str] = None,
+        include_total: bool = False,
+    ) -> dict:
+        """
+        One page of rooms, newest first, using keyset pagination on
+        (created_at, room_name) so every page costs the same however many
+        rooms exist. Returns the rooms, a cursor for the next page (None on
+        the last page) and, if asked, the number of rooms matching the filters.
+        prefix matches room names ignoring (ASCII) case.
+        """
+        conditions = []
+        params = []
+        if is_locked is not None:
+            conditions.append("is_locked = ?")
+            params.append(1 if is_locked else 0)
+        if prefix:
+            # NOCASE folds ASCII letters only, like the index serving this range
+            conditions.append("room_name >= ? COLLATE NOCASE AND room_name < ? COLLATE NOCASE")
+            params.extend([prefix, prefix + _PREFIX_END])
+        filters = list(conditions)
+        filter_params = list(params)
+        if cursor is not None:
+            conditions.append("(created_at, room_name) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT room_name, created_at, is_locked FROM rooms
+                {where}
+                ORDER BY created_at DESC, room_name DESC
+                LIMIT ?
+                """,
+                params + [limit + 1]
+            )
+            rooms = [dict(row) for row in cur.fetchall()]
+            total = None
+            if include_total:
+                where = f"WHERE {' AND '.join(filters)}" if filters else ""
+                cur.execute(f"SELECT COUNT(*) FROM rooms {where}", filter_params)
+                total = cur.fetchone()[0]
+
+        next_cursor = None
+        if len(rooms) > limit:
+            rooms = rooms[:limit]
+            last = rooms[-1]
+            next_cursor = encode_cursor(last['created_at'], last['room_name'])
+        return {"rooms": rooms, "next_cursor": next_cursor, "total": total}
+
     def delete_room(self, room_name: str) -> bool:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM rooms WHERE room_name = ?", (room_name,))
+            deleted = cursor.rowcount
+            conn.execute("DELETE FROM room_versions WHERE room_name = ?", (room_name,))
+            self._unindex(conn, "room", room_name)
             conn.commit()
-            return cursor.rowcount > 0
+        self._invalidate(room_name)
+        return deleted > 0
 
     def update_room_content(self, room_name: str, content: str) -> bool:
         with self.get_connection() as conn:
@@ -99,28 +526,94 @@ class Database:
             cursor.execute(
                 """
                 UPDATE rooms 
-                SET content = ?, updated_at = CURRENT_TIMESTAMP 
+                SET content = ?, search_dirty = 1, updated_at = CURRENT_TIMESTAMP 
                 WHERE room_name = ?
                 """,
-                (content, room_name)
+                (self.codec.encode(content), room_name)
             )
             conn.commit()
-            return cursor.rowcount > 0
+        self._invalidate(room_name)
+        return cursor.rowcount > 0
+
+    def update_rooms_content(self, contents: Dict[str, str]) -> int:
+        """Write the content of several rooms in one transaction. Returns rows updated."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                UPDATE rooms 
+                SET content = ?, search_dirty = 1, updated_at = CURRENT_TIMESTAMP 
+                WHERE room_name = ?
+                """,
+                [(self.codec.encode(content), room_name) for room_name, content in contents.items()]
+            )
+            conn.commit()
+        for room_name in contents:
+            self._invalidate(room_name)
+        return cursor.rowcount
 
     def get_room_content(self, room_name: str) -> Optional[str]:
+        if self.cache is not None:
+            content = self.cache.get_content(room_name)
+            if content is not None:
+                return content
+            generation = self.cache.generation
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT content FROM rooms WHERE room_name = ?", (room_name,))
             row = cursor.fetchone()
-            return row['content'] if row else None
+        if row is None:
+            return None
+        content = self.codec.decode(row['content']) or ""
+        if self.cache is not None:
+            self.cache.put_content(room_name, content, generation)
+        return content
+
+    def read_room_content(self, room_name: str, max_size: Optional[int] = None, chunk_size: int = 64 * 1024) -> Optional[str]:
+        """
+        Room content read chunk_size bytes at a time with incremental blob I/O
+        (or substr() before Python 3.11), instead of materializing the stored
+        value (and, when compressed, its decompressed copy) in one piece.
+        Raises DocumentTooLarge as soon as more than max_size characters have
+        been read. Doesn't fill the cache.
+        """
+        if self.cache is not None:
+            content = self.cache.get_content(room_name)
+            if content is not None:
+                if max_size is not None and len(content) > max_size:
+                    raise DocumentTooLarge(room_name, max_size)
+                return content
+        pieces = []
+        size = 0
+        with self.get_connection() as conn:
+            # One read transaction, so every chunk comes from the same version of the row
+            conn.execute("BEGIN")
+            row = conn.execute(
+                "SELECT rowid, content IS NULL AS empty FROM rooms WHERE room_name = ?", (room_name,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["empty"]:
+                return ""
+            with closing(_iter_content_bytes(conn, row["rowid"], chunk_size)) as stored:
+                for piece in self.codec.iter_decode(stored, chunk_size):
+                    size += len(piece)
+                    if max_size is not None and size > max_size:
+                        raise DocumentTooLarge(room_name, max_size)
+                    pieces.append(piece)
+        return "".join(pieces)
+
+    def room_exists(self, room_name: str) -> bool:
+        """Whether a room exists, without reading its content."""
+        return self.get_room_info(room_name) is not None
 
     def add_admin_content(self, title: str, content: str) -> bool:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "INSERT INTO admin_content (title, content) VALUES (?, ?)",
-                    (title, content)
+                    "INSERT INTO admin_content (title, content, content_size) VALUES (?, ?, ?)",
+                    (title, self.codec.encode(content), len(content))
                 )
                 conn.commit()
                 return True
@@ -132,11 +625,22 @@ class Database:
             cursor = conn.cursor()
             if content_id is not None:
                 cursor.execute("SELECT * FROM admin_content WHERE id = ?", (content_id,))
-                row = cursor.fetchone()
-                return dict(row) if row else None
+                return self._row(cursor.fetchone())
             else:
                 cursor.execute("SELECT * FROM admin_content ORDER BY created_at DESC")
-                return [dict(row) for row in cursor.fetchall()]
+                return [self._row(row) for row in cursor.fetchall()]
+
+    def list_admin_content(self) -> List[dict]:
+        """Every admin content item without its body: id, title, timestamps and size."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT id, title, created_at, updated_at, content_size AS size
+                FROM admin_content ORDER BY created_at DESC
+                """
+            )
+            return [dict(row) for row in cursor.fetchall()]
 
     def update_admin_content(self, content_id: int, title: str, content: str) -> bool:
         with self.get_connection() as conn:
@@ -144,10 +648,10 @@ class Database:
             cursor.execute(
                 """
                 UPDATE admin_content 
-                SET title = ?, content = ?, updated_at = CURRENT_TIMESTAMP 
+                SET title = ?, content = ?, content_size = ?, search_dirty = 1, updated_at = CURRENT_TIMESTAMP 
                 WHERE id = ?
                 """,
-                (title, content, content_id)
+                (title, self.codec.encode(content), len(content), content_id)
             )
             conn.commit()
             return cursor.rowcount > 0
@@ -156,6 +660,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM admin_content WHERE id = ?", (content_id,))
+            self._unindex(conn, "admin", str(content_id))
             conn.commit()
             return cursor.rowcount > 0
             
@@ -172,15 +677,13 @@ class Database:
                 (1 if locked else 0, room_name)
             )
             conn.commit()
-            return cursor.rowcount > 0
+        self._invalidate(room_name)
+        return cursor.rowcount > 0
             
     def is_room_locked(self, room_name: str) -> bool:
         """Check if a room is locked"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT is_locked FROM rooms WHERE room_name = ?", (room_name,))
-            row = cursor.fetchone()
-            return bool(row['is_locked']) if row else False
+        room = self.get_room_info(room_name)
+        return bool(room['is_locked']) if room else False
             
     def lock_rooms_older_than_days(self, days: int = 30) -> int:
         """
@@ -189,18 +692,21 @@ class Database:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            # SQLite date calculation to find rooms older than specified days
+            # created_at is stored as 'YYYY-MM-DD HH:MM:SS', so it compares
+            # directly with the cutoff and the index on (is_locked, created_at) applies
             cursor.execute(
                 """
                 UPDATE rooms 
                 SET is_locked = 1, updated_at = CURRENT_TIMESTAMP 
                 WHERE is_locked = 0 
-                AND datetime(created_at) <= datetime('now', ?)
+                AND created_at <= datetime('now', ?)
                 """,
                 (f'-{days} days',)
             )
             conn.commit()
-            return cursor.rowcount
+        if cursor.rowcount:
+            self._invalidate()
+        return cursor.rowcount
 
     def get_interview_notes(self, room_name: str) -> Optional[dict]:
         """Get interview notes for a specific room"""
@@ -210,8 +716,7 @@ class Database:
                 "SELECT * FROM interview_notes WHERE room_name = ?",
                 (room_name,)
             )
-            row = cursor.fetchone()
-            return dict(row) if row else None
+            return self._row(cursor.fetchone())
 
     def create_or_update_interview_notes(self, room_name: str, content: str) -> bool:
         """Create or update interview notes for a room"""
@@ -221,10 +726,10 @@ class Database:
             cursor.execute(
                 """
                 UPDATE interview_notes 
-                SET content = ?, updated_at = CURRENT_TIMESTAMP 
+                SET content = ?, search_dirty = 1, updated_at = CURRENT_TIMESTAMP 
                 WHERE room_name = ?
                 """,
-                (content, room_name)
+                (self.codec.encode(content), room_name)
             )
             
             if cursor.rowcount == 0:
@@ -234,7 +739,7 @@ class Database:
                     INSERT INTO interview_notes (room_name, content)
                     VALUES (?, ?)
                     """,
-                    (room_name, content)
+                    (room_name, self.codec.encode(content))
                 )
             
             conn.commit()
@@ -248,5 +753,65 @@ class Database:
                 "DELETE FROM interview_notes WHERE room_name = ?",
                 (room_name,)
             )
+            self._unindex(conn, "notes", room_name)
             conn.commit()
             return cursor.rowcount > 0
+
+    def compress_stored_content(self, batch_size: int = 200) -> int:
+        """
+        Lazily migrate content written before compression was enabled: re-encode
+        the next batch_size plain-text rows the codec would now compress.
+        Returns how many rows were examined; 0 once every table has been scanned.
+        """
+        if not self.codec.enabled:
+            return 0
+        for table, key in _CONTENT_TABLES.items():
+            if table in self._migration_done:
+                continue
+            after = self._migration_cursor.get(table)
+            with self.get_connection() as conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT {key}, content FROM {table}
+                    WHERE typeof(content) = 'text' AND length(content) >= ?
+                    {f"AND {key} > ?" if after is not None else ""}
+                    ORDER BY {key} LIMIT ?
+                    """,
+                    [self.codec.min_size] + ([after] if after is not None else []) + [batch_size]
+                ).fetchall()
+                for row in rows:
+                    encoded = self.codec.encode(row["content"])
+                    if not isinstance(encoded, bytes):
+                        continue
+                    # Only if the row hasn't been rewritten since it was read
+                    cursor = conn.execute(
+                        f"UPDATE {table} SET content = ? WHERE {key} = ? AND content = ?",
+                        (encoded, row[key], row["content"])
+                    )
+                    self.rows_migrated += cursor.rowcount
+                    if table == "rooms" and cursor.rowcount:
+                        self._invalidate(row[key])
+            if len(rows) < batch_size:
+                self._migration_done.add(table)
+            if rows:
+                self._migration_cursor[table] = rows[-1][key]
+                return len(rows)
+        return 0
+
+    def content_storage_stats(self) -> dict:
+        """Rows and stored bytes per content format, per table."""
+        stats = {}
+        with self.get_connection() as conn:
+            for table in _CONTENT_TABLES:
+                rows = conn.execute(
+                    f"""
+                    SELECT typeof(content) AS format, COUNT(*) AS count,
+                           COALESCE(SUM(length(CAST(content AS BLOB))), 0) AS bytes
+                    FROM {table} GROUP BY typeof(content)
+                    """
+                ).fetchall()
+                stats[table] = {
+                    ("compressed" if row["format"] == "blob" else row["format"]): {"rows": row["count"], "bytes": row["bytes"]}
+                    for row in rows
+                }
+        return stats
@@ -0,0 +1,329 @@
+"""
+Operation-based document sync for /ws/{room_name}.
+
+Clients that connect with ``?sync=ops`` exchange small edit operations instead
+of the whole document:
+
+    client -> server  {"type": "ops", "base_seq": 12, "ops": [...]}
+    server -> sender  {"type": "ack", "seq": 13}
+    server -> others  {"type": "ops", "seq": 13, "ops": [...], "userId": "..."}
+
+An op is either ``{"op": "insert", "pos": int, "text": str}`` or
+``{"op": "delete", "pos": int, "length": int}``. Ops in one message are applied
+in order, positions are Unicode code points into the document as it stands
+after the previous op. ``base_seq`` is the last server sequence number the
+client had applied; ops from concurrent edits the client has not seen yet are
+rebased (operational transform) before being applied.
+
+Full ``{"type": "content"}`` messages from older clients are still accepted:
+they are turned into a single replace (delete + insert) so op clients keep
+receiving ops and content clients keep receiving full documents.
+"""
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Number of applied changes kept for rebasing late ops
+DEFAULT_HISTORY_SIZE = 500
+# Most ops accepted in one client message
+DEFAULT_MAX_OPS = 200
+# Most (op, concurrent op) pairs rebased for one message; clients further
+# behind than this resync from a snapshot instead
+DEFAULT_MAX_REBASE_WORK = 20000
+
+
+class OpError(ValueError):
+    """Raised when a client sends a malformed or out-of-range op."""
+
+
+def insert_op(pos: int, text: str) -> dict:
+    return {"op": "insert", "pos": pos, "text": text}
+
+
+def delete_op(pos: int, length: int) -> dict:
+    return {"op": "delete", "pos": pos, "length": length}
+
+
+def normalize_ops(raw_ops, max_ops: int = DEFAULT_MAX_OPS) -> List[dict]:
+    """Validate client ops and return clean copies (dropping no-op entries)."""
+    if not isinstance(raw_ops, list):
+        raise OpError("ops must be a list")
+    if len(raw_ops) > max_ops:
+        raise OpError(f"at most {max_ops} ops per message")
+    ops = []
+    for raw in raw_ops:
+        if not isinstance(raw, dict):
+            raise OpError("op must be an object")
+        pos = raw.get("pos")
+        if not isinstance(pos, int) or isinstance(pos, bool) or pos < 0:
+            raise OpError("op pos must be a non-negative integer")
+        if raw.get("op") == "insert":
+            text = raw.get("text")
+            if not isinstance(text, str):
+                raise OpError("insert text must be a string")
+            if text:
+                ops.append(insert_op(pos, text))
+        elif raw.get("op") == "delete":
+            length = raw.get("length")
+            if not isinstance(length, int) or isinstance(length, bool) or length < 0:
+                raise OpError("delete length must be a non-negative integer")
+            if length:
+                ops.append(delete_op(pos, length))
+        else:
+            raise OpError(f"unknown op {raw.get('op')!r}")
+    return ops
+
+
+def apply_ops(content: str, ops: List[dict]) -> str:
+    """
+    Apply ops in order to content. The document is copied once per call
+    rather than once per op: ops edit a list of (text, start, end) pieces
+    referring to content and the inserted texts, which are joined at the end.
+    """
+    if len(ops) == 1:
+        return _apply_op(content, ops[0])
+    pieces = [(content, 0, len(content))]
+    length = len(content)
+    for op in ops:
+        pos = op["pos"]
+        if op["op"] == "insert":
+            if pos > length:
+                raise OpError("insert position out of range")
+            at = _split_pieces(pieces, pos)
+            pieces.insert(at, (op["text"], 0, len(op["text"])))
+            length += len(op["text"])
+        else:
+            end = pos + op["length"]
+            if end > length:
+                raise OpError("delete range out of range")
+            first = _split_pieces(pieces, pos)
+            del pieces[first:_split_pieces(pieces, end)]
+            length -= op["length"]
+    return "".join(text[start:end] for text, start, end in pieces)
+
+
+def _apply_op(content: str, op: dict) -> str:
+    pos = op["pos"]
+    if op["op"] == "insert":
+        if pos > len(content):
+            raise OpError("insert position out of range")
+        return content[:pos] + op["text"] + content[pos:]
+    end = pos + op["length"]
+    if end > len(content):
+        raise OpError("delete range out of range")
+    return content[:pos] + content[end:]
+
+
+def _split_pieces(pieces: List[Tuple[str, int, int]], pos: int) -> int:
+    """Split the piece containing pos so one starts there, and return its index."""
+    offset = 0
+    for index, (text, start, end) in enumerate(pieces):
+        size = end - start
+        if offset + size > pos:
+            if offset == pos:
+                return index
+            cut = start + pos - offset
+            pieces[index:index + 1] = [(text, start, cut), (text, cut, end)]
+            return index + 1
+        offset += size
+    return len(pieces)
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    """Length of the common prefix of a and b, at most limit."""
+    # Binary search comparing slices, so the characters are compared in C
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """Length of the common suffix of a and b, at most limit."""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def diff_to_ops(old: str, new: str) -> List[dict]:
+    """Describe the change from old to new as at most one delete and one insert."""
+    if old == new:
+        return []
+    start = _common_prefix(old, new, min(len(old), len(new)))
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    ops = []
+    if old_end > start:
+        ops.append(delete_op(start, old_end - start))
+    if new_end > start:
+        ops.append(insert_op(start, new[start:new_end]))
+    return ops
+
+
+def _transform_op(op: dict, other: dict, op_wins: bool) -> List[dict]:
+    """Rewrite op so it applies after other. May split a delete in two."""
+    pos = op["pos"]
+    if op["op"] == "insert":
+        if other["op"] == "insert":
+            if pos < other["pos"] or (pos == other["pos"] and op_wins):
+                return [op]
+            return [insert_op(pos + len(other["text"]), op["text"])]
+        other_end = other["pos"] + other["length"]
+        if pos <= other["pos"]:
+            return [op]
+        if pos >= other_end:
+            return [insert_op(pos - other["length"], op["text"])]
+        return [insert_op(other["pos"], op["text"])]
+
+    length = op["length"]
+    end = pos + length
+    if other["op"] == "insert":
+        at = other["pos"]
+        inserted = len(other["text"])
+        if at <= pos:
+            return [delete_op(pos + inserted, length)]
+        if at >= end:
+            return [op]
+        # The insert landed inside the range: delete around it
+        head = at - pos
+        return [delete_op(pos, head), delete_op(pos + inserted, length - head)]
+
+    other_pos = other["pos"]
+    other_end = other_pos + other["length"]
+    if end <= other_pos:
+        return [op]
+    if pos >= other_end:
+        return [delete_op(pos - other["length"], length)]
+    overlap = min(end, other_end) - max(pos, other_pos)
+    remaining = length - overlap
+    if remaining == 0:
+        return []
+    return [delete_op(min(pos, other_pos), remaining)]
+
+
+def transform(ops: List[dict], against: List[dict], ops_win: bool = False) -> Tuple[List[dict], List[dict]]:
+    """
+    Transform two concurrent op sequences against each other.
+    Returns (ops', against') where ops' applies after against and vice versa.
+    """
+    transformed = []
+    for other in against:
+        ops, rewritten = _transform_past(ops, other, ops_win)
+        transformed.extend(rewritten)
+    return ops, transformed
+
+
+def _transform_past(ops: List[dict], other: dict, ops_win: bool) -> Tuple[List[dict], List[dict]]:
+    """Transform a sequence past one concurrent op, returning (ops', other as ops')."""
+    result = []
+    others = [other]
+    for op in ops:
+        parts = [op]
+        rewritten = []
+        for item in others:
+            if len(parts) == 1:
+                rewritten.extend(_transform_op(item, parts[0], not ops_win))
+                parts = _transform_op(parts[0], item, ops_win)
+            else:
+                # op was split (or removed) by an earlier item. Only deletes
+                # split and they never split item, so this nests one level at most
+                parts, item_parts = transform(parts, [item], ops_win)
+                rewritten.extend(item_parts)
+        result.extend(parts)
+        others = rewritten
+    return result, others
+
+
+class RoomDocument:
+    """Authoritative in-memory copy of a room's content with a change log."""
+
+    def __init__(self, content: str = "", seq: int = 0, history_size: int = DEFAULT_HISTORY_SIZE):
+        self.content = content
+        self.seq = seq
+        # Identifies this in-memory copy; sequence numbers are only comparable within one epoch
+        self.epoch = uuid.uuid4().hex
+        # (seq, ops) for the most recent changes, oldest first
+        self.history: Deque[Tuple[int, List[dict]]] = deque(maxlen=history_size)
+
+    def ops_since(self, seq: int) -> Optional[List[dict]]:
+        """All ops applied after seq, or None if the history no longer reaches back that far."""
+        if seq > self.seq or seq < 0:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.history or self.history[0][0] > seq + 1:
+            return None
+        ops = []
+        for entry_seq, entry_ops in self.history:
+            if entry_seq > seq:
+                ops.extend(entry_ops)
+        return ops
+
+    def apply(
+        self,
+        base_seq: int,
+        ops: List[dict],
+        max_size: Optional[int] = None,
+        max_rebase_work: int = DEFAULT_MAX_REBASE_WORK
+    ) -> Optional[List[dict]]:
+        """
+        Rebase ops made against base_seq onto the current document and apply them.
+        Returns the ops as applied (possibly empty), or None if base_seq is too old
+        (or rebasing would take more than max_rebase_work op pairs) and the client
+        must resync from a full snapshot. Raises OpError, leaving the document
+        unchanged, if the result would be longer than max_size.
+        """
+        concurrent = self.ops_since(base_seq)
+        if concurrent is None or len(ops) * len(concurrent) > max_rebase_work:
+            return None
+        rebased, _ = transform(ops, concurrent)
+        content = apply_ops(self.content, rebased)
+        if max_size is not None and len(content) > max_size:
+            raise OpError(f"document would exceed {max_size} characters")
+        self.content = content
+        if rebased:
+            self._record(rebased)
+        return rebased
+
+    def replace(self, content: str) -> List[dict]:
+        """Replace the whole document, recording the change as ops."""
+        ops = diff_to_ops(self.content, content)
+        self.content = content
+        if ops:
+            self._record(ops)
+        return ops
+
+    def _record(self, ops: List[dict]):
+        self.seq += 1
+        self.history.append((self.seq, ops))
+
+
+class DocumentStore:
+    """RoomDocument per active room."""
+
+    def __init__(self, history_size: int = DEFAULT_HISTORY_SIZE):
+        self.history_size = history_size
+        self.documents: Dict[str, RoomDocument] = {}
+
+    def get(self, room_name: str) -> Optional[RoomDocument]:
+        return self.documents.get(room_name)
+
+    def load(self, room_name: str, content: str) -> RoomDocument:
+        """Return the room's document, creating it from content if it isn't loaded."""
+        document = self.documents.get(room_name)
+        if document is None:
+            document = RoomDocument(content, history_size=self.history_size)
+            self.documents[room_name] = document
+        return document
+
+    def discard(self, room_name: str):
+        self.documents.pop(room_name, None)
@@ -0,0 +1,76 @@
+import json
+import time
+from typing import Iterable, Iterator, Optional
+
+try:
+    import msgpack
+except ImportError:  # The binary subprotocol is only offered when msgpack is installed
+    msgpack = None
+
+# Sec-WebSocket-Protocol value clients offer to exchange MessagePack binary frames
+MSGPACK_SUBPROTOCOL = "collab.msgpack"
+
+
+class Frame:
+    """
+    An outgoing message that is encoded at most once per wire format, so one
+    broadcast costs one json.dumps (and/or one msgpack pack) however many
+    clients receive it.
+    """
+
+    __slots__ = ("message", "created", "_text", "_binary")
+
+    def __init__(self, message: dict):
+        self.message = message
+        # perf_counter() at creation, for fan-out latency metrics
+        self.created = time.perf_counter()
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.message)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = msgpack.packb(self.message, use_bin_type=True)
+        return self._binary
+
+
+def content_chunk_frames(content: str, seq: int, chunk_size: int) -> Iterator[Frame]:
+    """
+    A document snapshot as content_chunk frames of at most chunk_size
+    characters, followed by a content_end marker. Generated lazily, so only
+    the chunk being sent is ever copied out of the document.
+
+        {"type": "content_chunk", "seq", "offset", "length", "data"}
+        {"type": "content_end", "seq", "length"}
+    """
+    length = len(content)
+    for offset in range(0, length, chunk_size):
+        yield Frame({
+            "type": "content_chunk",
+            "seq": seq,
+            "offset": offset,
+            "length": length,
+            "data": content[offset:offset + chunk_size]
+        })
+    yield Frame({"type": "content_end", "seq": seq, "length": length})
+
+
+def negotiate_subprotocol(offered: Iterable[str]) -> Optional[str]:
+    """Pick the subprotocol to accept from those the client offered, if any."""
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in offered:
+        return MSGPACK_SUBPROTOCOL
+    return None
+
+
+def unpack_binary(data: bytes):
+    """Decode a MessagePack frame from a binary client. Raises ValueError if invalid."""
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack frame: {e}") from e
@@ -1,15 +1,147 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Set, Optional
-from database import Database
+from database import Database, DocumentTooLarge
+from sharding import ShardedDatabase
+from async_database import AsyncDatabase
+from room_cache import RoomCache
+from admin_cache import LISTING, AdminContentCache, CachedResponse
+from document_sync import DocumentStore, OpError, normalize_ops
+from write_buffer import WriteBehindBuffer
+from connections import ClientConnection
+from frames import Frame, content_chunk_frames, negotiate_subprotocol, unpack_binary
+from selections import SelectionAggregator
+from backplane import create_backplane
+from sessions import SessionStore
+from presence import PresenceDebouncer
+from versions import VersionStore
+from content_codec import ContentCodec
+from ws_compression import deflate_stats
+from search import SearchIndex
+from log_setup import setup_logging
+from metrics import registry, messages_received, received_bytes
+from backup import IMPORT_BATCH, BackupError, backup_database, import_records, iter_export
+import time
 import os
+import logging
+from datetime import datetime, timezone
 from pydantic import BaseModel
 import json
 
+# Log level for the backend; per-connection events are logged at DEBUG
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 # Global password for locked rooms
 ROOM_PASSWORD = os.environ.get("ROOM_PASSWORD", "TechPathAi24")
 # Global password for interview notes
 INTERVIEW_NOTES_PASSWORD = "meet123"
+# Rooms older than AUTO_LOCK_DAYS are locked by a background job every
+# AUTO_LOCK_INTERVAL seconds
+AUTO_LOCK_DAYS = int(os.environ.get("AUTO_LOCK_DAYS", "30"))
+AUTO_LOCK_INTERVAL = float(os.environ.get("AUTO_LOCK_INTERVAL", "3600"))
+# Default and maximum number of rooms returned per GET /rooms page
+ROOMS_PAGE_SIZE = int(os.environ.get("ROOMS_PAGE_SIZE", "100"))
+ROOMS_MAX_PAGE_SIZE = int(os.environ.get("ROOMS_MAX_PAGE_SIZE", "500"))
+# How often buffered room content is written to the database, and how many
+# dirty rooms force an early flush
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", "1.0"))
+WRITE_BUFFER_MAX_DIRTY = int(os.environ.get("WRITE_BUFFER_MAX_DIRTY", "100"))
+# Maximum number of pooled SQLite connections per worker
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+# Threads serving database reads (writes always go through one writer thread)
+DB_READ_WORKERS = int(os.environ.get("DB_READ_WORKERS", "4"))
+# Number of SQLite files rooms are spread over, each with its own writer (see
+# sharding.py). 1 keeps everything in rooms.db; reshard before changing it
+DB_SHARDS = int(os.environ.get("DB_SHARDS", "1"))
+# Hot room metadata rows kept in memory, and how long an entry may be served (seconds)
+ROOM_CACHE_SIZE = int(os.environ.get("ROOM_CACHE_SIZE", "1024"))
+ROOM_CACHE_TTL = float(os.environ.get("ROOM_CACHE_TTL", "30"))
+# Memory (bytes) the room cache may spend on content; rooms are cached without it beyond that
+ROOM_CACHE_CONTENT_BYTES = int(os.environ.get("ROOM_CACHE_CONTENT_BYTES", str(64 * 1024 * 1024)))
+# Serialized admin content responses kept in memory (single items, besides the
+# list), and how long one may be served (seconds)
+ADMIN_CACHE_ITEMS = int(os.environ.get("ADMIN_CACHE_ITEMS", "256"))
+ADMIN_CACHE_TTL = float(os.environ.get("ADMIN_CACHE_TTL", "300"))
+# Frames queued for one websocket client before it is disconnected as too slow
+SEND_QUEUE_MAX = int(os.environ.get("SEND_QUEUE_MAX", "256"))
+# Selection events are batched per room and sent this many times per second,
+# with at most SELECTION_MAX_BATCH users per frame
+SELECTION_TICK_HZ = float(os.environ.get("SELECTION_TICK_HZ", "25"))
+SELECTION_MAX_BATCH = int(os.environ.get("SELECTION_MAX_BATCH", "50"))
+# Cross-worker relay of room events: "local" for a single worker, "sqlite" to
+# run several workers (uvicorn --workers N) against a shared broker file
+BACKPLANE = os.environ.get("BACKPLANE", "local")
+BACKPLANE_PATH = os.environ.get("BACKPLANE_PATH", "backplane.db")
+BACKPLANE_POLL_INTERVAL = float(os.environ.get("BACKPLANE_POLL_INTERVAL", "0.02"))
+# How often each worker re-announces its per-room user counts (seconds);
+# counts from a worker that stops announcing expire after three intervals
+PRESENCE_REFRESH_INTERVAL = float(os.environ.get("PRESENCE_REFRESH_INTERVAL", "10"))
+# Joins and leaves within this many seconds are sent as one user-count update
+PRESENCE_DEBOUNCE = float(os.environ.get("PRESENCE_DEBOUNCE", "0.1"))
+# The server pings every client every HEARTBEAT_INTERVAL seconds; a client that
+# sends nothing (not even a pong) for HEARTBEAT_TIMEOUT seconds is disconnected.
+# The same periodic sweep evicts dead connections and empty room entries.
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", "15"))
+HEARTBEAT_TIMEOUT = float(os.environ.get("HEARTBEAT_TIMEOUT", "45"))
+# Close code for clients that missed their heartbeats (RFC 6455 "Going Away")
+HEARTBEAT_CLOSE_CODE = 1001
+# Maximum number of rooms one GET /presence call may ask about
+PRESENCE_MAX_ROOMS = int(os.environ.get("PRESENCE_MAX_ROOMS", "1000"))
+# Reconnecting clients can resume their session within SESSION_TTL seconds and
+# catch up from the last REPLAY_BUFFER_SIZE changes of a room. A room's
+# document stays in memory for RESUME_GRACE seconds after its last client leaves.
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "300"))
+REPLAY_BUFFER_SIZE = int(os.environ.get("REPLAY_BUFFER_SIZE", "500"))
+RESUME_GRACE = float(os.environ.get("RESUME_GRACE", "60"))
+# Most edit operations accepted in one "ops" message
+MAX_OPS_PER_MESSAGE = int(os.environ.get("MAX_OPS_PER_MESSAGE", "200"))
+# Longest room document (characters) the server loads or accepts. Larger rooms
+# can't be joined, and edits that would grow a document past it are rejected
+MAX_DOCUMENT_SIZE = int(os.environ.get("MAX_DOCUMENT_SIZE", str(5 * 1024 * 1024)))
+# Snapshots longer than this many characters are sent as a series of
+# content_chunk frames of this size and a content_end marker
+CONTENT_CHUNK_SIZE = int(os.environ.get("CONTENT_CHUNK_SIZE", "65536"))
+# Close code for clients joining a room over MAX_DOCUMENT_SIZE (RFC 6455 "Message Too Big")
+DOCUMENT_TOO_LARGE_CLOSE_CODE = 1009
+# Close code for clients of a room that was deleted (application-defined range)
+ROOM_DELETED_CLOSE_CODE = 4404
+# Room version history: a checkpoint at most every VERSION_MIN_INTERVAL seconds
+# per room, a full snapshot every VERSION_SNAPSHOT_EVERY versions (diffs in
+# between). Versions older than VERSION_COMPACT_AFTER_DAYS are thinned to one
+# per day and dropped after VERSION_RETENTION_DAYS by a job that runs every
+# VERSION_MAINTENANCE_INTERVAL seconds.
+VERSION_MIN_INTERVAL = float(os.environ.get("VERSION_MIN_INTERVAL", "60"))
+VERSION_SNAPSHOT_EVERY = int(os.environ.get("VERSION_SNAPSHOT_EVERY", "20"))
+VERSION_COMPACT_AFTER_DAYS = float(os.environ.get("VERSION_COMPACT_AFTER_DAYS", "7"))
+VERSION_RETENTION_DAYS = float(os.environ.get("VERSION_RETENTION_DAYS", "90"))
+VERSION_MAINTENANCE_INTERVAL = float(os.environ.get("VERSION_MAINTENANCE_INTERVAL", "300"))
+# Store room, admin and interview-note content zlib-compressed when it is at
+# least CONTENT_COMPRESSION_MIN_SIZE bytes. Existing rows are migrated in the
+# background, CONTENT_MIGRATION_BATCH rows at a time.
+CONTENT_COMPRESSION = os.environ.get("CONTENT_COMPRESSION", "1") == "1"
+CONTENT_COMPRESSION_MIN_SIZE = int(os.environ.get("CONTENT_COMPRESSION_MIN_SIZE", "512"))
+CONTENT_COMPRESSION_LEVEL = int(os.environ.get("CONTENT_COMPRESSION_LEVEL", "6"))
+CONTENT_MIGRATION_BATCH = int(os.environ.get("CONTENT_MIGRATION_BATCH", "200"))
+# Changed rooms, notes and admin content are copied into the full-text index
+# every SEARCH_INDEX_INTERVAL seconds, SEARCH_INDEX_BATCH rows per transaction
+SEARCH_INDEX_INTERVAL = float(os.environ.get("SEARCH_INDEX_INTERVAL", "5"))
+SEARCH_INDEX_BATCH = int(os.environ.get("SEARCH_INDEX_BATCH", "50"))
+# Where POST /admin/backup writes database copies, and how many pages each
+# online backup step copies for databases not in WAL mode (WAL databases are
+# copied in one step)
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "1024"))
+# Default and maximum number of search results per page
+SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = int(os.environ.get("SEARCH_MAX_PAGE_SIZE", "100"))
+
+setup_logging(LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Inbound message types counted by name in metrics; anything else is "other"
+METRIC_MESSAGE_TYPES = {"content", "ops", "selection", "selection_clear", "ping", "pong"}
 
 # Password validation model
 class PasswordValidation(BaseModel):
@@ -20,10 +152,182 @@ class InterviewNotesUpdate(BaseModel):
     content: str
     password: str
 
-app = FastAPI()
+async def flush_write_buffer_periodically():
+    """Persist buffered room content on a fixed interval."""
+    while True:
+        await asyncio.sleep(write_buffer.flush_interval)
+        try:
+            await db.run_write(write_buffer.flush)
+        except Exception as e:
+            logger.exception("Failed to flush room content: %s", e)
+
+# Outcome of the most recent scheduled auto-lock run
+last_auto_lock: Dict[str, object] = {"ran_at": None, "locked_count": None, "days": AUTO_LOCK_DAYS}
+
+async def auto_lock_periodically():
+    """Lock rooms older than AUTO_LOCK_DAYS on startup and then every AUTO_LOCK_INTERVAL."""
+    while True:
+        try:
+            locked_count = await db.lock_rooms_older_than_days(AUTO_LOCK_DAYS)
+            if locked_count:
+                publish_invalidation(None)
+            last_auto_lock.update({
+                "ran_at": datetime.now(timezone.utc).isoformat(),
+                "locked_count": locked_count,
+                "days": AUTO_LOCK_DAYS
+            })
+        except Exception as e:
+            logger.exception("Failed to auto-lock old rooms: %s", e)
+        await asyncio.sleep(AUTO_LOCK_INTERVAL)
+
+# Outcome of the most recent version retention run
+last_version_maintenance: Dict[str, object] = {"ran_at": None, "rooms_compacted": None, "versions_removed": None}
+
+async def maintain_versions_periodically():
+    """Record rate-limited checkpoints that are now due, and apply version retention."""
+    next_retention = 0.0
+    while True:
+        await asyncio.sleep(min(VERSION_MIN_INTERVAL, VERSION_MAINTENANCE_INTERVAL))
+        try:
+            await db.run_write(version_store.record_deferred)
+            if time.monotonic() >= next_retention:
+                # One call per room on its shard's writer, so flushes aren't held up behind the whole run
+                compacted = removed = 0
+                for room_name in await db.run_read(version_store.retention_candidates):
+                    dropped = await db.run_room_write(room_name, version_store.compact_room, room_name)
+                    if dropped:
+                        compacted += 1
+                        removed += dropped
+                last_version_maintenance.update(
+                    rooms_compacted=compacted,
+                    versions_removed=removed,
+                    ran_at=datetime.now(timezone.utc).isoformat()
+                )
+                next_retention = time.monotonic() + VERSION_MAINTENANCE_INTERVAL
+        except Exception as e:
+            logger.exception("Failed to maintain room versions: %s", e)
+
+async def migrate_stored_content():
+    """Compress content stored before compression was enabled, a batch at a time."""
+    while True:
+        try:
+            if not await db.compress_stored_content(CONTENT_MIGRATION_BATCH):
+                return
+        except Exception as e:
+            logger.exception("Failed to migrate stored content: %s", e)
+            await asyncio.sleep(60)
+        # Leave the writer thread to live traffic between batches
+        await asyncio.sleep(0.5)
 
-# Initialize database
-db = Database()
+async def index_search_periodically():
+    """Keep the full-text index up to date with changed content."""
+    while True:
+        try:
+            indexed = await db.run_write(search_index.index_pending, SEARCH_INDEX_BATCH)
+        except Exception as e:
+            logger.exception("Failed to update search index: %s", e)
+            indexed = 0
+        # Catch up quickly after bulk changes, otherwise wait for the next round
+        await asyncio.sleep(0.1 if indexed >= SEARCH_INDEX_BATCH else SEARCH_INDEX_INTERVAL)
+
+# Totals from the connection sweeper
+reaper_stats: Dict[str, object] = {
+    "sweeps": 0,
+    "connections_reaped": 0,
+    "rooms_reaped": 0,
+    "sessions_pruned": 0,
+    "heartbeat_timeouts": 0,
+    "last_sweep_at": None,
+}
+async def sweep_connections_periodically():
+    """Ping clients, and evict dead connections and empty rooms left behind."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            stale_before = time.monotonic() - HEARTBEAT_TIMEOUT - HEARTBEAT_INTERVAL
+            ping_frame = Frame({"type": "ping"})
+            for room_name in list(active_connections):
+                clients = active_connections.get(room_name)
+                if not clients:
+                    # Registered but never joined (or already emptied)
+                    active_connections.pop(room_name, None)
+                    reaper_stats["rooms_reaped"] += 1
+                    continue
+                for client in list(clients):
+                    if client.closed or client.last_seen < stale_before:
+                        # Its handler should have unregistered it by now
+                        client.close(HEARTBEAT_CLOSE_CODE, abort=True)
+                        await disconnect_client(room_name, client)
+                        reaper_stats["connections_reaped"] += 1
+                    else:
+                        client.send(ping_frame, coalesce_key="ping")
+            reaper_stats["sessions_pruned"] += sessions.prune()
+            reaper_stats["sweeps"] += 1
+            reaper_stats["last_sweep_at"] = datetime.now(timezone.utc).isoformat()
+        except Exception as e:
+            logger.exception("Failed to sweep connections: %s", e)
+
+async def refresh_presence_periodically():
+    """Re-announce this worker's user counts so other workers' views don't expire."""
+    while True:
+        await asyncio.sleep(PRESENCE_REFRESH_INTERVAL)
+        for room_name in backplane.hosted_rooms:
+            publish_presence(room_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await backplane.start(handle_backplane_event)
+    flush_task = asyncio.create_task(flush_write_buffer_periodically())
+    selections_task = asyncio.create_task(selections.run())
+    auto_lock_task = asyncio.create_task(auto_lock_periodically())
+    presence_task = asyncio.create_task(refresh_presence_periodically())
+    versions_task = asyncio.create_task(maintain_versions_periodically())
+    migration_task = asyncio.create_task(migrate_stored_content())
+    search_task = asyncio.create_task(index_search_periodically())
+    sweeper_task = asyncio.create_task(sweep_connections_periodically())
+    yield
+    sweeper_task.cancel()
+    user_count_updates.cancel_all()
+    presence_announcements.cancel_all()
+    search_task.cancel()
+    migration_task.cancel()
+    versions_task.cancel()
+    presence_task.cancel()
+    auto_lock_task.cancel()
+    selections_task.cancel()
+    flush_task.cancel()
+    for room_name in backplane.hosted_rooms:
+        backplane.publish(room_name, {"kind": "presence", "worker": backplane.worker_id, "count": 0})
+    await backplane.stop()
+    await db.run_write(write_buffer.flush)
+    await db.run_write(version_store.record_deferred, force=True)
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Initialize database. Handlers await it so SQLite I/O runs off the event loop
+room_cache = RoomCache(ROOM_CACHE_SIZE, ROOM_CACHE_TTL, ROOM_CACHE_CONTENT_BYTES)
+admin_cache = AdminContentCache(ADMIN_CACHE_ITEMS, ADMIN_CACHE_TTL)
+content_codec = ContentCodec(CONTENT_COMPRESSION, CONTENT_COMPRESSION_MIN_SIZE, CONTENT_COMPRESSION_LEVEL)
+if DB_SHARDS > 1:
+    storage = ShardedDatabase(shard_count=DB_SHARDS, pool_size=DB_POOL_SIZE, cache=room_cache, codec=content_codec)
+else:
+    storage = Database(pool_size=DB_POOL_SIZE, cache=room_cache, codec=content_codec)
+db = AsyncDatabase(storage, read_workers=DB_READ_WORKERS)
+# Full-text index over rooms, interview notes and admin content
+search_index = SearchIndex(db.db)
+# Version history, checkpointed from the content the write buffer flushes
+version_store = VersionStore(
+    db.db,
+    snapshot_every=VERSION_SNAPSHOT_EVERY,
+    min_interval=VERSION_MIN_INTERVAL,
+    retention_days=VERSION_RETENTION_DAYS,
+    compact_after_days=VERSION_COMPACT_AFTER_DAYS,
+)
+# Room content edits are coalesced in memory and written in batches
+write_buffer = WriteBehindBuffer(
+    db.db, WRITE_BUFFER_FLUSH_INTERVAL, WRITE_BUFFER_MAX_DIRTY, on_flush=version_store.record
+)
 
 # Allow CORS for frontend communication
 app.add_middleware(
@@ -34,9 +338,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for active WebSocket connections and their IDs
-active_connections: Dict[str, Set[WebSocket]] = {}
-client_ids: Dict[WebSocket, str] = {}
+# In-memory storage for active WebSocket connections (each carries its client ID)
+active_connections: Dict[str, Set[ClientConnection]] = {}
+# In-memory documents for rooms with connected (or recently connected) clients
+documents = DocumentStore(REPLAY_BUFFER_SIZE)
+# Session tokens that let a reconnecting client keep its identity
+sessions = SessionStore(SESSION_TTL)
+# Pending release of idle rooms' documents, cancelled if a client comes back
+room_release_timers: Dict[str, asyncio.TimerHandle] = {}
+# Relays room events to other workers hosting the same rooms
+backplane = create_backplane(BACKPLANE, BACKPLANE_PATH, BACKPLANE_POLL_INTERVAL)
+# room_name -> worker_id -> (user count, expiry) reported by other workers
+remote_user_counts: Dict[str, Dict[str, tuple]] = {}
+
+def broadcast_selections(room_name: str, batch: list):
+    """Send one tick's worth of selection events to everyone in the room."""
+    broadcast(room_name, Frame({"type": "selections", "selections": batch}))
+    backplane.publish(room_name, {"kind": "selections", "selections": batch})
+
+# Cursor/selection events are coalesced per user and sent in batches per tick
+selections = SelectionAggregator(broadcast_selections, SELECTION_TICK_HZ, SELECTION_MAX_BATCH)
 
 import uuid
 
@@ -44,193 +365,694 @@ import uuid
 def generate_client_id() -> str:
     return str(uuid.uuid4())
 
+def publish_invalidation(room_name: Optional[str]):
+    """Tell other workers to drop cached rows for a room (or all rooms if None)."""
+    backplane.publish(None, {"kind": "invalidate", "room": room_name})
+
+def admin_content_changed(content_id: Optional[int] = None):
+    """Drop cached admin content responses here and on other workers."""
+    admin_cache.invalidate(content_id)
+    backplane.publish(None, {"kind": "admin_invalidate", "id": content_id})
+
+def publish_presence(room_name: str):
+    """Announce this worker's user count for a room to other workers."""
+    backplane.publish(room_name, {
+        "kind": "presence",
+        "worker": backplane.worker_id,
+        "count": len(active_connections.get(room_name, ()))
+    })
+
+def room_user_count(room_name: str) -> int:
+    """Users in a room across all workers."""
+    count = len(active_connections.get(room_name, ()))
+    now = time.monotonic()
+    for worker_count, expires_at in remote_user_counts.get(room_name, {}).values():
+        if expires_at > now:
+            count += worker_count
+    return count
+
+async def handle_backplane_event(room_name: Optional[str], event: dict):
+    """Apply an event relayed from another worker to this worker's clients."""
+    kind = event.get("kind")
+    if kind == "content":
+        document = documents.get(room_name)
+        if document is None:
+            return
+        ops = document.replace(event["content"])
+        if ops:
+            # Keep a pending local write from overwriting the newer content
+            write_buffer.update_pending(room_name, document.content)
+            broadcast_change(room_name, ops, document.seq, document.content, user_id=event.get("userId"))
+    elif kind == "content_request":
+        document = documents.get(room_name)
+        if document is not None:
+            backplane.publish(room_name, {"kind": "content", "content": document.content})
+    elif kind == "selections":
+        broadcast(room_name, Frame({"type": "selections", "selections": event["selections"]}))
+    elif kind == "presence":
+        expires_at = time.monotonic() + 3 * PRESENCE_REFRESH_INTERVAL
+        remote_user_counts.setdefault(room_name, {})[event["worker"]] = (event["count"], expires_at)
+        user_count_updates.mark(room_name)
+    elif kind == "presence_request":
+        publish_presence(room_name)
+    elif kind == "invalidate":
+        room_cache.invalidate(event.get("room"))
+    elif kind == "admin_invalidate":
+        admin_cache.invalidate(event.get("id"))
+    elif kind == "room_deleted":
+        forget_room(room_name)
+
+def forget_room(room_name: str):
+    """Drop all in-memory state for a deleted room and disconnect its clients."""
+    write_buffer.discard(room_name)
+    version_store.discard(room_name)
+    for client in active_connections.pop(room_name, ()):
+        client.close(ROOM_DELETED_CLOSE_CODE)
+    timer = room_release_timers.pop(room_name, None)
+    if timer is not None:
+        timer.cancel()
+    documents.discard(room_name)
+    selections.discard_room(room_name)
+    user_count_updates.discard_room(room_name)
+    presence_announcements.discard_room(room_name)
+    sessions.discard_room(room_name)
+    remote_user_counts.pop(room_name, None)
+    backplane.unsubscribe(room_name)
+
+def release_room(room_name: str):
+    """Drop an idle room's document once its resume grace period is over."""
+    room_release_timers.pop(room_name, None)
+    if active_connections.get(room_name):
+        return
+    documents.discard(room_name)
+    remote_user_counts.pop(room_name, None)
+    backplane.unsubscribe(room_name)
+    sessions.prune()
+
 @app.post("/create_room")
 async def create_room(room_name: str):
-    if db.create_room(room_name):
-        active_connections[room_name] = set()
+    if await db.create_room(room_name):
+        publish_invalidation(room_name)
         return {"message": "Room created", "room_name": room_name}
     raise HTTPException(status_code=400, detail="Room already exists")
 
-# Returns a list of rooms with room_name and created_at (latest first)
+# Ranked full-text search. kind limits results to "room", "notes" or "admin";
+# pass the returned next_offset to fetch the following page.
+@app.get("/search")
+async def search(q: str, kind: Optional[str] = None, limit: int = SEARCH_PAGE_SIZE, offset: int = 0):
+    if kind is not None and kind not in ("room", "notes", "admin"):
+        raise HTTPException(status_code=400, detail="kind must be room, notes or admin")
+    if not search_index.enabled:
+        raise HTTPException(status_code=503, detail="Full-text search is not available")
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    return await db.run_read(search_index.search, q, kind, limit, max(0, offset))
+
+# Returns a page of rooms with room_name, created_at and is_locked (latest first).
+# Pass the returned next_cursor to fetch the following page. Old rooms are
+# locked by the background auto-lock job, not here.
 @app.get("/rooms")
-async def get_rooms(auto_lock_old: bool = True):
-    # If auto_lock_old is True, automatically lock rooms older than 30 days
-    locked_count = 0
-    if auto_lock_old:
-        locked_count = db.lock_rooms_older_than_days(30)
-    
-    return {
-        "rooms": db.get_all_rooms(),
-        "auto_locked_count": locked_count
-    }
+async def get_rooms(
+    limit: int = ROOMS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    locked: Optional[bool] = None,
+    prefix: Optional[str] = None,
+    include_total: bool = False
+):
+    limit = max(1, min(limit, ROOMS_MAX_PAGE_SIZE))
+    try:
+        page = await db.list_rooms(limit, cursor, locked, prefix, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page
 
 @app.post("/auto-lock-old-rooms")
-async def auto_lock_old_rooms(days: int = 30):
+async def auto_lock_old_rooms(days: int = AUTO_LOCK_DAYS):
     """Manually trigger locking of rooms older than the specified number of days"""
-    locked_count = db.lock_rooms_older_than_days(days)
+    locked_count = await db.lock_rooms_older_than_days(days)
+    if locked_count:
+        publish_invalidation(None)
     return {
         "message": f"Auto-locked {locked_count} rooms older than {days} days",
-        "locked_count": locked_count
+        "locked_count": locked_count,
+        "last_scheduled_run": last_auto_lock
     }
 
 @app.delete("/delete_room/{room_name}")
 async def delete_room(room_name: str):
-    if db.delete_room(room_name):
-        if room_name in active_connections:
-            del active_connections[room_name]
+    write_buffer.discard(room_name)
+    if await db.delete_room(room_name):
+        forget_room(room_name)
+        publish_invalidation(room_name)
+        backplane.publish(None, {"kind": "room_deleted", "room": room_name})
         return {"message": "Room deleted"}
     raise HTTPException(status_code=404, detail="Room not found")
 
-async def broadcast_user_count(room_name: str):
+def broadcast(room_name: str, message: Frame, exclude: Optional[ClientConnection] = None, coalesce_key: Optional[str] = None):
+    """Queue a message for every client in a room. Never waits on slow clients."""
+    for client in active_connections.get(room_name, ()):
+        if client is not exclude:
+            client.send(message, coalesce_key)
+
+def broadcast_user_count(room_name: str):
     """Broadcast the current number of users to all clients in a room."""
     if room_name in active_connections:
-        user_count = len(active_connections[room_name])
-        message = json.dumps({
+        user_count = room_user_count(room_name)
+        message = Frame({
             "type": "users",
             "count": user_count
         })
-        for client in active_connections[room_name]:
-            try:
-                await client.send_text(message)
-            except:
-                pass  # Ignore failed sends
+        broadcast(room_name, message, coalesce_key="users")
+
+# User counts are broadcast to the room and announced to other workers at most
+# once per PRESENCE_DEBOUNCE per room, however many clients join or leave
+user_count_updates = PresenceDebouncer(broadcast_user_count, PRESENCE_DEBOUNCE)
+presence_announcements = PresenceDebouncer(publish_presence, PRESENCE_DEBOUNCE)
+
+def presence_changed(room_name: str):
+    """A client joined or left this worker's copy of a room."""
+    user_count_updates.mark(room_name)
+    presence_announcements.mark(room_name)
+
+async def load_document(room_name: str):
+    """
+    Return the room's in-memory document, loading it from the database if needed,
+    or None if the room doesn't exist (e.g. it was deleted).
+    Raises DocumentTooLarge for rooms longer than MAX_DOCUMENT_SIZE.
+    """
+    document = documents.get(room_name)
+    if document is None:
+        content = await db.run_read(write_buffer.get_room_content, room_name, MAX_DOCUMENT_SIZE)
+        if content is None:
+            return None
+        document = documents.load(room_name, content)
+    return document
+
+def send_snapshot(client: ClientConnection, document):
+    """Send a client the whole document, in chunks if it is large."""
+    if len(document.content) <= CONTENT_CHUNK_SIZE:
+        client.send(Frame({
+            "type": "content",
+            "content": document.content,
+            "seq": document.seq
+        }))
+    else:
+        # The chunks are cut from this version of the document as they are sent
+        client.send_stream(content_chunk_frames(document.content, document.seq, CONTENT_CHUNK_SIZE))
+
+def broadcast_change(
+    room_name: str,
+    ops: list,
+    seq: int,
+    content: str,
+    sender: Optional[ClientConnection] = None,
+    user_id: Optional[str] = None
+):
+    """Send a document change to every client but the sender in the format it asked for."""
+    ops_message = None
+    content_message = None
+    for client in active_connections.get(room_name, ()):
+        if client is sender:
+            continue
+        if client.ops:
+            if ops_message is None:
+                ops_message = Frame({
+                    "type": "ops",
+                    "seq": seq,
+                    "ops": ops,
+                    "userId": user_id
+                })
+            client.send(ops_message)
+        else:
+            if content_message is None:
+                content_message = Frame({
+                    "type": "content",
+                    "content": content,
+                    "seq": seq
+                })
+            # Only the newest full document is worth delivering
+            client.send(content_message, coalesce_key="content")
+
+def publish_change(room_name: str, sender: ClientConnection, ops: list, document):
+    """Fan a change out to local clients and to other workers hosting the room."""
+    broadcast_change(room_name, ops, document.seq, document.content, sender=sender, user_id=sender.client_id)
+    backplane.publish(room_name, {"kind": "content", "content": document.content, "userId": sender.client_id})
+
+async def handle_content_update(room_name: str, client: ClientConnection, content: str):
+    """Apply a full-document update from a client and fan it out."""
+    if not isinstance(content, str):
+        client.send(Frame({"type": "error", "message": "content must be a string"}))
+        return
+    if len(content) > MAX_DOCUMENT_SIZE:
+        client.send(Frame({"type": "error", "message": f"content exceeds {MAX_DOCUMENT_SIZE} characters"}))
+        return
+    document = await load_document(room_name)
+    if document is None:
+        client.close(ROOM_DELETED_CLOSE_CODE)
+        return
+    ops = document.replace(content)
+    client.send(Frame({"type": "ack", "seq": document.seq}))
+    if not ops:
+        return
+    if write_buffer.put(room_name, document.content):
+        await db.run_write(write_buffer.flush)
+    publish_change(room_name, client, ops, document)
+
+async def handle_ops_update(room_name: str, client: ClientConnection, message: dict):
+    """Rebase and apply an ops message from a client and fan it out."""
+    document = await load_document(room_name)
+    if document is None:
+        client.close(ROOM_DELETED_CLOSE_CODE)
+        return
+    base_seq = message.get("base_seq")
+    try:
+        if not isinstance(base_seq, int) or isinstance(base_seq, bool):
+            raise OpError("base_seq must be an integer")
+        applied = document.apply(base_seq, normalize_ops(message.get("ops"), MAX_OPS_PER_MESSAGE), MAX_DOCUMENT_SIZE)
+    except OpError as e:
+        client.send(Frame({"type": "error", "message": str(e)}))
+        applied = None
+    if applied is None:
+        # Client is too far behind (or sent bad ops): resync from a snapshot
+        send_snapshot(client, document)
+        return
+    client.send(Frame({"type": "ack", "seq": document.seq}))
+    if not applied:
+        return
+    if write_buffer.put(room_name, document.content):
+        await db.run_write(write_buffer.flush)
+    publish_change(room_name, client, applied, document)
 
 @app.websocket("/ws/{room_name}")
 async def websocket_endpoint(websocket: WebSocket, room_name: str):
-    await websocket.accept()
+    # Clients may opt into MessagePack binary frames via Sec-WebSocket-Protocol
+    subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol)
     
     # Get or create room
-    room = db.get_room(room_name)
-    if not room:
-        if not db.create_room(room_name):
+    if not await db.room_exists(room_name):
+        if not await db.create_room(room_name):
             await websocket.close()
             return
+
+    # Load the document before registering the client, so rooms too large
+    # to hold are refused without touching presence
+    try:
+        if await load_document(room_name) is None:
+            # Deleted since it was looked up
+            await websocket.close(code=ROOM_DELETED_CLOSE_CODE)
+            return
+    except DocumentTooLarge as e:
+        logger.warning("Refusing client in room %s: %s", room_name, e)
+        error = Frame({"type": "error", "message": str(e)})
+        if subprotocol is not None:
+            await websocket.send_bytes(error.binary)
+        else:
+            await websocket.send_text(error.text)
+        await websocket.close(code=DOCUMENT_TOO_LARGE_CLOSE_CODE, reason="document too large")
+        return
     
     # Initialize active connections for the room if needed
     if room_name not in active_connections:
         active_connections[room_name] = set()
     
-    # Generate unique client ID for this connection
-    client_id = generate_client_id()
-    client_ids[websocket] = client_id
+    # Reclaim the client's previous identity if it presents a live session token,
+    # otherwise generate a unique client ID for this connection
+    session = None
+    token = websocket.query_params.get("session")
+    if token:
+        session = sessions.resume(token, room_name)
+    resuming = session is not None
+    if resuming:
+        client_id = session.client_id
+        # Drop a stale connection still registered under the same identity
+        for other in active_connections[room_name]:
+            if other.client_id == client_id:
+                other.close()
+    else:
+        client_id = generate_client_id()
+        session = sessions.issue(room_name, client_id)
+
+    # Start the connection's writer
+    client = ClientConnection(
+        websocket,
+        client_id,
+        max_queue=SEND_QUEUE_MAX,
+        ops=websocket.query_params.get("sync") == "ops",
+        binary=subprotocol is not None
+    )
+    client.session = session
+    client.start()
 
     # Add the new connection to the room's active connections
-    active_connections[room_name].add(websocket)
+    active_connections[room_name].add(client)
+    timer = room_release_timers.pop(room_name, None)
+    if timer is not None:
+        timer.cancel()
+    if room_name not in backplane.hosted_rooms:
+        # First client on this worker: relay the room and catch up with other workers
+        backplane.subscribe(room_name)
+        backplane.publish(room_name, {"kind": "presence_request"})
+        backplane.publish(room_name, {"kind": "content_request"})
     
     # Broadcast updated user count
-    await broadcast_user_count(room_name)
+    presence_changed(room_name)
     
-    # Debug log
-    print(f"New client connected. ID: {client_id}, Room: {room_name}")
+    logger.debug("Client connected. ID: %s, Room: %s", client_id, room_name)
     
     try:
-        # Send current content to the new client
-        content = db.get_room_content(room_name) or ""
-        await websocket.send_text(json.dumps({
-            "type": "content",
-            "content": content
+        document = await load_document(room_name)
+        if document is None:
+            client.close(ROOM_DELETED_CLOSE_CODE)
+            return
+        last_seq = websocket.query_params.get("last_seq")
+        missed = None
+        if resuming and session.epoch == document.epoch and last_seq is not None and last_seq.isdigit():
+            missed = document.ops_since(int(last_seq))
+        session.epoch = document.epoch
+
+        # Tell the client its ID (so it can recognise its own selections in
+        # batches) and the session token to resume with after a reconnect
+        client.send(Frame({
+            "type": "welcome",
+            "userId": client_id,
+            "session": session.token,
+            "seq": document.seq,
+            "resumed": missed is not None
         }))
+
+        if missed is None or (missed and not client.ops):
+            # New client, or one whose missed changes are no longer buffered
+            # (or that only understands full documents): send a snapshot
+            send_snapshot(client, document)
+        elif missed:
+            # Replay only what the client missed
+            client.send(Frame({
+                "type": "ops",
+                "seq": document.seq,
+                "base_seq": int(last_seq),
+                "ops": missed,
+                "userId": None
+            }))
         
         while True:
-            data = await websocket.receive_text()
             try:
-                # Parse message as JSON
-                message = json.loads(data)
-                if isinstance(message, dict) and "type" in message:
-                    if message["type"] in ["selection", "selection_clear"]:
-                        # Handle selection events
-                        message["userId"] = client_ids[websocket]  # Add client ID to message
-                        print(f"Selection event from {client_ids[websocket]}: {message}")  # Debug log
-                        for client in active_connections[room_name]:
-                            if client != websocket:
-                                await client.send_text(json.dumps(message))
-                    else:
-                        # Handle content updates
-                        content = message.get("content", data)
-                        db.update_room_content(room_name, content)
-                        content_message = json.dumps({
-                            "type": "content",
-                            "content": content
-                        })
-                        for client in active_connections[room_name]:
-                            if client != websocket:
-                                await client.send_text(content_message)
+                received = await asyncio.wait_for(websocket.receive(), HEARTBEAT_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.info("Client timed out. ID: %s, Room: %s", client_id, room_name)
+                reaper_stats["heartbeat_timeouts"] += 1
+                # The peer may be unreachable, so don't wait on queued sends
+                client.close(HEARTBEAT_CLOSE_CODE, abort=True)
+                break
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            client.touch()
+            if received.get("bytes") is not None:
+                received_bytes.observe(len(received["bytes"]))
+                # Binary clients send MessagePack-encoded message objects
+                try:
+                    message = unpack_binary(received["bytes"])
+                except ValueError as e:
+                    client.send(Frame({"type": "error", "message": str(e)}))
+                    continue
+                data = message if isinstance(message, str) else ""
+            else:
+                data = received.get("text") or ""
+                received_bytes.observe(len(data.encode("utf-8")))
+                try:
+                    # Parse message as JSON
+                    message = json.loads(data)
+                except json.JSONDecodeError:
+                    # Handle plain text as content
+                    message = None
+
+            message_type = message.get("type", "content") if isinstance(message, dict) else "content"
+            messages_received.inc(message_type if message_type in METRIC_MESSAGE_TYPES else "other")
+            if isinstance(message, dict) and "type" in message:
+                if message["type"] == "pong":
+                    # Heartbeat reply; touch() above is all it needs
+                    continue
+                elif message["type"] == "ping":
+                    client.send(Frame({"type": "pong"}), coalesce_key="pong")
+                elif message["type"] in ["selection", "selection_clear"]:
+                    # Handle selection events; peers get them in the next batch
+                    message["userId"] = client.client_id  # Add client ID to message
+                    selections.add(room_name, message)
+                elif message["type"] == "ops":
+                    await handle_ops_update(room_name, client, message)
                 else:
-                    # Handle non-typed JSON messages as content
-                    db.update_room_content(room_name, data)
-                    content_message = json.dumps({
-                        "type": "content",
-                        "content": data
-                    })
-                    for client in active_connections[room_name]:
-                        if client != websocket:
-                            await client.send_text(content_message)
-            except json.JSONDecodeError:
-                # Handle plain text as content
-                db.update_room_content(room_name, data)
-                content_message = json.dumps({
-                    "type": "content",
-                    "content": data
-                })
-                for client in active_connections[room_name]:
-                    if client != websocket:
-                        await client.send_text(content_message)
+                    # Handle content updates
+                    await handle_content_update(room_name, client, message.get("content", data))
+            else:
+                # Handle plain text and non-typed JSON messages as content
+                await handle_content_update(room_name, client, data)
     except WebSocketDisconnect:
-        # Clean up client ID
-        if websocket in client_ids:
-            client_id = client_ids[websocket]
-            del client_ids[websocket]
-            print(f"Client disconnected. ID: {client_id}, Room: {room_name}")
-
-        # Remove from active connections
-        active_connections[room_name].remove(websocket)
-        
-        # Broadcast updated user count after disconnect
-        await broadcast_user_count(room_name)
-        
-        # Clean up empty rooms from active_connections
-        if not active_connections[room_name]:
-            del active_connections[room_name]
+        logger.debug("Client disconnected. ID: %s, Room: %s", client_id, room_name)
+    except Exception as e:
+        logger.exception("Connection error. ID: %s, Room: %s: %s", client_id, room_name, e)
+    finally:
+        # Runs on every exit path, including errors and heartbeat timeouts
+        try:
+            await disconnect_client(room_name, client)
+        finally:
+            await client.stop()
+
+async def disconnect_client(room_name: str, client: ClientConnection):
+    """
+    Unregister a connection from its room. Safe to call more than once, and
+    after the room itself was deleted. Doesn't raise if saving the room fails.
+    """
+    clients = active_connections.get(room_name)
+    if clients is None or client not in clients:
+        return
+
+    # Remove from active connections. Unless the client has already
+    # reconnected under the same identity, clear its selection for peers
+    # and start its session's expiry clock.
+    clients.discard(client)
+    if not any(other.client_id == client.client_id for other in clients):
+        if client.session is not None:
+            sessions.release(client.session)
+        selections.add(room_name, {"type": "selection_clear", "userId": client.client_id})
+
+    # Broadcast updated user count after disconnect
+    presence_changed(room_name)
+
+    # Clean up empty rooms from active_connections
+    if not clients:
+        del active_connections[room_name]
+        selections.discard_room(room_name)
+        # Keep the document (and its replay buffer) around for clients that reconnect
+        room_release_timers[room_name] = asyncio.get_running_loop().call_later(
+            RESUME_GRACE, release_room, room_name
+        )
+        try:
+            await db.run_write(write_buffer.flush, room_name)
+        except Exception as e:
+            # The content stays buffered and is retried by the periodic flush
+            logger.exception("Failed to save room %s after its last client left: %s", room_name, e)
+
+# Gauges read when /metrics is scraped
+registry.gauge("collab_active_rooms", "Rooms with clients on this worker", lambda: len(active_connections))
+registry.gauge(
+    "collab_active_connections", "Websocket clients on this worker",
+    lambda: sum(len(clients) for clients in active_connections.values())
+)
+registry.gauge(
+    "collab_send_queue_depth_total", "Frames queued for all clients",
+    lambda: sum(client.queue_depth for clients in active_connections.values() for client in clients)
+)
+registry.gauge(
+    "collab_send_queue_depth_max", "Frames queued for the most backlogged client",
+    lambda: max((client.queue_depth for clients in active_connections.values() for client in clients), default=0)
+)
+registry.gauge("collab_write_buffer_dirty_rooms", "Rooms with unflushed content", lambda: write_buffer.stats()["dirty_rooms"])
+registry.gauge("collab_documents_loaded", "Room documents held in memory", lambda: len(documents.documents))
+registry.gauge("collab_sessions", "Resumable sessions", lambda: len(sessions))
+registry.gauge("collab_selection_events_pending_rooms", "Rooms with selection events waiting for the next tick", lambda: selections.pending_rooms)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/connections/stats")
+async def get_connection_stats():
+    """Live connection totals and what the heartbeat sweeper has reaped"""
+    return {
+        "rooms": len(active_connections),
+        "connections": sum(len(clients) for clients in active_connections.values()),
+        "sessions": len(sessions),
+        "documents": len(documents.documents),
+        "release_timers": len(room_release_timers),
+        **reaper_stats,
+    }
+
+@app.get("/write-buffer/stats")
+async def get_write_buffer_stats():
+    """Counters for the room content write-behind buffer"""
+    return write_buffer.stats()
+
+@app.get("/backplane/stats")
+async def get_backplane_stats():
+    """Counters for the cross-worker event relay"""
+    return backplane.stats()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the hot-room cache and the admin content response cache"""
+    return {**room_cache.stats(), "admin_content": admin_cache.stats()}
+
+@app.get("/versions/stats")
+async def get_version_stats():
+    """Version history counters and the outcome of the last retention run"""
+    return {**version_store.stats(), "last_maintenance": last_version_maintenance}
+
+@app.get("/storage/stats")
+async def get_storage_stats():
+    """Stored content size by format, the database files, and websocket compression counters for this worker"""
+    return {
+        "content": await db.content_storage_stats(),
+        "rows_migrated": db.db.rows_migrated,
+        "shards": [shard.db_path for shard in db.db.shards],
+        "websocket_deflate": deflate_stats.snapshot(),
+    }
+
+# Live user counts for many rooms in one call, from the in-memory connection
+# index (no database access). rooms is a comma-separated list; without it,
+# every room that currently has users is returned.
+@app.get("/presence")
+async def get_presence(rooms: Optional[str] = None):
+    if rooms is None:
+        names = set(active_connections) | set(remote_user_counts)
+    else:
+        names = {name for name in rooms.split(",") if name}
+        if len(names) > PRESENCE_MAX_ROOMS:
+            raise HTTPException(status_code=400, detail=f"At most {PRESENCE_MAX_ROOMS} rooms per request")
+    counts = {name: room_user_count(name) for name in names}
+    if rooms is None:
+        counts = {name: count for name, count in counts.items() if count}
+    return {"rooms": counts, "total_users": sum(counts.values())}
 
 @app.get("/ws/details")
 async def get_details(room_name: str):
-    room = db.get_room(room_name)
+    room = await db.get_room(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
-    
-    print(active_connections)
-    for i in active_connections:
-        for j in active_connections[i]:
-            print(j.values)
 
     return {
         "room": dict(room),
         "active_connections": len(active_connections.get(room_name, set()))
     }
 
+# Backup, export and import endpoints
+backup_lock = asyncio.Lock()
+
+@app.post("/admin/backup")
+async def create_backup():
+    """Copy the live database to BACKUP_DIR with the online backup API"""
+    if backup_lock.locked():
+        raise HTTPException(status_code=409, detail="A backup is already running")
+    async with backup_lock:
+        await db.run_write(write_buffer.flush)
+        try:
+            return await db.run_read(backup_database, db.db, BACKUP_DIR, BACKUP_PAGES_PER_STEP)
+        except BackupError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/admin/export")
+async def export_data():
+    """Stream all rooms, interview notes and admin content as NDJSON"""
+    await db.run_write(write_buffer.flush)
+    return StreamingResponse(
+        iter_export(db.db),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="rooms.ndjson"'}
+    )
+
+@app.post("/admin/import")
+async def import_data(request: Request):
+    """Upsert rows from an NDJSON export, streamed in and written in large batches"""
+    totals: Dict[str, int] = {}
+    pending = b""
+    batch = []
+
+    async def write_batch():
+        for record_type, count in (await db.run_write(import_records, db.db, batch)).items():
+            totals[record_type] = totals.get(record_type, 0) + count
+        batch.clear()
+
+    try:
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    batch.append(json.loads(line))
+            if len(batch) >= IMPORT_BATCH:
+                await write_batch()
+        if pending.strip():
+            batch.append(json.loads(pending))
+        if batch:
+            await write_batch()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import data: {e}")
+    finally:
+        room_cache.invalidate()
+        publish_invalidation(None)
+        admin_content_changed()
+    return {"message": "Import complete", "imported": totals}
+
 # Admin content endpoints
 @app.post("/admin/content")
 async def create_admin_content(title: str, content: str):
-    if db.add_admin_content(title, content):
+    created = await db.add_admin_content(title, content)
+    admin_content_changed()
+    if created:
         return {"message": "Content created", "title": title}
     raise HTTPException(status_code=400, detail="Failed to create content")
 
+# Without content_id, lists every item as id, title, created_at, updated_at
+# and size (characters); with it, returns that item including its content.
+# Responses carry an ETag and Last-Modified and are served from admin_cache;
+# a matching If-None-Match (or, for single items, If-Modified-Since) gets a 304.
 @app.get("/admin/content")
-async def get_admin_content(content_id: int = None):
-    content = db.get_admin_content(content_id)
-    if content is None and content_id is not None:
-        raise HTTPException(status_code=404, detail="Content not found")
-    return {"content": content}
+async def get_admin_content(request: Request, content_id: int = None):
+    key = LISTING if content_id is None else content_id
+    cached = admin_cache.get(key)
+    if cached is None:
+        generation = admin_cache.generation
+        if content_id is None:
+            items = await db.list_admin_content()
+            cached = CachedResponse({"content": items}, (item["updated_at"] for item in items))
+        else:
+            item = await db.get_admin_content(content_id)
+            if item is None:
+                raise HTTPException(status_code=404, detail="Content not found")
+            cached = CachedResponse({"content": item}, [item["updated_at"]])
+        admin_cache.put(key, cached, generation)
+
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if cached.last_modified:
+        headers["Last-Modified"] = cached.last_modified
+    # A delete doesn't advance the list's Last-Modified, so only its ETag is trusted
+    if_modified_since = request.headers.get("if-modified-since") if content_id is not None else None
+    if cached.not_modified(request.headers.get("if-none-match"), if_modified_since):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 @app.put("/admin/content/{content_id}")
 async def update_admin_content(content_id: int, title: str, content: str):
-    if db.update_admin_content(content_id, title, content):
+    updated = await db.update_admin_content(content_id, title, content)
+    admin_content_changed(content_id)
+    if updated:
         return {"message": "Content updated", "id": content_id}
     raise HTTPException(status_code=404, detail="Content not found")
 
 @app.delete("/admin/content/{content_id}")
 async def delete_admin_content(content_id: int):
-    if db.delete_admin_content(content_id):
+    deleted = await db.delete_admin_content(content_id)
+    admin_content_changed(content_id)
+    if deleted:
         return {"message": "Content deleted"}
     raise HTTPException(status_code=404, detail="Content not found")
 
@@ -238,33 +1060,33 @@ async def delete_admin_content(content_id: int):
 @app.put("/room/{room_name}/lock")
 async def toggle_room_lock(room_name: str, locked: bool):
     """Toggle the lock status of a room"""
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if db.toggle_room_lock(room_name, locked):
+    if await db.toggle_room_lock(room_name, locked):
+        publish_invalidation(room_name)
         return {"message": f"Room {room_name} {'locked' if locked else 'unlocked'}", "locked": locked}
     raise HTTPException(status_code=500, detail="Failed to update room lock status")
 
 @app.get("/room/{room_name}/locked")
 async def is_room_locked(room_name: str):
     """Check if a room is locked"""
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    is_locked = db.is_room_locked(room_name)
-    return {"locked": is_locked}
+    return {"locked": bool(room["is_locked"])}
 
 @app.post("/room/{room_name}/validate-password")
 async def validate_room_password(room_name: str, validation: PasswordValidation):
     """Validate the password for a locked room"""
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
     # Check if room is locked
-    if not db.is_room_locked(room_name):
+    if not room["is_locked"]:
         return {"valid": True, "message": "Room is not locked"}
     
     # Validate password
@@ -273,15 +1095,33 @@ async def validate_room_password(room_name: str, validation: PasswordValidation)
     else:
         return {"valid": False, "message": "Invalid password"}
 
+# Room version history endpoints
+@app.get("/room/{room_name}/versions")
+async def list_room_versions(room_name: str, limit: int = 50, before: Optional[int] = None):
+    """List a room's saved versions, newest first. Pass next_before to get the next page."""
+    room = await db.get_room_info(room_name)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    limit = max(1, min(limit, ROOMS_MAX_PAGE_SIZE))
+    return await db.run_read(version_store.list_versions, room_name, limit, before)
+
+@app.get("/room/{room_name}/versions/{version}")
+async def get_room_version(room_name: str, version: int):
+    """Get the content of a room as it was at a saved version"""
+    result = await db.run_read(version_store.get_version, room_name, version)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return result
+
 # Interview notes endpoints
 @app.get("/interview-notes/{room_name}")
 async def get_interview_notes(room_name: str):
     """Get interview notes for a specific room"""
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    notes = db.get_interview_notes(room_name)
+    notes = await db.get_interview_notes(room_name)
     return {"notes": notes}
 
 @app.post("/interview-notes/{room_name}")
@@ -291,11 +1131,11 @@ async def create_or_update_interview_notes(room_name: str, notes: InterviewNotes
     if notes.password != INTERVIEW_NOTES_PASSWORD:
         raise HTTPException(status_code=401, detail="Invalid password")
 
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if db.create_or_update_interview_notes(room_name, notes.content):
+    if await db.create_or_update_interview_notes(room_name, notes.content):
         return {"message": "Notes updated successfully"}
     raise HTTPException(status_code=500, detail="Failed to update notes")
 
@@ -306,11 +1146,11 @@ async def delete_interview_notes(room_name: str, password: str):
     if password != INTERVIEW_NOTES_PASSWORD:
         raise HTTPException(status_code=401, detail="Invalid password")
 
-    room = db.get_room(room_name)
+    room = await db.get_room_info(room_name)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    if db.delete_interview_notes(room_name):
+    if await db.delete_interview_notes(room_name):
         return {"message": "Notes deleted successfully"}
     raise HTTPException(status_code=404, detail="Notes not found")
 
@@ -0,0 +1,142 @@
+"""
+Minimal Prometheus metrics, rendered by GET /metrics in the text exposition
+format.
+
+Metrics are plain dicts of numbers updated in place, so recording one costs a
+dict lookup and an addition. They are not locked: record them from the event
+loop only (AsyncDatabase records DB timings after the await, not in the
+worker thread).
+"""
+import bisect
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds: from sub-millisecond queueing up to slow clients
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Bytes: cursor events up to whole large documents
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge:
+    """A value read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.read()}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[object] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help_text, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+messages_received = registry.register(Counter(
+    "collab_ws_messages_received_total", "Websocket messages received, by message type", ("type",)
+))
+messages_sent = registry.register(Counter(
+    "collab_ws_messages_sent_total", "Websocket frames written to clients, by message type", ("type",)
+))
+received_bytes = registry.register(Histogram(
+    "collab_ws_received_bytes", "Size of received websocket messages", SIZE_BUCKETS
+))
+sent_bytes = registry.register(Histogram(
+    "collab_ws_sent_bytes", "Size of websocket frames written to clients", SIZE_BUCKETS
+))
+fanout_latency = registry.register(Histogram(
+    "collab_fanout_latency_seconds",
+    "Time from a frame being created to it being written to one client",
+    LATENCY_BUCKETS,
+    ("type",),
+))
+db_operation_seconds = registry.register(Histogram(
+    "collab_db_operation_seconds",
+    "Database call latency including executor queueing, by method",
+    LATENCY_BUCKETS,
+    ("method", "kind"),
+))
+db_errors = registry.register(Counter(
+    "collab_db_errors_total", "Database calls that raised, by method", ("method",)
+))
+slow_consumers_dropped = registry.register(Counter(
+    "collab_ws_slow_consumers_dropped_total", "Clients disconnected because their send queue filled up"
+))
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceDebouncer:
+    """
+    Coalesces presence changes per room. The first change in a room schedules
+    one emit `delay` seconds later; further joins and leaves before then are
+    folded into it, so a burst of n joins costs one user-count update per
+    client instead of n.
+    """
+
+    def __init__(self, emit: Callable[[str], None], delay: float = 0.1):
+        self.emit = emit
+        self.delay = delay
+        self._scheduled: Dict[str, asyncio.TimerHandle] = {}
+        self.changes_received = 0
+        self.updates_sent = 0
+
+    def mark(self, room_name: str):
+        """Note that a room's presence changed."""
+        self.changes_received += 1
+        if room_name not in self._scheduled:
+            self._scheduled[room_name] = asyncio.get_running_loop().call_later(self.delay, self._fire, room_name)
+
+    def _fire(self, room_name: str):
+        self._scheduled.pop(room_name, None)
+        self.updates_sent += 1
+        try:
+            self.emit(room_name)
+        except Exception as e:
+            logger.exception("Failed to send presence for room %s: %s", room_name, e)
+
+    def discard_room(self, room_name: str):
+        handle = self._scheduled.pop(room_name, None)
+        if handle is not None:
+            handle.cancel()
+
+    def cancel_all(self):
+        for handle in self._scheduled.values():
+            handle.cancel()
+        self._scheduled.clear()
@@ -2,8 +2,15 @@
 
 # Initialize the database
 
-# Start the FastAPI server
+# Number of uvicorn worker processes. With more than one, room events are
+# relayed between workers through the shared SQLite backplane.
+WORKERS=${WORKERS:-1}
+if [ "$WORKERS" -gt 1 ]; then
+    export BACKPLANE=${BACKPLANE:-sqlite}
+fi
+
+# Start the FastAPI server (uvicorn with tuned websocket compression, see serve.py)
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 &
+HOST=0.0.0.0 PORT=8000 WORKERS="$WORKERS" nohup python serve.py &
 
-echo "Backend server is running on http://0.0.0.0:8000" 
\ No newline at end of file
+echo "Backend server is running on http://0.0.0.0:8000" 
@@ -0,0 +1,135 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Cached marker for rooms that are known not to exist
+MISSING = object()
+
+
+class RoomCache:
+    """
+    Bounded LRU cache of room metadata (existence, lock flag, timestamps) and,
+    separately, room content, with a time-to-live. Database consults it on
+    reads and invalidates entries on every write that touches a room.
+
+    Metadata rows are small and bounded by count (max_size). Content is
+    bounded by the memory its strings take (max_content_bytes), so a few
+    large documents can't grow the cache without limit; content bigger than
+    the whole budget is never cached.
+
+    Each invalidation bumps a generation counter; a row read from SQLite is
+    only cached if no invalidation happened while it was being read, so a
+    slow reader can't put back a row that a concurrent write just replaced.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 30.0, max_content_bytes: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_content_bytes = max_content_bytes
+        self._rows: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._contents: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._content_bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, room_name: str):
+        """Return the cached metadata row, MISSING for a known-absent room, or None on a miss."""
+        with self._lock:
+            entry = self._rows.get(room_name)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, row = entry
+            if expires_at < time.monotonic():
+                del self._rows[room_name]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._rows.move_to_end(room_name)
+            self.hits += 1
+            return row
+
+    def put(self, room_name: str, row: Optional[dict], generation: int):
+        """Cache a metadata row (None for a missing room) read while generation was current."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._rows[room_name] = (time.monotonic() + self.ttl, MISSING if row is None else row)
+            self._rows.move_to_end(room_name)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    def get_content(self, room_name: str) -> Optional[str]:
+        """Return a room's cached content, or None on a miss."""
+        with self._lock:
+            entry = self._contents.get(room_name)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, content, size = entry
+            if expires_at < time.monotonic():
+                self._drop_content(room_name)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._contents.move_to_end(room_name)
+            self.hits += 1
+            return content
+
+    def put_content(self, room_name: str, content: str, generation: int):
+        """Cache a room's content read while generation was current, if it fits."""
+        size = sys.getsizeof(content)
+        with self._lock:
+            if generation != self._generation or size > self.max_content_bytes:
+                return
+            self._drop_content(room_name)
+            self._contents[room_name] = (time.monotonic() + self.ttl, content, size)
+            self._content_bytes += size
+            while self._content_bytes > self.max_content_bytes:
+                self._drop_content(next(iter(self._contents)))
+                self.evictions += 1
+
+    def _drop_content(self, room_name: str):
+        entry = self._contents.pop(room_name, None)
+        if entry is not None:
+            self._content_bytes -= entry[2]
+
+    def invalidate(self, room_name: Optional[str] = None):
+        """Forget one room, or every room if room_name is None."""
+        with self._lock:
+            self._generation += 1
+            if room_name is None:
+                self._rows.clear()
+                self._contents.clear()
+                self._content_bytes = 0
+            else:
+                self._rows.pop(room_name, None)
+                self._drop_content(room_name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._rows),
+                "max_size": self.max_size,
+                "content_size": len(self._contents),
+                "content_bytes": self._content_bytes,
+                "max_content_bytes": self.max_content_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,185 @@
+"""
+Full-text search over room content, interview notes and admin content.
+
+Documents are indexed in the FTS5 table search_index (title, body), keyed by
+search_docs (kind, ref) -> rowid:
+
+    kind "room"   ref room_name   title room_name   body room content
+    kind "notes"  ref room_name   title room_name   body interview notes
+    kind "admin"  ref id          title title       body admin content
+
+Writes only set search_dirty = 1 on the changed row, so saving content costs
+no indexing work. index_pending() copies dirty rows into the index in small
+batches from a background task; deletes remove their documents directly.
+
+The index is contentless, so it doesn't hold a second copy of every body:
+snippets are cut from the matching rows, decoded, for the returned page only.
+
+With sharded storage (see sharding.py) every shard indexes its own rows, and a
+search queries all shards and merges the rankings. bm25 term statistics are per
+shard, so scores of documents from different shards are close to but not
+exactly what one index over everything would give.
+"""
+import heapq
+import itertools
+import re
+from typing import Optional, Pattern
+
+from database import Database
+
+# table -> (kind, key column, title column)
+INDEXED_TABLES = {
+    "rooms": ("room", "room_name", "room_name"),
+    "interview_notes": ("notes", "room_name", "room_name"),
+    "admin_content": ("admin", "id", "title"),
+}
+
+# kind -> (table, key column), to read a document's body back
+_SOURCES = {kind: (table, key) for table, (kind, key, _) in INDEXED_TABLES.items()}
+
+# Marks matched terms in snippets, which are cut at SNIPPET_WORDS words
+SNIPPET_START = "**"
+SNIPPET_END = "**"
+SNIPPET_WORDS = 16
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching documents that contain every
+    word (the last one as a prefix, for search-as-you-type). None if the text
+    has no words. Users never write FTS5 syntax, so nothing they type can
+    produce a query error.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight_pattern(query: str) -> Optional[Pattern]:
+    """Regex matching the words build_match_query searches for, ignoring case."""
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    words = [re.escape(token) + r"\b" for token in tokens[:-1]] + [re.escape(tokens[-1]) + r"\w*"]
+    return re.compile(r"\b(?:" + "|".join(words) + ")", re.IGNORECASE)
+
+
+def make_snippet(text: str, highlight: Optional[Pattern], size: int = SNIPPET_WORDS) -> str:
+    """
+    Up to size words of text from the first match on, with matches marked,
+    like FTS5's snippet(). Starts at the beginning if only the title matched.
+    """
+    hit = highlight.search(text) if highlight is not None else None
+    start = hit.start() if hit is not None else 0
+    words = list(itertools.islice(_TOKEN.finditer(text, start), size + 1))
+    if not words:
+        return ""
+    parts = ["…"] if words[0].start() > 0 else []
+    end = words[0].start()
+    for word in words[:size]:
+        parts.append(text[end:word.start()])
+        if highlight is not None and highlight.fullmatch(word.group()):
+            parts.append(SNIPPET_START + word.group() + SNIPPET_END)
+        else:
+            parts.append(word.group())
+        end = word.end()
+    if len(words) > size:
+        parts.append("…")
+    return "".join(parts)
+
+
+class SearchIndex:
+    def __init__(self, db: Database):
+        self.db = db
+        self.documents_indexed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.db.search_enabled
+
+    def index_pending(self, batch_size: int = 50) -> int:
+        """Index up to batch_size changed rows. Returns how many were indexed."""
+        if not self.enabled:
+            return 0
+        indexed = 0
+        for shard in self.db.shards:
+            if indexed >= batch_size:
+                break
+            indexed += self.db.write_each({shard: lambda shard: self._index_shard(shard, batch_size - indexed)})[0]
+        self.documents_indexed += indexed
+        return indexed
+
+    def _index_shard(self, shard: Database, batch_size: int) -> int:
+        indexed = 0
+        for table, (kind, key, title_column) in INDEXED_TABLES.items():
+            if indexed >= batch_size:
+                break
+            with shard.get_connection() as conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT {key} AS ref, {title_column} AS title, content FROM {table}
+                    WHERE search_dirty = 1 LIMIT ?
+                    """,
+                    (batch_size - indexed,)
+                ).fetchall()
+                for row in rows:
+                    shard.index_document(
+                        conn, kind, str(row["ref"]), row["title"], shard.codec.decode(row["content"]) or ""
+                    )
+                    # Stays dirty if the row was rewritten after we read it
+                    conn.execute(
+                        f"""
+                        UPDATE {table} SET search_dirty = 0
+                        WHERE {key} = ? AND content IS ? AND {title_column} IS ?
+                        """,
+                        (row["ref"], row["content"], row["title"])
+                    )
+                indexed += len(rows)
+        return indexed
+
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 20, offset: int = 0) -> dict:
+        """Ranked page of matching documents with highlighted snippets."""
+        match = build_match_query(query)
+        if not self.enabled or match is None:
+            return {"results": [], "next_offset": None}
+        sql = f"""
+            SELECT d.kind, d.ref, d.title, bm25(search_index, 5.0, 1.0) AS score
+            FROM search_index JOIN search_docs d ON d.id = search_index.rowid
+            WHERE search_index MATCH ? {"AND d.kind = ?" if kind else ""}
+            ORDER BY score
+            LIMIT ?
+        """
+        # Every shard's best offset + limit + 1 rows are enough to rank the requested page
+        params = [match] + ([kind] if kind else []) + [offset + limit + 1]
+
+        def search_shard(shard: Database) -> list:
+            with shard.get_connection() as conn:
+                return [(row, shard) for row in conn.execute(sql, params).fetchall()]
+
+        rows = heapq.merge(*self.db.gather(search_shard), key=lambda item: item[0]["score"])
+        rows = list(itertools.islice(rows, offset, offset + limit + 1))
+        highlight = highlight_pattern(query)
+        results = [
+            {
+                "kind": row["kind"],
+                "ref": row["ref"],
+                "title": row["title"],
+                "snippet": make_snippet(self._body(shard, row["kind"], row["ref"]), highlight),
+                # bm25 is lower-is-better; flip it so higher scores rank first
+                "score": round(-row["score"], 4),
+            }
+            for row, shard in rows[:limit]
+        ]
+        next_offset = offset + limit if len(rows) > limit else None
+        return {"results": results, "next_offset": next_offset}
+
+    def _body(self, shard: Database, kind: str, ref: str) -> str:
+        table, key = _SOURCES[kind]
+        with shard.get_connection() as conn:
+            row = conn.execute(f"SELECT content FROM {table} WHERE {key} = ?", (ref,)).fetchone()
+        return (shard.codec.decode(row["content"]) if row is not None else None) or ""
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class SelectionAggregator:
+    """
+    Collects selection events per room and emits them in batches on a fixed
+    tick instead of relaying every cursor move. Only the latest event per user
+    is kept between ticks; at most max_batch events go out per room per tick
+    and the rest wait for the next one.
+    """
+
+    def __init__(self, emit: Callable[[str, List[dict]], None], tick_hz: float = 25.0, max_batch: int = 50):
+        self.emit = emit
+        self.tick_hz = tick_hz
+        self.max_batch = max_batch
+        # room_name -> userId -> latest selection or selection_clear event
+        self._pending: Dict[str, Dict[str, dict]] = {}
+        self.events_received = 0
+        self.events_sent = 0
+
+    def add(self, room_name: str, event: dict):
+        """Record a user's latest selection event for the next tick."""
+        pending = self._pending.setdefault(room_name, {})
+        # Re-insert so the most recently active users are sent last
+        pending.pop(event["userId"], None)
+        pending[event["userId"]] = event
+        self.events_received += 1
+
+    @property
+    def pending_rooms(self) -> int:
+        return len(self._pending)
+
+    def discard_room(self, room_name: str):
+        self._pending.pop(room_name, None)
+
+    def flush(self):
+        """Emit one batch per room with pending events."""
+        for room_name in list(self._pending):
+            pending = self._pending[room_name]
+            user_ids = list(pending)[:self.max_batch]
+            batch = [pending.pop(user_id) for user_id in user_ids]
+            if not pending:
+                del self._pending[room_name]
+            self.events_sent += len(batch)
+            self.emit(room_name, batch)
+
+    async def run(self):
+        """Flush pending selections every tick until cancelled."""
+        interval = 1.0 / self.tick_hz
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("Failed to send selections: %s", e)
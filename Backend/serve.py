@@ -0,0 +1,22 @@
+"""
+Start the backend under uvicorn with the tuned websocket compression from
+ws_compression.py. Equivalent to `uvicorn main:app`, which would use uvicorn's
+default deflate settings.
+
+    HOST=0.0.0.0 PORT=8000 WORKERS=4 python serve.py
+"""
+import os
+
+import uvicorn
+
+from ws_compression import WS_DEFLATE, TunedWSProtocol
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        workers=int(os.environ.get("WORKERS", "1")),
+        ws=TunedWSProtocol,
+        ws_per_message_deflate=WS_DEFLATE,
+    )
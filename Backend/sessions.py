@@ -0,0 +1,68 @@
+import secrets
+import time
+from typing import Dict, Optional
+
+
+class Session:
+    """Identity a reconnecting client can reclaim with its session token."""
+
+    __slots__ = ("token", "room_name", "client_id", "epoch", "expires_at")
+
+    def __init__(self, token: str, room_name: str, client_id: str):
+        self.token = token
+        self.room_name = room_name
+        self.client_id = client_id
+        # Epoch of the room document the client last synced with
+        self.epoch: Optional[str] = None
+        self.expires_at = float("inf")
+
+
+class SessionStore:
+    """
+    Session tokens for websocket clients. A session stays valid while its
+    client is connected and for `ttl` seconds after it disconnects, so a client
+    that drops can reconnect as the same user and catch up from where it was.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._sessions: Dict[str, Session] = {}
+        self.resumed = 0
+        self.issued = 0
+
+    def issue(self, room_name: str, client_id: str) -> Session:
+        session = Session(secrets.token_urlsafe(16), room_name, client_id)
+        self._sessions[session.token] = session
+        self.issued += 1
+        return session
+
+    def resume(self, token: str, room_name: str) -> Optional[Session]:
+        """Return the live session for token in this room, or None."""
+        session = self._sessions.get(token)
+        if session is None or session.room_name != room_name:
+            return None
+        if session.expires_at < time.monotonic():
+            del self._sessions[token]
+            return None
+        session.expires_at = float("inf")
+        self.resumed += 1
+        return session
+
+    def release(self, session: Session):
+        """Start the session's expiry clock once its client disconnects."""
+        session.expires_at = time.monotonic() + self.ttl
+
+    def discard_room(self, room_name: str):
+        for token in [t for t, s in self._sessions.items() if s.room_name == room_name]:
+            del self._sessions[token]
+
+    def prune(self) -> int:
+        """Drop expired sessions. Returns how many were removed."""
+        now = time.monotonic()
+        expired = [token for token, session in self._sessions.items() if session.expires_at < now]
+        for token in expired:
+            del self._sessions[token]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,355 @@
+"""
+Room storage spread over several SQLite files.
+
+SQLite lets one connection write to a file at a time, so with everything in
+rooms.db, edits to unrelated rooms queue on a single lock. ShardedDatabase
+routes each room to one of N files by a stable hash of its name:
+
+    rooms.db with 4 shards -> rooms.0-of-4.db ... rooms.3-of-4.db
+
+A room's content, versions and interview notes live in its shard; admin
+content lives in shard 0. Each shard has its own writer thread. Writes that
+span rooms (batched content flushes, auto-lock) are split by shard and applied
+in parallel. Queries across rooms (room listings, search) run on every shard
+and their results are merged.
+
+The shard count is part of the file names, so starting with a different
+DB_SHARDS never misroutes rooms; it just opens an empty set of files. Move data
+between layouts offline with:
+
+    python sharding.py reshard --db rooms.db --from-shards 1 --to-shards 4
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+from content_codec import ContentCodec
+from database import Database, encode_cursor
+from room_cache import RoomCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rows copied per statement while resharding
+RESHARD_BATCH = 1000
+
+# table -> (columns copied when resharding, column routing rows to a shard or
+# None for the home shard). search_dirty is set so every shard rebuilds its index.
+RESHARD_TABLES = {
+    "rooms": (["room_name", "content", "is_locked", "created_at", "updated_at"], "room_name"),
+    "room_versions": (["room_name", "version", "kind", "data", "content_length", "created_at"], "room_name"),
+    # Notes are found by room; their ids may repeat across the old shards, so they get new ones
+    "interview_notes": (["room_name", "content", "created_at", "updated_at"], "room_name"),
+    "admin_content": (["id", "title", "content", "content_size", "created_at", "updated_at"], None),
+}
+
+
+def shard_index(room_name: str, shard_count: int) -> int:
+    """Stable shard of a room: CRC-32 of its UTF-8 name, so it is the same in every process."""
+    return zlib.crc32(room_name.encode("utf-8")) % shard_count
+
+
+def shard_paths(db_path: str, shard_count: int) -> List[str]:
+    """Files of a layout. A single shard is the unsharded database itself."""
+    if shard_count <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.{index}-of-{shard_count}{ext}" for index in range(shard_count)]
+
+
+class ShardedDatabase:
+    """Database's interface over shard_count SQLite files, one Database per file."""
+
+    def __init__(
+        self,
+        db_path: str = "rooms.db",
+        shard_count: int = 4,
+        pool_size: int = 8,
+        cache: Optional[RoomCache] = None,
+        codec: Optional[ContentCodec] = None,
+    ):
+        if shard_count < 2:
+            raise ValueError("ShardedDatabase needs at least 2 shards; use Database for one")
+        self.db_path = db_path
+        self.shard_count = shard_count
+        self.codec = codec if codec is not None else ContentCodec(enabled=False)
+        paths = shard_paths(db_path, shard_count)
+        if os.path.exists(db_path) and not any(os.path.exists(path) for path in paths):
+            logger.warning(
+                "Starting %d empty shards next to %s; run sharding.py reshard to move its rooms",
+                shard_count, db_path
+            )
+        # One cache for all shards: room names are unique across them
+        self._shards = [Database(path, pool_size=pool_size, cache=cache, codec=self.codec) for path in paths]
+        self._writers = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"db-shard{index}-write")
+            for index in range(shard_count)
+        ]
+        self._readers = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="db-shard-read")
+
+    @property
+    def shards(self) -> List[Database]:
+        return list(self._shards)
+
+    @property
+    def home(self) -> Database:
+        """The shard holding admin content."""
+        return self._shards[0]
+
+    @property
+    def search_enabled(self) -> bool:
+        return all(shard.search_enabled for shard in self._shards)
+
+    @property
+    def rows_migrated(self) -> int:
+        return sum(shard.rows_migrated for shard in self._shards)
+
+    def for_room(self, room_name: str) -> Database:
+        return self._shards[shard_index(room_name, self.shard_count)]
+
+    def split_rooms(self, room_names: Iterable[str]) -> Dict[Database, List[str]]:
+        groups: Dict[Database, List[str]] = {}
+        for room_name in room_names:
+            groups.setdefault(self.for_room(room_name), []).append(room_name)
+        return groups
+
+    def gather(self, fn: Callable[[Database], T]) -> List[T]:
+        """Run a read against every shard in parallel; results in shard order."""
+        return [future.result() for future in [self._readers.submit(fn, shard) for shard in self._shards]]
+
+    def writer(self, shard: Database) -> ThreadPoolExecutor:
+        """The single thread that writes to a shard's file."""
+        return self._writers[self._shards.index(shard)]
+
+    def write_each(self, work: Dict[Database, Callable[[Database], T]]) -> List[T]:
+        """
+        Run per-shard writes in parallel, each on its shard's writer thread.
+        Must not be called from a shard writer thread, which would wait on itself.
+        """
+        futures = [self.writer(shard).submit(fn, shard) for shard, fn in work.items()]
+        return [future.result() for future in futures]
+
+    def close(self):
+        for writer in self._writers:
+            writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        for shard in self._shards:
+            shard.close()
+
+    # Rooms
+
+    def create_room(self, room_name: str) -> bool:
+        return self.for_room(room_name).create_room(room_name)
+
+    def get_room(self, room_name: str) -> Optional[dict]:
+        return self.for_room(room_name).get_room(room_name)
+
+    def get_room_info(self, room_name: str) -> Optional[dict]:
+        return self.for_room(room_name).get_room_info(room_name)
+
+    def delete_room(self, room_name: str) -> bool:
+        return self.for_room(room_name).delete_room(room_name)
+
+    def get_room_content(self, room_name: str) -> Optional[str]:
+        return self.for_room(room_name).get_room_content(room_name)
+
+    def read_room_content(self, room_name: str, max_size: Optional[int] = None, chunk_size: int = 64 * 1024) -> Optional[str]:
+        return self.for_room(room_name).read_room_content(room_name, max_size, chunk_size)
+
+    def room_exists(self, room_name: str) -> bool:
+        return self.for_room(room_name).room_exists(room_name)
+
+    def update_room_content(self, room_name: str, content: str) -> bool:
+        return self.for_room(room_name).update_room_content(room_name, content)
+
+    def update_rooms_content(self, contents: Dict[str, str]) -> int:
+        """Write each shard's part of the batch in its own transaction, in parallel."""
+        work = {
+            shard: (lambda shard, names=names: shard.update_rooms_content({name: contents[name] for name in names}))
+            for shard, names in self.split_rooms(contents).items()
+        }
+        return sum(self.write_each(work))
+
+    def toggle_room_lock(self, room_name: str, locked: bool) -> bool:
+        return self.for_room(room_name).toggle_room_lock(room_name, locked)
+
+    def is_room_locked(self, room_name: str) -> bool:
+        return self.for_room(room_name).is_room_locked(room_name)
+
+    def lock_rooms_older_than_days(self, days: int = 30) -> int:
+        work = {shard: (lambda shard: shard.lock_rooms_older_than_days(days)) for shard in self._shards}
+        return sum(self.write_each(work))
+
+    def get_all_rooms(self) -> List[dict]:
+        # Each shard's list is already newest first
+        return list(heapq.merge(
+            *self.gather(lambda shard: shard.get_all_rooms()),
+            key=lambda room: room["created_at"] or "",
+            reverse=True
+        ))
+
+    def list_rooms(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        is_locked: Optional[bool] = None,
+        prefix: Optional[str] = None,
+        include_total: bool = False,
+    ) -> dict:
+        """
+        Database.list_rooms over every shard. Cursors are positions in the
+        (created_at, room_name) order, which is the same on every shard, so each
+        shard returns its next `limit` rooms and the merged page takes the first
+        `limit` of those.
+        """
+        pages = self.gather(lambda shard: shard.list_rooms(limit, cursor, is_locked, prefix, include_total))
+        merged = heapq.merge(
+            *(page["rooms"] for page in pages),
+            key=lambda room: (room["created_at"], room["room_name"]),
+            reverse=True
+        )
+        rooms = [room for _, room in zip(range(limit + 1), merged)]
+        next_cursor = None
+        if len(rooms) > limit:
+            rooms = rooms[:limit]
+            next_cursor = encode_cursor(rooms[-1]["created_at"], rooms[-1]["room_name"])
+        total = sum(page["total"] for page in pages) if include_total else None
+        return {"rooms": rooms, "next_cursor": next_cursor, "total": total}
+
+    # Interview notes live with their room
+
+    def get_interview_notes(self, room_name: str) -> Optional[dict]:
+        return self.for_room(room_name).get_interview_notes(room_name)
+
+    def create_or_update_interview_notes(self, room_name: str, content: str) -> bool:
+        return self.for_room(room_name).create_or_update_interview_notes(room_name, content)
+
+    def delete_interview_notes(self, room_name: str) -> bool:
+        return self.for_room(room_name).delete_interview_notes(room_name)
+
+    # Admin content lives in the home shard
+
+    def add_admin_content(self, title: str, content: str) -> bool:
+        return self.home.add_admin_content(title, content)
+
+    def get_admin_content(self, content_id: int = None) -> List[dict]:
+        return self.home.get_admin_content(content_id)
+
+    def list_admin_content(self) -> List[dict]:
+        return self.home.list_admin_content()
+
+    def update_admin_content(self, content_id: int, title: str, content: str) -> bool:
+        return self.home.update_admin_content(content_id, title, content)
+
+    def delete_admin_content(self, content_id: int) -> bool:
+        return self.home.delete_admin_content(content_id)
+
+    # Storage maintenance
+
+    def compress_stored_content(self, batch_size: int = 200) -> int:
+        """Migrate the next batch from the first shard that still has rows to examine."""
+        for shard in self._shards:
+            examined = self.write_each({shard: lambda shard: shard.compress_stored_content(batch_size)})[0]
+            if examined:
+                return examined
+        return 0
+
+    def content_storage_stats(self) -> dict:
+        """Database.content_storage_stats summed over the shards."""
+        stats: Dict[str, Dict[str, dict]] = {}
+        for shard_stats in self.gather(lambda shard: shard.content_storage_stats()):
+            for table, formats in shard_stats.items():
+                for format_name, counts in formats.items():
+                    totals = stats.setdefault(table, {}).setdefault(format_name, {"rows": 0, "bytes": 0})
+                    totals["rows"] += counts["rows"]
+                    totals["bytes"] += counts["bytes"]
+        return stats
+
+
+def reshard(db_path: str, from_shards: int, to_shards: int) -> dict:
+    """
+    Copy every room, version, interview note and admin content row from one
+    layout of db_path to another. Stored values are copied as they are
+    (compressed or not). Search indexes are rebuilt by the server afterwards.
+    Run it with the server stopped; the source files are left untouched and
+    the destination files must not exist yet.
+    """
+    sources = shard_paths(db_path, from_shards)
+    destinations = shard_paths(db_path, to_shards)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing source database {missing[0]}")
+    existing = [path for path in destinations if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Destination {existing[0]} already exists")
+
+    # Create the schema, then copy with plain connections in large transactions
+    for path in destinations:
+        Database(path, pool_size=1).close()
+    targets = [sqlite3.connect(path) for path in destinations]
+    counts = {table: 0 for table in RESHARD_TABLES}
+    try:
+        for source_path in sources:
+            source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+            try:
+                for table, (columns, route_column) in RESHARD_TABLES.items():
+                    dirty = table != "room_versions"
+                    insert = (
+                        f"INSERT INTO {table} ({', '.join(columns)}{', search_dirty' if dirty else ''}) "
+                        f"VALUES ({', '.join('?' for _ in columns)}{', 1' if dirty else ''})"
+                    )
+                    route = columns.index(route_column) if route_column else None
+                    # Columns added after the source was last opened by the server are
+                    # copied as NULL and filled in when the server opens the new files
+                    present = {row[1] for row in source.execute(f"PRAGMA table_info({table})")}
+                    selected = [column if column in present else "NULL" for column in columns]
+                    rows = source.execute(f"SELECT {', '.join(selected)} FROM {table}")
+                    while True:
+                        batch = rows.fetchmany(RESHARD_BATCH)
+                        if not batch:
+                            break
+                        grouped: Dict[int, list] = {}
+                        for row in batch:
+                            index = shard_index(row[route], to_shards) if route is not None else 0
+                            grouped.setdefault(index, []).append(row)
+                        for index, group in grouped.items():
+                            targets[index].executemany(insert, group)
+                        counts[table] += len(batch)
+            finally:
+                source.close()
+        for target in targets:
+            target.commit()
+    except Exception:
+        for target in targets:
+            target.close()
+        for path in destinations:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        raise
+    rooms_per_shard = []
+    for target in targets:
+        rooms_per_shard.append(target.execute("SELECT COUNT(*) FROM rooms").fetchone()[0])
+        target.close()
+    return {"files": destinations, "rows": counts, "rooms_per_shard": rooms_per_shard}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["reshard"])
+    parser.add_argument("--db", default="rooms.db", help="database path the shard files are named after")
+    parser.add_argument("--from-shards", type=int, default=1, help="current shard count (1 = just --db)")
+    parser.add_argument("--to-shards", type=int, required=True, help="new shard count (1 = just --db)")
+    args = parser.parse_args(argv)
+    print(json.dumps(reshard(args.db, args.from_shards, args.to_shards)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from async_database import AsyncDatabase
+from database import Database
+from sharding import ShardedDatabase
+
+
+def test_room_writes_run_on_their_shards_writer(tmp_path):
+    db = AsyncDatabase(ShardedDatabase(str(tmp_path / "rooms.db"), 2, pool_size=2))
+    rooms = [f"room-{index}" for index in range(8)]
+
+    def writer_thread(room_name: str) -> str:
+        assert db.db.for_room(room_name).room_exists(room_name)
+        return threading.current_thread().name
+
+    async def run():
+        await asyncio.gather(*(db.create_room(room_name) for room_name in rooms))
+        return {room_name: await db.run_room_write(room_name, writer_thread, room_name) for room_name in rooms}
+
+    threads = asyncio.run(run())
+    for room_name, thread in threads.items():
+        index = db.db.shards.index(db.db.for_room(room_name))
+        assert thread.startswith(f"db-shard{index}-write")
+    assert len(set(threads.values())) == 2
+    db.close()
+
+
+def test_cross_shard_writes_reach_every_shard(tmp_path):
+    db = AsyncDatabase(ShardedDatabase(str(tmp_path / "rooms.db"), 2, pool_size=2))
+    rooms = [f"room-{index}" for index in range(8)]
+
+    async def run():
+        for room_name in rooms:
+            await db.create_room(room_name)
+        return await db.update_rooms_content({room_name: room_name * 2 for room_name in rooms})
+
+    assert asyncio.run(run()) == len(rooms)
+    assert all(db.db.get_room_content(room_name) == room_name * 2 for room_name in rooms)
+    db.close()
+
+
+def test_unsharded_writes_share_one_writer(tmp_path):
+    db = AsyncDatabase(Database(str(tmp_path / "rooms.db"), pool_size=2))
+
+    async def run():
+        await db.create_room("room")
+        await db.add_admin_content("title", "body")
+        return await db.run_room_write("room", lambda: threading.current_thread().name)
+
+    assert asyncio.run(run()).startswith("db-write")
+    db.close()
@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backup import BackupError, import_records, iter_export, online_backup
+from database import Database
+from sharding import ShardedDatabase
+
+
+def make_database(path, journal_mode, rows=2000):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("CREATE TABLE t (x BLOB)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(os.urandom(4000),)] * rows)
+    conn.commit()
+    conn.close()
+
+
+class Writer(threading.Thread):
+    """Keeps writing to a database, as the write buffer does while rooms are edited."""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        while not self.stopped.is_set():
+            conn.execute("INSERT INTO t VALUES (x'00')")
+            conn.commit()
+            time.sleep(0.02)
+        conn.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.join()
+
+
+def test_wal_backup_completes_under_writes(tmp_path):
+    source = str(tmp_path / "rooms.db")
+    make_database(source, "wal")
+    with Writer(source):
+        result = online_backup(source, str(tmp_path / "bk" / "rooms.db"), pages_per_step=64)
+    assert result["steps"] == 1
+    assert os.listdir(tmp_path / "bk") == ["rooms.db"]
+    copy = sqlite3.connect(result["path"])
+    assert copy.execute("SELECT COUNT(*) FROM t").fetchone()[0] >= 2000
+    copy.close()
+
+
+def test_restarted_backup_fails_and_cleans_up(tmp_path):
+    source = str(tmp_path / "rooms.db")
+    make_database(source, "delete")
+    with Writer(source):
+        with pytest.raises(BackupError):
+            online_backup(source, str(tmp_path / "bk" / "rooms.db"), pages_per_step=16, pause=0.01, max_restarts=2)
+    assert os.listdir(tmp_path / "bk") == []
+
+
+def test_export_moves_notes_between_shard_layouts(tmp_path):
+    sharded = ShardedDatabase(str(tmp_path / "sharded.db"), 2, pool_size=2)
+    for i in range(8):
+        sharded.create_room(f"room{i}")
+        sharded.create_or_update_interview_notes(f"room{i}", f"notes {i}")
+    # Both shards number their notes from 1
+    assert len({note["id"] for shard in sharded.shards for note in _notes(shard)}) < 8
+    records = [json.loads(line) for line in iter_export(sharded)]
+    sharded.close()
+
+    single = Database(str(tmp_path / "single.db"), pool_size=2)
+    single.create_room("room0")
+    single.create_or_update_interview_notes("room0", "stale")
+    assert import_records(single, records)["interview_notes"] == 8
+    # Importing again updates the notes instead of duplicating them
+    import_records(single, records)
+    assert [single.get_interview_notes(f"room{i}")["content"] for i in range(8)] == [f"notes {i}" for i in range(8)]
+    assert len(_notes(single)) == 8
+    single.close()
+
+
+def _notes(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT id, room_name FROM interview_notes").fetchall()
+
+
+@pytest.mark.parametrize("record", [[1], "room", {"type": "room", "room_name": "a", "content": 5}, {"type": "nope"}])
+def test_import_rejects_malformed_records(tmp_path, record):
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2)
+    with pytest.raises(ValueError):
+        import_records(db, [record])
+    assert db.get_all_rooms() == []
+    db.close()
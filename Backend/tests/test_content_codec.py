@@ -0,0 +1,26 @@
+import pytest
+
+from content_codec import ContentCodec
+
+
+def pieces(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_iter_decode_round_trips(enabled, size):
+    codec = ContentCodec(enabled, min_size=16)
+    content = "héllo wörld € " * 2000
+    stored = codec.encode(content)
+    data = stored if isinstance(stored, bytes) else stored.encode("utf-8")
+    assert "".join(codec.iter_decode(pieces(data, size), max_piece=1000)) == content
+
+
+def test_iter_decode_bounds_inflated_pieces():
+    codec = ContentCodec(True, min_size=16)
+    stored = codec.encode("a" * 10_000_000)
+    # The whole compressed value arrives in one read, yet inflates a bit at a time
+    chunks = list(codec.iter_decode([stored], max_piece=4096))
+    assert max(len(chunk) for chunk in chunks) <= 4096
+    assert sum(len(chunk) for chunk in chunks) == 10_000_000
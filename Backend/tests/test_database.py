@@ -0,0 +1,40 @@
+import pytest
+
+import database
+from content_codec import ContentCodec
+from database import Database, DocumentTooLarge
+
+
+@pytest.fixture(params=[True, False], ids=["blobopen", "substr"])
+def blob_io(request, monkeypatch):
+    if request.param and not database._HAS_BLOBOPEN:
+        pytest.skip("Connection.blobopen needs Python 3.11")
+    monkeypatch.setattr(database, "_HAS_BLOBOPEN", request.param)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_read_room_content(tmp_path, blob_io, compress):
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2, codec=ContentCodec(compress, min_size=64))
+    content = "héllo wörld € " * 5000
+    db.create_room("room")
+    db.create_room("empty")
+    db.update_room_content("room", content)
+    assert db.read_room_content("room", chunk_size=1000) == content
+    assert db.read_room_content("empty") == ""
+    assert db.read_room_content("missing") is None
+    with pytest.raises(DocumentTooLarge):
+        db.read_room_content("room", max_size=len(content) - 1, chunk_size=1000)
+    assert db.read_room_content("room", max_size=len(content)) == content
+    db.close()
+
+
+def test_list_rooms_prefix_ignores_case(tmp_path):
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2)
+    for room_name in ["Alpha", "alps", "ALPINE", "beta"]:
+        db.create_room(room_name)
+    page = db.list_rooms(limit=2, prefix="aLp", include_total=True)
+    assert page["total"] == 3
+    rest = db.list_rooms(limit=2, cursor=page["next_cursor"], prefix="aLp")
+    names = [room["room_name"] for room in page["rooms"] + rest["rooms"]]
+    assert sorted(names) == ["ALPINE", "Alpha", "alps"]
+    db.close()
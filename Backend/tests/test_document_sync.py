@@ -0,0 +1,165 @@
+import random
+
+import pytest
+
+from document_sync import (
+    OpError,
+    RoomDocument,
+    apply_ops,
+    delete_op,
+    diff_to_ops,
+    insert_op,
+    normalize_ops,
+    transform,
+)
+
+
+def random_ops(rng, content, count):
+    """count random ops, each valid against content as changed by the ones before it."""
+    ops = []
+    for _ in range(count):
+        if content and rng.random() < 0.4:
+            pos = rng.randrange(len(content))
+            op = delete_op(pos, rng.randint(1, min(5, len(content) - pos)))
+        else:
+            op = insert_op(rng.randint(0, len(content)), rng.choice(["a", "bc", "xyz"]))
+        content = apply_ops(content, [op])
+        ops.append(op)
+    return ops
+
+
+def test_transform_insert_tie_respects_ops_win():
+    ops, against = [insert_op(1, "a")], [insert_op(1, "b")]
+    assert apply_ops(apply_ops("xy", against), transform(ops, against, ops_win=True)[0]) == "xaby"
+    assert apply_ops(apply_ops("xy", against), transform(ops, against)[0]) == "xbay"
+
+
+def test_transform_splits_delete_around_insert():
+    ops, against = transform([delete_op(1, 4)], [insert_op(3, "XY")])
+    assert ops == [delete_op(1, 2), delete_op(3, 2)]
+    assert apply_ops(apply_ops("abcdefg", [insert_op(3, "XY")]), ops) == "aXYfg"
+    assert apply_ops(apply_ops("abcdefg", [delete_op(1, 4)]), against) == "aXYfg"
+
+
+def test_transform_overlapping_deletes():
+    ops, against = transform([delete_op(2, 4)], [delete_op(0, 3)])
+    assert apply_ops(apply_ops("abcdefgh", [delete_op(0, 3)]), ops) == "gh"
+    assert apply_ops(apply_ops("abcdefgh", [delete_op(2, 4)]), against) == "gh"
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_transform_converges(seed):
+    rng = random.Random(seed)
+    content = "".join(rng.choice("abcdef") for _ in range(rng.randint(0, 30)))
+    ops = random_ops(rng, content, rng.randint(0, 8))
+    against = random_ops(rng, content, rng.randint(0, 8))
+    ops_after, against_after = transform(ops, against)
+    assert apply_ops(apply_ops(content, against), ops_after) == apply_ops(apply_ops(content, ops), against_after)
+
+
+def test_transform_many_ops_does_not_recurse():
+    ops = [insert_op(i, "x") for i in range(5000)]
+    ops_after, against_after = transform(ops, [insert_op(0, "y")])
+    assert apply_ops("y", ops_after) == apply_ops("x" * 5000, against_after)
+
+
+def test_normalize_ops_validates_and_caps():
+    assert normalize_ops([insert_op(0, ""), delete_op(1, 0), insert_op(2, "a")]) == [insert_op(2, "a")]
+    with pytest.raises(OpError):
+        normalize_ops([{"op": "insert", "pos": -1, "text": "a"}])
+    with pytest.raises(OpError):
+        normalize_ops([{"op": "move", "pos": 0}])
+    with pytest.raises(OpError):
+        normalize_ops([insert_op(0, "a")] * 11, max_ops=10)
+
+
+def test_diff_to_ops():
+    assert diff_to_ops("hello world", "hello there world") == [insert_op(6, "there ")]
+    assert apply_ops("abcdef", diff_to_ops("abcdef", "abXYef")) == "abXYef"
+    assert diff_to_ops("same", "same") == []
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_apply_ops_matches_one_op_at_a_time(seed):
+    rng = random.Random(seed)
+    content = "".join(rng.choice("abcdef") for _ in range(rng.randint(0, 40)))
+    ops = random_ops(rng, content, rng.randint(0, 20))
+    expected = content
+    for op in ops:
+        expected = apply_ops(expected, [op])
+    assert apply_ops(content, ops) == expected
+
+
+def test_apply_ops_rejects_out_of_range():
+    with pytest.raises(OpError):
+        apply_ops("abc", [insert_op(1, "x"), insert_op(5, "y")])
+    with pytest.raises(OpError):
+        apply_ops("abc", [delete_op(0, 1), delete_op(1, 3)])
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_diff_to_ops_round_trips(seed):
+    rng = random.Random(seed)
+    old = "".join(rng.choice("ab") for _ in range(rng.randint(0, 30)))
+    new = "".join(rng.choice("ab") for _ in range(rng.randint(0, 30)))
+    ops = diff_to_ops(old, new)
+    assert len(ops) <= 2
+    assert apply_ops(old, ops) == new
+
+
+def test_ops_since():
+    document = RoomDocument("", history_size=3)
+    for i in range(5):
+        document.apply(document.seq, [insert_op(0, str(i))])
+    assert document.ops_since(5) == []
+    assert document.ops_since(3) == [insert_op(0, "3"), insert_op(0, "4")]
+    assert document.ops_since(2) == [insert_op(0, "2"), insert_op(0, "3"), insert_op(0, "4")]
+    # Older than the history, or from the future
+    assert document.ops_since(1) is None
+    assert document.ops_since(6) is None
+
+
+def test_apply_rebases_concurrent_edits():
+    document = RoomDocument("hello world")
+    base = document.seq
+    document.apply(base, [insert_op(0, ">> ")])
+    applied = document.apply(base, [delete_op(5, 6)])
+    assert applied == [delete_op(8, 6)]
+    assert document.content == ">> hello"
+    assert document.seq == 2
+
+
+def test_apply_too_old_base_needs_resync():
+    document = RoomDocument("", history_size=2)
+    for _ in range(3):
+        document.apply(document.seq, [insert_op(0, "a")])
+    assert document.apply(0, [insert_op(0, "b")]) is None
+    assert document.content == "aaa"
+
+
+def test_apply_over_rebase_budget_needs_resync():
+    document = RoomDocument("")
+    for _ in range(10):
+        document.apply(document.seq, [insert_op(0, "a")])
+    assert document.apply(0, [insert_op(0, "b")] * 5, max_rebase_work=49) is None
+    assert document.apply(0, [insert_op(0, "b")] * 5, max_rebase_work=50) is not None
+
+
+def test_apply_rejects_oversized_result_unchanged():
+    document = RoomDocument("abc")
+    with pytest.raises(OpError):
+        document.apply(0, [insert_op(3, "defg")], max_size=5)
+    assert document.content == "abc"
+    assert document.seq == 0
+
+
+def test_apply_far_behind_long_history():
+    # Each full-content replace records a delete and an insert
+    document = RoomDocument("x" * 100)
+    base = document.seq
+    for i in range(490):
+        document.replace(f"{i} " + "x" * 100)
+    assert len(document.ops_since(base)) > 950
+    applied = document.apply(base, [insert_op(100, "!")])
+    assert applied is not None
+    assert document.content.endswith("x" * 100 + "!")
@@ -0,0 +1,50 @@
+import sys
+
+from database import Database
+from room_cache import MISSING, RoomCache
+
+
+def test_content_is_bounded_by_bytes():
+    cache = RoomCache(max_size=100, ttl=60, max_content_bytes=3 * sys.getsizeof("x" * 1000))
+    for i in range(5):
+        cache.put_content(f"room{i}", "x" * 1000, cache.generation)
+    assert cache.stats()["content_size"] == 3
+    assert cache.stats()["content_bytes"] <= cache.max_content_bytes
+    assert cache.get_content("room0") is None
+    assert cache.get_content("room4") == "x" * 1000
+
+
+def test_content_larger_than_budget_is_not_cached():
+    cache = RoomCache(max_content_bytes=1000)
+    cache.put_content("big", "x" * 5000, cache.generation)
+    assert cache.get_content("big") is None
+    assert cache.stats()["content_bytes"] == 0
+
+
+def test_stale_generation_is_not_cached():
+    cache = RoomCache()
+    generation = cache.generation
+    cache.invalidate("room")
+    cache.put("room", {"room_name": "room"}, generation)
+    cache.put_content("room", "old", generation)
+    assert cache.get("room") is None
+    assert cache.get_content("room") is None
+
+
+def test_metadata_lookups_do_not_cache_content(tmp_path):
+    cache = RoomCache()
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2, cache=cache)
+    db.create_room("room")
+    db.update_room_content("room", "hello " * 1000)
+    assert db.room_exists("room")
+    assert not db.is_room_locked("room")
+    assert "content" not in db.get_room_info("room")
+    assert cache.stats()["content_size"] == 0
+    assert db.get_room("room")["content"] == "hello " * 1000
+    assert cache.get_content("room") == "hello " * 1000
+    db.toggle_room_lock("room", True)
+    assert db.get_room_info("room")["is_locked"]
+    assert cache.get_content("room") is None
+    assert not db.room_exists("other")
+    assert cache.get("other") is MISSING
+    db.close()
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import database
+from content_codec import ContentCodec
+from database import Database
+from search import SearchIndex, highlight_pattern, make_snippet
+
+
+@pytest.fixture(params=[False, True], ids=["stored-body", "contentless-delete"])
+def db(request, tmp_path, monkeypatch):
+    if request.param and sqlite3.sqlite_version_info < (3, 43, 0):
+        pytest.skip("contentless_delete needs SQLite 3.43")
+    monkeypatch.setattr(database, "_FTS_CONTENTLESS_DELETE", request.param)
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2, codec=ContentCodec(True, min_size=64))
+    if not db.search_enabled:
+        pytest.skip("SQLite built without FTS5")
+    yield db
+    db.close()
+
+
+def test_search_finds_updates_and_forgets_rooms(db):
+    index = SearchIndex(db)
+    db.create_room("alpha")
+    db.update_room_content("alpha", "filler " * 100 + "the quick brown fox jumps over the lazy dog")
+    index.index_pending()
+    [result] = index.search("quick fo")["results"]
+    assert (result["kind"], result["ref"], result["title"]) == ("room", "alpha", "alpha")
+    assert result["snippet"] == "…**quick** brown **fox** jumps over the lazy dog"
+
+    db.update_room_content("alpha", "a slow green turtle")
+    index.index_pending()
+    assert index.search("quick")["results"] == []
+    assert [r["ref"] for r in index.search("turtle")["results"]] == ["alpha"]
+
+    db.delete_room("alpha")
+    assert index.search("turtle")["results"] == []
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM search_docs").fetchone()[0] == 0
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('integrity-check')")
+
+
+def test_index_holds_no_copy_of_bodies(db):
+    db.create_room("alpha")
+    db.update_room_content("alpha", "word " * 10000)
+    SearchIndex(db).index_pending()
+    with db.get_connection() as conn:
+        assert tuple(conn.execute("SELECT title, body FROM search_index").fetchone()) == (None, None)
+        stored = conn.execute("SELECT body FROM search_docs").fetchone()[0]
+    assert stored is None or len(stored) < 1000
+
+
+def test_contentful_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "rooms.db")
+    db = Database(path, pool_size=2)
+    db.create_room("alpha")
+    db.update_room_content("alpha", "hello world")
+    with db.get_connection() as conn:
+        conn.execute("DROP TABLE search_index")
+        conn.execute("CREATE VIRTUAL TABLE search_index USING fts5(title, body)")
+        conn.execute("UPDATE rooms SET search_dirty = 0")
+    db.close()
+
+    db = Database(path, pool_size=2)
+    index = SearchIndex(db)
+    assert index.index_pending() == 1
+    assert [r["ref"] for r in index.search("hello")["results"]] == ["alpha"]
+    db.close()
+
+
+def test_make_snippet():
+    highlight = highlight_pattern("Quick do")
+    assert make_snippet("The quick brown fox, the lazy dog.", highlight, size=4) == "…**quick** brown fox, the…"
+    assert make_snippet("Dogs and quickness", highlight) == "**Dogs** and quickness"
+    assert make_snippet("no match here", highlight, size=2) == "no match…"
+    assert make_snippet("", highlight) == ""
@@ -0,0 +1,57 @@
+import random
+
+from database import Database
+from versions import VersionStore
+
+
+def make_history(tmp_path, versions=60):
+    db = Database(str(tmp_path / "rooms.db"), pool_size=2)
+    store = VersionStore(db, snapshot_every=5, min_interval=0, retention_days=90, compact_after_days=7)
+    rng = random.Random(1)
+    contents = {}
+    content = ""
+    for room_name in ("old", "recent"):
+        db.create_room(room_name)
+    for version in range(1, versions + 1):
+        content = content[:rng.randint(0, len(content))] + f"edit {version}\n" + content[rng.randint(0, len(content)):]
+        store.record({"old": content, "recent": content})
+        contents[version] = content
+    with db.get_connection() as conn:
+        # Spread "old" over the last 120 days, a few versions per day
+        for version in range(1, versions + 1):
+            conn.execute(
+                "UPDATE room_versions SET created_at = datetime('now', ?) WHERE room_name = 'old' AND version = ?",
+                (f"-{(versions - version) * 2 // 3 * 3} days", version)
+            )
+    return db, store, contents
+
+
+def test_retention_only_touches_rooms_that_drop_versions(tmp_path):
+    db, store, contents = make_history(tmp_path)
+    assert store.retention_candidates() == ["old"]
+    before = store.list_versions("old", limit=100)["versions"]
+    removed = store.compact_room("old")
+    after = store.list_versions("old", limit=100)["versions"]
+    assert removed == len(before) - len(after) > 0
+    with db.get_connection() as conn:
+        # Nothing older than retention_days survives, and old versions are one per day
+        assert conn.execute(
+            "SELECT COUNT(*) FROM room_versions WHERE room_name = 'old' AND created_at <= datetime('now', '-90 days')"
+        ).fetchone()[0] == 0
+        assert conn.execute(
+            """
+            SELECT COUNT(*) FROM room_versions WHERE room_name = 'old' AND created_at <= datetime('now', '-7 days')
+            GROUP BY date(created_at) HAVING COUNT(*) > 1
+            """
+        ).fetchall() == []
+    # Kept versions still rebuild to their original content
+    for version in after:
+        assert store.get_version("old", version["version"])["content"] == contents[version["version"]]
+    # A second run finds nothing to do, and recent rooms are left alone
+    assert store.retention_candidates() == []
+    assert store.apply_retention() == {"rooms_compacted": 0, "versions_removed": 0}
+    assert len(store.list_versions("recent", limit=100)["versions"]) == 60
+    # Recording continues on top of the rewritten chain
+    store.record({"old": "new content"})
+    assert store.get_version("old", 61)["content"] == "new content"
+    db.close()
@@ -0,0 +1,323 @@
+"""
+Version history for room content, stored in the room_versions table.
+
+Checkpoints of a room's content are recorded as its buffered writes are
+flushed, at most one per `min_interval` seconds per room. Every
+`snapshot_every`-th stored version is a zlib-compressed full snapshot; the
+versions in between are zlib-compressed diffs (document_sync ops) against the
+previous stored version, so storage grows with the size of the edits rather
+than the size of the document. Reading a version applies at most
+`snapshot_every - 1` diffs to the nearest snapshot before it.
+
+Old versions are pruned by `apply_retention`, which keeps the newest version of
+every room, thins versions older than `compact_after_days` to one per room per
+day and drops versions older than `retention_days`.
+"""
+import json
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from database import Database
+from document_sync import apply_ops, diff_to_ops
+
+SNAPSHOT = "snapshot"
+DIFF = "diff"
+
+
+def encode_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"))
+
+
+def encode_diff(old: str, new: str) -> bytes:
+    return zlib.compress(json.dumps(diff_to_ops(old, new), separators=(",", ":")).encode("utf-8"))
+
+
+def apply_version(content: Optional[str], kind: str, data: bytes) -> str:
+    """Rebuild a version's content from the previous version's content and its stored row."""
+    raw = zlib.decompress(data).decode("utf-8")
+    if kind == SNAPSHOT:
+        return raw
+    if content is None:
+        raise ValueError("diff version without a preceding snapshot")
+    return apply_ops(content, json.loads(raw))
+
+
+class VersionStore:
+    """Records, lists and reconstructs room versions. Writes must come from one thread."""
+
+    def __init__(
+        self,
+        db: Database,
+        snapshot_every: int = 20,
+        min_interval: float = 60.0,
+        retention_days: float = 90.0,
+        compact_after_days: float = 7.0,
+    ):
+        self.db = db
+        self.snapshot_every = max(1, snapshot_every)
+        self.min_interval = min_interval
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self._lock = threading.Lock()
+        # room_name -> (version, content, diffs since last snapshot) of the newest stored version
+        self._latest: Dict[str, Tuple[int, str, int]] = {}
+        # room_name -> monotonic time of the last recorded version
+        self._recorded_at: Dict[str, float] = {}
+        # room_name -> content flushed while the room was rate-limited
+        self._deferred: Dict[str, str] = {}
+        self.versions_recorded = 0
+        self.bytes_written = 0
+
+    def record(self, contents: Dict[str, str]) -> int:
+        """Checkpoint flushed room content, deferring rooms recorded too recently. Returns versions written."""
+        now = time.monotonic()
+        due = {}
+        with self._lock:
+            for room_name, content in contents.items():
+                if now - self._recorded_at.get(room_name, float("-inf")) >= self.min_interval:
+                    due[room_name] = content
+                    self._deferred.pop(room_name, None)
+                else:
+                    self._deferred[room_name] = content
+        return self._write(due, now)
+
+    def record_deferred(self, force: bool = False) -> int:
+        """Checkpoint rate-limited rooms whose interval has passed (all of them if force). Returns versions written."""
+        now = time.monotonic()
+        with self._lock:
+            due = {
+                room_name: content for room_name, content in self._deferred.items()
+                if force or now - self._recorded_at.get(room_name, float("-inf")) >= self.min_interval
+            }
+            for room_name in due:
+                del self._deferred[room_name]
+        return self._write(due, now)
+
+    def _write(self, contents: Dict[str, str], now: float) -> int:
+        if not contents:
+            return 0
+        work = {
+            shard: (lambda shard, names=names: self._write_shard(shard, {name: contents[name] for name in names}))
+            for shard, names in self.db.split_rooms(contents).items()
+        }
+        written = sum(self.db.write_each(work))
+        with self._lock:
+            for room_name in contents:
+                self._recorded_at[room_name] = now
+        self.versions_recorded += written
+        return written
+
+    def _write_shard(self, shard: Database, contents: Dict[str, str]) -> int:
+        written = 0
+        with shard.get_connection() as conn:
+            for room_name, content in contents.items():
+                if conn.execute("SELECT 1 FROM rooms WHERE room_name = ?", (room_name,)).fetchone() is None:
+                    continue
+                row = conn.execute(
+                    "SELECT version FROM room_versions WHERE room_name = ? ORDER BY version DESC LIMIT 1",
+                    (room_name,)
+                ).fetchone()
+                latest = self._latest.get(room_name)
+                if row is None:
+                    latest = None
+                elif latest is None or latest[0] != row["version"]:
+                    # Not cached, or another worker recorded a version since
+                    latest = self._load_latest(conn, room_name, row["version"])
+                if latest is not None and latest[1] == content:
+                    continue
+                if latest is None or latest[2] + 1 >= self.snapshot_every:
+                    kind, data, chain = SNAPSHOT, encode_snapshot(content), 0
+                else:
+                    kind, data, chain = DIFF, encode_diff(latest[1], content), latest[2] + 1
+                version = latest[0] + 1 if latest is not None else 1
+                conn.execute(
+                    """
+                    INSERT INTO room_versions (room_name, version, kind, data, content_length)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (room_name, version, kind, data, len(content))
+                )
+                with self._lock:
+                    self._latest[room_name] = (version, content, chain)
+                self.bytes_written += len(data)
+                written += 1
+        return written
+
+    def _load_latest(self, conn, room_name: str, version: int) -> Tuple[int, str, int]:
+        rows = self._chain(conn, room_name, version)
+        content = None
+        for row in rows:
+            content = apply_version(content, row["kind"], row["data"])
+        return version, content, len(rows) - 1
+
+    def _chain(self, conn, room_name: str, version: int) -> list:
+        """Rows needed to rebuild a version: the nearest snapshot at or before it, then the diffs after it."""
+        return conn.execute(
+            """
+            SELECT version, kind, data, content_length, created_at FROM room_versions
+            WHERE room_name = ? AND version <= ? AND version >= (
+                SELECT MAX(version) FROM room_versions
+                WHERE room_name = ? AND version <= ? AND kind = 'snapshot'
+            )
+            ORDER BY version
+            """,
+            (room_name, version, room_name, version)
+        ).fetchall()
+
+    def list_versions(self, room_name: str, limit: int = 50, before: Optional[int] = None) -> dict:
+        """Newest-first page of a room's versions (metadata only)."""
+        query = "SELECT version, kind, content_length, created_at FROM room_versions WHERE room_name = ?"
+        params: list = [room_name]
+        if before is not None:
+            query += " AND version < ?"
+            params.append(before)
+        query += " ORDER BY version DESC LIMIT ?"
+        params.append(limit + 1)
+        with self.db.for_room(room_name).get_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        versions = [
+            {
+                "version": row["version"],
+                "kind": row["kind"],
+                "size": row["content_length"],
+                "created_at": row["created_at"],
+            }
+            for row in rows[:limit]
+        ]
+        next_before = versions[-1]["version"] if len(rows) > limit else None
+        return {"versions": versions, "next_before": next_before}
+
+    def get_version(self, room_name: str, version: int) -> Optional[dict]:
+        """Reconstruct one version of a room, or None if it doesn't exist."""
+        with self.db.for_room(room_name).get_connection() as conn:
+            rows = self._chain(conn, room_name, version)
+        if not rows or rows[-1]["version"] != version:
+            return None
+        content = None
+        for row in rows:
+            content = apply_version(content, row["kind"], row["data"])
+        return {
+            "room_name": room_name,
+            "version": version,
+            "created_at": rows[-1]["created_at"],
+            "content": content,
+        }
+
+    def discard(self, room_name: str):
+        """Forget cached state for a deleted room (its rows go with the room)."""
+        with self._lock:
+            self._latest.pop(room_name, None)
+            self._recorded_at.pop(room_name, None)
+            self._deferred.pop(room_name, None)
+
+    def apply_retention(self) -> dict:
+        """Thin and expire old versions. Returns how many rooms were compacted and versions removed."""
+        compacted = removed = 0
+        for room_name in self.retention_candidates():
+            dropped = self.compact_room(room_name)
+            if dropped:
+                compacted += 1
+                removed += dropped
+        return {"rooms_compacted": compacted, "versions_removed": removed}
+
+    def retention_candidates(self) -> List[str]:
+        """Rooms with versions that retention would remove, found from version metadata alone."""
+        rooms = []
+        for shard in self.db.shards:
+            with shard.get_connection() as conn:
+                rooms.extend(
+                    row["room_name"] for row in conn.execute(
+                        """
+                        SELECT DISTINCT room_name FROM (
+                            SELECT room_name, created_at,
+                                   LEAD(created_at) OVER (PARTITION BY room_name ORDER BY version) AS next_at
+                            FROM room_versions
+                        )
+                        WHERE next_at IS NOT NULL AND (
+                            created_at <= datetime('now', ?)
+                            OR (created_at <= datetime('now', ?) AND substr(next_at, 1, 10) = substr(created_at, 1, 10))
+                        )
+                        """,
+                        (f"-{self.retention_days} days", f"-{self.compact_after_days} days")
+                    ).fetchall()
+                )
+        return rooms
+
+    def compact_room(self, room_name: str) -> int:
+        """Rewrite one room's history with old versions thinned out. Returns versions removed."""
+        with self.db.for_room(room_name).get_connection() as conn:
+            dropped = self._compact_room(conn, room_name)
+        if dropped:
+            with self._lock:
+                self._latest.pop(room_name, None)
+        return dropped
+
+    def _compact_room(self, conn, room_name: str) -> int:
+        # Decide from metadata which versions to keep
+        rows = conn.execute(
+            """
+            SELECT version, kind, created_at,
+                   created_at <= datetime('now', ?) AS expired,
+                   created_at <= datetime('now', ?) AS old
+            FROM room_versions WHERE room_name = ? ORDER BY version
+            """,
+            (f"-{self.retention_days} days", f"-{self.compact_after_days} days", room_name)
+        ).fetchall()
+        keep = []
+        for index, row in enumerate(rows):
+            newest = index == len(rows) - 1
+            if row["expired"] and not newest:
+                keep.append(False)
+            elif row["old"] and not newest and rows[index + 1]["created_at"][:10] == row["created_at"][:10]:
+                # A later version from the same day stands in for this one
+                keep.append(False)
+            else:
+                keep.append(True)
+        if all(keep):
+            return 0
+
+        # Versions before the first removed one stay as they are. Replay from
+        # the snapshot their chain starts at, then re-encode the kept versions
+        # after them, holding only the current and previous kept content
+        first = keep.index(False)
+        start = max(first - 1, 0)
+        while start > 0 and rows[start]["kind"] != SNAPSHOT:
+            start -= 1
+        content = previous = None
+        chain = 0
+        for index in range(start, len(rows)):
+            version = rows[index]["version"]
+            row = conn.execute(
+                "SELECT kind, data FROM room_versions WHERE room_name = ? AND version = ?", (room_name, version)
+            ).fetchone()
+            content = apply_version(content, row["kind"], row["data"])
+            if index < first:
+                previous = content
+                chain = 0 if row["kind"] == SNAPSHOT else chain + 1
+                continue
+            if not keep[index]:
+                conn.execute("DELETE FROM room_versions WHERE room_name = ? AND version = ?", (room_name, version))
+                continue
+            if previous is None or chain + 1 >= self.snapshot_every:
+                kind, data, chain = SNAPSHOT, encode_snapshot(content), 0
+            else:
+                kind, data, chain = DIFF, encode_diff(previous, content), chain + 1
+            conn.execute(
+                "UPDATE room_versions SET kind = ?, data = ? WHERE room_name = ? AND version = ?",
+                (kind, data, room_name, version)
+            )
+            previous = content
+        return keep.count(False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            deferred = len(self._deferred)
+        return {
+            "versions_recorded": self.versions_recorded,
+            "bytes_written": self.bytes_written,
+            "deferred_rooms": deferred,
+            "snapshot_every": self.snapshot_every,
+            "min_interval": self.min_interval,
+        }
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Keeps the latest content of each edited room in memory and persists dirty
+    rooms in batched transactions instead of one UPDATE per edit.
+
+    The owner calls flush() on an interval, on last disconnect and on shutdown,
+    and as soon as put() reports that max_dirty rooms are pending.
+    on_flush, if given, is called with each batch after it has been written.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        flush_interval: float = 1.0,
+        max_dirty: int = 100,
+        on_flush: Optional[Callable[[Dict[str, str]], object]] = None,
+    ):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+        self.on_flush = on_flush
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Counters for tuning
+        self.writes_received = 0
+        self.writes_coalesced = 0
+        self.rows_persisted = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    def put(self, room_name: str, content: str) -> bool:
+        """Record the latest content of a room. Returns True if a flush is due."""
+        with self._lock:
+            self.writes_received += 1
+            if room_name in self._pending:
+                self.writes_coalesced += 1
+            self._pending[room_name] = content
+            return len(self._pending) >= self.max_dirty
+
+    def get_room_content(self, room_name: str, max_size: Optional[int] = None) -> Optional[str]:
+        """
+        Read a room's content, preferring a write that hasn't been flushed yet.
+        Raises DocumentTooLarge if stored content is longer than max_size.
+        """
+        with self._lock:
+            if room_name in self._pending:
+                return self._pending[room_name]
+        return self.db.read_room_content(room_name, max_size)
+
+    def update_pending(self, room_name: str, content: str):
+        """Replace a room's pending write, if it has one, without counting a new write."""
+        with self._lock:
+            if room_name in self._pending:
+                self._pending[room_name] = content
+
+    def discard(self, room_name: str):
+        """Drop a pending write, e.g. because the room is being deleted."""
+        with self._lock:
+            self._pending.pop(room_name, None)
+
+    def flush(self, room_name: Optional[str] = None) -> int:
+        """Persist pending writes (all rooms, or just room_name). Returns rows written."""
+        with self._lock:
+            if room_name is None:
+                batch, self._pending = self._pending, {}
+            elif room_name in self._pending:
+                batch = {room_name: self._pending.pop(room_name)}
+            else:
+                batch = {}
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            written = self.db.update_rooms_content(batch)
+        except Exception:
+            # Put the batch back unless a newer write arrived in the meantime
+            with self._lock:
+                for name, content in batch.items():
+                    self._pending.setdefault(name, content)
+            raise
+        with self._lock:
+            self.flushes += 1
+            self.rows_persisted += len(batch)
+            self.last_flush_seconds = time.perf_counter() - started
+        if self.on_flush is not None:
+            try:
+                self.on_flush(batch)
+            except Exception as e:
+                # The content itself is saved; don't retry the batch for this
+                logger.exception("Post-flush hook failed: %s", e)
+        return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "dirty_rooms": len(self._pending),
+                "writes_received": self.writes_received,
+                "writes_coalesced": self.writes_coalesced,
+                "rows_persisted": self.rows_persisted,
+                "flushes": self.flushes,
+                "last_flush_seconds": self.last_flush_seconds,
+                "flush_interval": self.flush_interval,
+                "max_dirty": self.max_dirty,
+            }
@@ -0,0 +1,125 @@
+"""
+permessage-deflate for /ws/{room_name} with tunable level and window size.
+
+uvicorn's wsproto protocol always offers wsproto's default deflate settings
+(level 6 equivalent, 32 KiB windows, every message compressed). TunedWSProtocol
+swaps in TunedPerMessageDeflate, which uses the WS_DEFLATE_* settings below and
+sends messages shorter than WS_DEFLATE_MIN_SIZE uncompressed (RFC 7692 lets
+each message choose). Run the app with serve.py to use it.
+"""
+import os
+import threading
+import zlib
+from typing import Tuple, Union
+
+from uvicorn.protocols.websockets.wsproto_impl import WSProtocol
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import AcceptConnection
+from wsproto.extensions import PerMessageDeflate
+from wsproto.frame_protocol import Opcode, RsvBits
+
+# Compress websocket messages at all
+WS_DEFLATE = os.environ.get("WS_DEFLATE", "1") == "1"
+# zlib level (1 = fastest, 9 = smallest) and memory level for outgoing messages
+WS_DEFLATE_LEVEL = int(os.environ.get("WS_DEFLATE_LEVEL", "5"))
+WS_DEFLATE_MEM_LEVEL = int(os.environ.get("WS_DEFLATE_MEM_LEVEL", "8"))
+# Server window size in bits (9-15); smaller windows use less memory per connection
+WS_DEFLATE_WINDOW_BITS = int(os.environ.get("WS_DEFLATE_WINDOW_BITS", "13"))
+# Messages shorter than this many bytes are sent uncompressed
+WS_DEFLATE_MIN_SIZE = int(os.environ.get("WS_DEFLATE_MIN_SIZE", "256"))
+
+
+class DeflateStats:
+    """Process-wide counters for outgoing websocket messages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages_compressed = 0
+        self.messages_uncompressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, compressed: bool, size_in: int, size_out: int):
+        with self._lock:
+            if compressed:
+                self.messages_compressed += 1
+            else:
+                self.messages_uncompressed += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": WS_DEFLATE,
+                "level": WS_DEFLATE_LEVEL,
+                "window_bits": WS_DEFLATE_WINDOW_BITS,
+                "min_size": WS_DEFLATE_MIN_SIZE,
+                "messages_compressed": self.messages_compressed,
+                "messages_uncompressed": self.messages_uncompressed,
+                "bytes_before": self.bytes_in,
+                "bytes_after": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            }
+
+
+deflate_stats = DeflateStats()
+
+
+class TunedPerMessageDeflate(PerMessageDeflate):
+    """PerMessageDeflate with a configurable level and a minimum message size."""
+
+    def __init__(self):
+        super().__init__(server_max_window_bits=WS_DEFLATE_WINDOW_BITS)
+        # Whether the message currently being sent is compressed (it may span frames)
+        self._outbound_compressed = False
+
+    def accept(self, offer: str) -> Union[bool, None, str]:
+        window_bits = self.server_max_window_bits
+        parameters = super().accept(offer)
+        if parameters is None or "server_max_window_bits" in parameters:
+            return parameters
+        # The client didn't ask for a limit; announce ours so we may use the smaller window
+        return "; ".join(p for p in (parameters, f"server_max_window_bits={window_bits}") if p)
+
+    def frame_outbound(self, proto, opcode: Opcode, rsv: RsvBits, data: bytes, fin: bool) -> Tuple[RsvBits, bytes]:
+        if not self._compressible_opcode(opcode):
+            return (rsv, data)
+        if opcode is not Opcode.CONTINUATION:
+            self._outbound_compressed = not (fin and len(data) < WS_DEFLATE_MIN_SIZE)
+        if not self._outbound_compressed:
+            deflate_stats.record(False, len(data), len(data))
+            return (rsv, data)
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(
+                WS_DEFLATE_LEVEL, zlib.DEFLATED, -self.server_max_window_bits, WS_DEFLATE_MEM_LEVEL
+            )
+        size_in = len(data)
+        rsv, data = super().frame_outbound(proto, opcode, rsv, data, fin)
+        deflate_stats.record(True, size_in, len(data))
+        return (rsv, data)
+
+
+class TunedWSConnection(WSConnection):
+    """Server connection that negotiates TunedPerMessageDeflate instead of the default."""
+
+    def send(self, event):
+        if isinstance(event, AcceptConnection) and event.extensions:
+            extensions = [
+                TunedPerMessageDeflate() if isinstance(extension, PerMessageDeflate) else extension
+                for extension in event.extensions
+            ]
+            event = AcceptConnection(
+                subprotocol=event.subprotocol,
+                extensions=extensions,
+                extra_headers=event.extra_headers,
+            )
+        return super().send(event)
+
+
+class TunedWSProtocol(WSProtocol):
+    """uvicorn's wsproto websocket protocol using the tuned deflate settings."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conn = TunedWSConnection(connection_type=ConnectionType.SERVER)
@@ -72,6 +72,8 @@ function CodeEditor() {
   const [activeUsers, setActiveUsers] = useState(1); // Add state for active users
   const timerRef = React.useRef(null);
   const socketRef = React.useRef(null);
+  // Session token and last seen document sequence number, used to resume after a reconnect
+  const sessionRef = React.useRef(null);
   const [wordWrap, setWordWrap] = useState('on');
   const [remoteSelections, setRemoteSelections] = useState({});
   const editorRef = React.useRef(null);
@@ -209,12 +211,17 @@ function CodeEditor() {
     let reconnectTimer;
     let connectionTimeout;
     let isComponentMounted = true;
+    sessionRef.current = null;
 
     const connectWebSocket = () => {
       if (!isComponentMounted || socketRef.current?.readyState === WebSocket.OPEN) return;
 
-      // Initialize WebSocket connection
-      socketRef.current = new WebSocket(`${config.wsUrl}/ws/${roomName}`);
+      // Initialize WebSocket connection, resuming the previous session if there is one
+      const session = sessionRef.current;
+      const query = session
+        ? `?session=${encodeURIComponent(session.token)}&last_seq=${session.seq}`
+        : '';
+      socketRef.current = new WebSocket(`${config.wsUrl}/ws/${roomName}${query}`);
       
       // Set a connection timeout
       connectionTimeout = setTimeout(() => {
@@ -241,42 +248,90 @@ function CodeEditor() {
         setRemoteSelections({}); // Clear selections on new connection
       };
 
-      socketRef.current.onclose = () => {
+      socketRef.current.onclose = (event) => {
         if (!isComponentMounted) return;
         setIsConnected(false);
         setIsLoading(false);
         setRemoteSelections({}); // Clear selections on disconnect
         socketRef.current = null;
+
+        // The room is larger than the server will load; retrying won't help
+        if (event.code === 1009) {
+          console.error('Room is too large to open:', event.reason);
+          return;
+        }
+        // The room was deleted; reconnecting would create it again
+        if (event.code === 4404) {
+          console.error('Room was deleted');
+          return;
+        }
         
         // Attempt to reconnect after 2 seconds
         reconnectTimer = setTimeout(connectWebSocket, 2000);
       };
 
+      // Remember the latest document sequence number we have seen
+      const trackSeq = (seq) => {
+        if (sessionRef.current && typeof seq === 'number') {
+          sessionRef.current.seq = Math.max(sessionRef.current.seq, seq);
+        }
+      };
+
+      // Apply one remote selection or selection_clear event
+      const applySelectionEvent = (data) => {
+        if (data.userId === socketRef.current?.clientId) return;
+        if (data.type === 'selection') {
+          setRemoteSelections(prev => ({
+            ...prev,
+            [data.userId]: {
+              startLineNumber: data.selection.startLineNumber,
+              startColumn: data.selection.startColumn,
+              endLineNumber: data.selection.endLineNumber,
+              endColumn: data.selection.endColumn,
+              userId: data.userId
+            }
+          }));
+        } else if (data.type === 'selection_clear') {
+          setRemoteSelections(prev => {
+            const updated = { ...prev };
+            delete updated[data.userId];
+            return updated;
+          });
+        }
+      };
+
+      // Pieces of a large snapshot, sent as content_chunk frames
+      let chunks = [];
+
       socketRef.current.onmessage = (event) => {
         if (!isComponentMounted) return;
         try {
           const data = JSON.parse(event.data);
           if (data.type === 'content') {
             setContent(data.content);
+            trackSeq(data.seq);
+          } else if (data.type === 'content_chunk') {
+            if (data.offset === 0) chunks = [];
+            chunks.push(data.data);
+          } else if (data.type === 'content_end') {
+            setContent(chunks.join(''));
+            chunks = [];
+            trackSeq(data.seq);
+          } else if (data.type === 'ack') {
+            trackSeq(data.seq);
+          } else if (data.type === 'ping') {
+            // Heartbeat: the server disconnects clients that stop answering
+            socketRef.current.send(JSON.stringify({ type: 'pong' }));
+          } else if (data.type === 'welcome') {
+            // Use the server-assigned ID so our own selections are recognised
+            socketRef.current.clientId = data.userId;
+            sessionRef.current = { token: data.session, seq: data.seq };
           } else if (data.type === 'users') {
             setActiveUsers(data.count);
-          } else if (data.type === 'selection' && data.userId !== socketRef.current?.clientId) {
-            setRemoteSelections(prev => ({
-              ...prev,
-              [data.userId]: {
-                startLineNumber: data.selection.startLineNumber,
-                startColumn: data.selection.startColumn,
-                endLineNumber: data.selection.endLineNumber,
-                endColumn: data.selection.endColumn,
-                userId: data.userId
-              }
-            }));
-          } else if (data.type === 'selection_clear') {
-            setRemoteSelections(prev => {
-              const updated = { ...prev };
-              delete updated[data.userId];
-              return updated;
-            });
+          } else if (data.type === 'selections') {
+            data.selections.forEach(applySelectionEvent);
+          } else if (data.type === 'selection' || data.type === 'selection_clear') {
+            applySelectionEvent(data);
           }
         } catch (error) {
           if (isComponentMounted) {
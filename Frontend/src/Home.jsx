@@ -14,12 +14,47 @@ function Home() {
   const [selectedRoom, setSelectedRoom] = useState(null);
   const [showPasswordModal, setShowPasswordModal] = useState(false);
   const [isTogglingLock, setIsTogglingLock] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // Rooms whose names start with the search term, fetched from the server so
+  // rooms beyond the loaded pages are found too (null when not searching)
+  const [searchResults, setSearchResults] = useState(null);
+  const [searchCursor, setSearchCursor] = useState(null);
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchRooms();
   }, []);
 
+  // Search the server once the user stops typing
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      setSearchCursor(null);
+      return;
+    }
+    // The previous term's cursor doesn't apply to this one
+    setSearchCursor(null);
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${config.apiUrl}/rooms?prefix=${encodeURIComponent(term)}`);
+        if (!response.ok) throw new Error('Failed to search rooms');
+        const data = await response.json();
+        if (cancelled) return;
+        setSearchResults(data.rooms);
+        setSearchCursor(data.next_cursor);
+      } catch (err) {
+        if (!cancelled) setError('Failed to search rooms. Please try again later.');
+      }
+    }, 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   const fetchRooms = async () => {
     try {
       const response = await fetch(`${config.apiUrl}/rooms`);
@@ -28,6 +63,7 @@ function Home() {
       // Defensive: sort by created_at descending (latest first)
       const sortedRooms = [...data.rooms].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
       setRooms(sortedRooms);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       setError('Failed to load rooms. Please try again later.');
     } finally {
@@ -35,6 +71,31 @@ function Home() {
     }
   };
 
+  // Fetch the next page of rooms, or of search results, and append it
+  const loadMoreRooms = async () => {
+    const searching = searchTerm.trim() !== '';
+    const cursor = searching ? searchCursor : nextCursor;
+    if (!cursor) return;
+    setIsLoadingMore(true);
+    try {
+      const prefix = searching ? `&prefix=${encodeURIComponent(searchTerm.trim())}` : '';
+      const response = await fetch(`${config.apiUrl}/rooms?cursor=${encodeURIComponent(cursor)}${prefix}`);
+      if (!response.ok) throw new Error('Failed to fetch rooms');
+      const data = await response.json();
+      if (searching) {
+        setSearchResults(prev => [...(prev || []), ...data.rooms]);
+        setSearchCursor(data.next_cursor);
+      } else {
+        setRooms(prev => [...prev, ...data.rooms]);
+        setNextCursor(data.next_cursor);
+      }
+    } catch (err) {
+      setError('Failed to load more rooms. Please try again later.');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const validateRoomName = (name) => {
     if (!name.trim()) {
       return 'Room name cannot be empty';
@@ -88,7 +149,8 @@ function Home() {
         throw new Error('Failed to delete room');
       }
 
-      setRooms(rooms.filter((room) => room.room_name !== roomName));
+      setRooms(prev => prev.filter((room) => room.room_name !== roomName));
+      setSearchResults(prev => prev && prev.filter((room) => room.room_name !== roomName));
     } catch (err) {
       setError('Failed to delete room. Please try again.');
     }
@@ -106,12 +168,13 @@ function Home() {
         throw new Error('Failed to update room lock status');
       }
 
-      // Update the rooms array with the new lock status
-      setRooms(rooms.map(room => 
-        room.room_name === roomName 
-          ? { ...room, is_locked: !currentLockState } 
-          : room
-      ));
+      // Update the rooms array (and search results) with the new lock status
+      const toggle = room =>
+        room.room_name === roomName
+          ? { ...room, is_locked: !currentLockState }
+          : room;
+      setRooms(prev => prev.map(toggle));
+      setSearchResults(prev => prev && prev.map(toggle));
     } catch (err) {
       setError('Failed to update room lock status. Please try again.');
     } finally {
@@ -140,6 +203,19 @@ function Home() {
     setSelectedRoom(null);
   };
 
+  // Loaded rooms containing the search term, plus the server's prefix matches (both ignore case)
+  const term = searchTerm.trim();
+  const lowerTerm = term.toLowerCase();
+  const visibleRooms = !term
+    ? rooms
+    : [
+        ...rooms.filter(room => room.room_name.toLowerCase().includes(lowerTerm)),
+        ...(searchResults || []).filter(result =>
+          result.room_name.toLowerCase().startsWith(lowerTerm) && !rooms.some(room => room.room_name === result.room_name)
+        )
+      ].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+  const moreCursor = term ? searchCursor : nextCursor;
+
   if (isLoading) {
     return (
       <div className="home-container">
@@ -201,8 +277,7 @@ function Home() {
             </p>
           </div>
         ) : (
-          rooms
-            .filter(room => room.room_name.toLowerCase().includes(searchTerm.toLowerCase()))
+          visibleRooms
             .map((room) => (
               <div key={room.room_name} className="room-card">
                 <div className="room-name">{room.room_name}</div>
@@ -246,6 +321,18 @@ function Home() {
             ))
         )}
       </div>
+
+      {moreCursor && (
+        <div className="load-more-section">
+          <button
+            className="load-more-button"
+            onClick={loadMoreRooms}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? 'Loading...' : 'Load more rooms'}
+          </button>
+        </div>
+      )}
       
       {showPasswordModal && (
         <RoomPasswordModal
@@ -4,6 +4,12 @@ import './AdminPanel.css';
 
 const ADMIN_PASSCODE = 'admin123'; // This should be stored securely in production
 
+// Timestamps come from SQLite as UTC 'YYYY-MM-DD HH:MM:SS'
+const formatTimestamp = (timestamp) => {
+  if (!timestamp) return 'never';
+  return new Date(timestamp.replace(' ', 'T') + 'Z').toLocaleString();
+};
+
 const MODES = {
   VIEW_LIST: 'view_list',
   VIEW_NOTE: 'view_note',
@@ -248,9 +254,9 @@ function AdminPanel({ isOpen, onClose, onResize }) {
               onClick={() => handleContentClick(content.id)}
             >
               <h3 className="note-item-title">{content.title}</h3>
+              {/* The list only has metadata; the full text is fetched on click */}
               <p className="note-item-preview">
-                {content.content.substring(0, 100)}
-                {content.content.length > 100 ? '...' : ''}
+                {content.size} characters · updated {formatTimestamp(content.updated_at)}
               </p>
             </div>
           ))